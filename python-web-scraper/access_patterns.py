@@ -0,0 +1,177 @@
+"""
+Access patterns over the scraped-data table
+Secondary indexes answer "have we seen this URL?", "what did we scrape/verify on a given day?" and
+"which items got a given verdict?" with key lookups instead of full table scans
+
+Existing tables need the indexes added once before lookups work:
+    python access_patterns.py --table twitter-scraped-data
+then `python backfill.py --mode reextract` fills in the index keys of items stored before them
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+
+from boto3.dynamodb.conditions import Key
+
+from url_canon import canonical_url
+
+PARTITION_KEY = 'tweet_id'
+URL_INDEX = 'url_hash-scraped_at-index'
+DATE_INDEX = 'date_bucket-scraped_at-index'
+VERDICT_INDEX = 'verdict_status-scraped_at-index'
+
+# index name -> (partition key, sort key); every index projects all attributes
+GLOBAL_SECONDARY_INDEXES = {
+    URL_INDEX: ('url_hash', 'scraped_at'),
+    DATE_INDEX: ('date_bucket', 'scraped_at'),
+    VERDICT_INDEX: ('verdict_status', 'scraped_at')
+}
+INDEX_ATTRIBUTES = ('url_hash', 'date_bucket', 'verdict_status')
+
+
+def url_hash(url):
+    """Stable key for a URL, shared by every trivially different copy of it"""
+    return hashlib.sha1(canonical_url(url).encode('utf-8')).hexdigest()
+
+
+def item_id_for_url(url):
+    """Deterministic item ID for a non-tweet URL"""
+    return url_hash(url)[:20]
+
+
+def index_attributes(item):
+    """GSI key attributes for an item; verdict_status is only set once the item has been verified"""
+    attributes = {}
+    if item.get('url'):
+        attributes['url_hash'] = url_hash(item['url'])
+    if item.get('scraped_at'):
+        # scraped_at is '%Y-%m-%d %H:%M:%S', so its first ten characters are the day
+        attributes['date_bucket'] = item['scraped_at'][:10]
+    if item.get('verification_success'):
+        claims = (item.get('structured_verification') or {}).get('claims', [])
+        statuses = [claim.get('status', 'UNKNOWN') for claim in claims]
+        attributes['verdict_status'] = max(set(statuses), key=statuses.count) if statuses else 'UNKNOWN'
+    return attributes
+
+
+def table_definition(table_name):
+    """create_table arguments for the table and its indexes (also used by the local backend)"""
+    attribute_names = {PARTITION_KEY} | {name for keys in GLOBAL_SECONDARY_INDEXES.values() for name in keys}
+    return {
+        'TableName': table_name,
+        'BillingMode': 'PAY_PER_REQUEST',
+        'AttributeDefinitions': [{'AttributeName': name, 'AttributeType': 'S'} for name in sorted(attribute_names)],
+        'KeySchema': [{'AttributeName': PARTITION_KEY, 'KeyType': 'HASH'}],
+        'GlobalSecondaryIndexes': [
+            {
+                'IndexName': index_name,
+                'KeySchema': [
+                    {'AttributeName': partition_key, 'KeyType': 'HASH'},
+                    {'AttributeName': sort_key, 'KeyType': 'RANGE'}
+                ],
+                'Projection': {'ProjectionType': 'ALL'}
+            }
+            for index_name, (partition_key, sort_key) in GLOBAL_SECONDARY_INDEXES.items()
+        ]
+    }
+
+
+def missing_indexes(client, table_name):
+    """Names of the indexes in GLOBAL_SECONDARY_INDEXES that the live table does not have yet"""
+    table = client.describe_table(TableName=table_name)['Table']
+    existing = {index['IndexName'] for index in table.get('GlobalSecondaryIndexes', [])}
+    return [name for name in GLOBAL_SECONDARY_INDEXES if name not in existing]
+
+
+def _wait_until_active(client, table_name, poll_seconds):
+    """Block until the table and every index on it are ACTIVE (DynamoDB takes one index change at a time)"""
+    while True:
+        table = client.describe_table(TableName=table_name)['Table']
+        statuses = [table['TableStatus']] + [index['IndexStatus'] for index in table.get('GlobalSecondaryIndexes', [])]
+        if all(status == 'ACTIVE' for status in statuses):
+            return
+        time.sleep(poll_seconds)
+
+
+def ensure_indexes(client, table_name, wait=True, poll_seconds=15):
+    """Add missing secondary indexes to an existing table with update_table; returns the names requested
+
+    DynamoDB builds one index at a time, so without wait only the first missing index is requested
+    """
+    definition = table_definition(table_name)
+    index_definitions = {index['IndexName']: index for index in definition['GlobalSecondaryIndexes']}
+    created = []
+    for index_name in missing_indexes(client, table_name):
+        if created and not wait:
+            break
+        _wait_until_active(client, table_name, poll_seconds)
+        print(f"Creating index {index_name} on {table_name}")
+        client.update_table(
+            TableName=table_name,
+            AttributeDefinitions=definition['AttributeDefinitions'],
+            GlobalSecondaryIndexUpdates=[{'Create': index_definitions[index_name]}]
+        )
+        created.append(index_name)
+    if created and wait:
+        _wait_until_active(client, table_name, poll_seconds)
+    return created
+
+
+class ScrapeAccessPatterns:
+    """Query API over the table's secondary indexes; works with a boto3 Table or a LocalTable"""
+
+    def __init__(self, table):
+        self.table = table
+
+    def _query(self, index_name, condition, newest_first=True, limit=None):
+        """Run a paginated index query, stopping once limit items are collected"""
+        items = []
+        kwargs = {'IndexName': index_name, 'KeyConditionExpression': condition, 'ScanIndexForward': not newest_first}
+        while True:
+            if limit:
+                kwargs['Limit'] = limit - len(items)
+            response = self.table.query(**kwargs)
+            items.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response or (limit and len(items) >= limit):
+                return items
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def find_by_url(self, url, limit=1):
+        """Most recent items for a URL (any variant that canonicalizes the same), newest first"""
+        return self._query(URL_INDEX, Key('url_hash').eq(url_hash(url)), limit=limit)
+
+    def seen_url(self, url):
+        """True if the URL has been scraped before"""
+        return bool(self.find_by_url(url, limit=1))
+
+    def scraped_on(self, day, start_time=None, end_time=None, limit=None):
+        """Items scraped on a day ('YYYY-MM-DD'), optionally within 'HH:MM:SS' bounds, newest first"""
+        condition = Key('date_bucket').eq(day)
+        if start_time or end_time:
+            condition &= Key('scraped_at').between(f"{day} {start_time or '00:00:00'}", f"{day} {end_time or '23:59:59'}")
+        return self._query(DATE_INDEX, condition, limit=limit)
+
+    def by_verdict(self, status, since=None, limit=None):
+        """Verified items whose overall verdict is status, optionally scraped at or after since, newest first"""
+        condition = Key('verdict_status').eq(status)
+        if since:
+            condition &= Key('scraped_at').gte(since)
+        return self._query(VERDICT_INDEX, condition, limit=limit)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Add the lookup indexes to an existing scraped-data table')
+    parser.add_argument('--table', default=os.environ.get('DYNAMODB_TABLE_NAME', 'twitter-scraped-data'))
+    parser.add_argument('--no-wait', action='store_true',
+                        help='return after requesting the first missing index (run again for the rest)')
+    args = parser.parse_args(argv)
+
+    import boto3
+    created = ensure_indexes(boto3.client('dynamodb'), args.table, wait=not args.no_wait)
+    print(json.dumps({'metric': 'index_migration', 'table': args.table, 'created': created}))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+API Gateway responses: one fast serialization, optional compression and field projection
+Results are serialized once (with orjson when it is installed), compressed with brotli or gzip when
+the client's Accept-Encoding allows it and the body is big enough to be worth it, and base64-encoded
+as API Gateway requires for binary bodies. A fields= projection lets clients such as the browser
+extension ask for just the verdict instead of the full article and raw verifier output.
+
+Compression is off unless API_COMPRESSION=true. A REST API stage only decodes base64 bodies when its
+binaryMediaTypes include */* (or the response's type); without that it passes the base64 text through
+and clients that call response.json() break, so enable it only after configuring the stage.
+"""
+
+import base64
+import gzip
+import json
+import os
+from decimal import Decimal
+
+from item_layout import verdict_summary
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib encoder produces the same JSON, just slower
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # without brotli, clients that accept it get gzip
+    brotli = None
+
+# Needs binaryMediaTypes = */* on the REST API stage (see the module docstring)
+COMPRESS_RESPONSES = os.environ.get('API_COMPRESSION', 'false').lower() == 'true'
+# Below this, compression costs more CPU than the bytes it saves
+MIN_COMPRESS_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+CORS_HEADERS = {'Access-Control-Allow-Origin': '*'}
+# Kept in every projection so clients can still tell which page a result is for and whether it failed
+ALWAYS_INCLUDED = ('url', 'error', 'partial')
+
+
+def _default(value):
+    """Types the encoders don't know: DynamoDB Decimals, sets and bytes"""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode('ascii')
+    return str(value)
+
+
+def dumps(value):
+    """Serialize to UTF-8 JSON bytes"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # e.g. integers beyond 64 bits, which orjson refuses; the stdlib encoder handles them
+            pass
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=_default).encode('utf-8')
+
+
+def _headers(event):
+    """Request headers with lower-cased names (API Gateway passes them as sent)"""
+    return {name.lower(): value for name, value in ((event or {}).get('headers') or {}).items() if value is not None}
+
+
+def request_fields(event):
+    """fields= from the query string, a JSON body or a direct invocation, as a list (None means everything)"""
+    event = event or {}
+    fields = ((event.get('queryStringParameters') or {}).get('fields')
+              or (event.get('multiValueQueryStringParameters') or {}).get('fields')
+              or event.get('fields'))
+    body = event.get('body')
+    if not fields and isinstance(body, str) and body.lstrip().startswith('{'):
+        try:
+            fields = json.loads(body).get('fields')
+        except ValueError:
+            fields = None
+    elif not fields and isinstance(body, dict):
+        fields = body.get('fields')
+    if not fields:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    fields = [field.strip() for value in fields for field in str(value).split(',') if field.strip()]
+    return fields or None
+
+
+def _path_value(value, path):
+    """Value at a dotted path, or a KeyError"""
+    for part in path.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            raise KeyError(path)
+        value = value[part]
+    return value
+
+
+def _set_path(target, path, value):
+    """Set a dotted path in a nested dict, creating the intermediate dicts"""
+    parts = path.split('.')
+    for part in parts[:-1]:
+        target = target.setdefault(part, {})
+    target[parts[-1]] = value
+
+
+def verdict(result):
+    """Compact verdict for a result: verification success plus verdict_summary of its claims"""
+    verification = result.get('verification_result') or {}
+    structured = verification.get('structured_verification') or result.get('structured_verification')
+    return {
+        'verification_success': verification.get('verification_success', result.get('verification_success')),
+        **verdict_summary(structured)
+    }
+
+
+def project(result, fields):
+    """Only the requested (dotted) fields of a result; 'verdict' is the compact verdict summary"""
+    if not fields or not isinstance(result, dict):
+        return result
+    if 'results' in result and isinstance(result['results'], list):
+        return {**result, 'results': [project(item, fields) for item in result['results']]}
+    if 'items' in result and isinstance(result['items'], list):
+        return {**result, 'items': [project(item, fields) for item in result['items']]}
+    projected = {}
+    for field in list(ALWAYS_INCLUDED) + list(fields):
+        if field == 'verdict' and 'verdict' not in result:
+            projected['verdict'] = verdict(result)
+            continue
+        try:
+            _set_path(projected, field, _path_value(result, field))
+        except KeyError:
+            continue
+    return projected
+
+
+def accepted_encoding(event):
+    """'br', 'gzip' or None: the best encoding the client accepts (q=0 excludes one)"""
+    header = _headers(event).get('accept-encoding', '')
+    accepted = {}
+    for part in header.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+    wildcard = accepted.get('*', 0)
+    if brotli is not None and accepted.get('br', wildcard) > 0:
+        return 'br'
+    if accepted.get('gzip', wildcard) > 0:
+        return 'gzip'
+    return None
+
+
+def json_response(body, event=None, status_code=200, fields=None, headers=None, compress=None):
+    """Lambda proxy response for body, projected to fields (default: the request's fields=) and compressed if accepted
+
+    compress defaults to COMPRESS_RESPONSES (API_COMPRESSION).
+    """
+    fields = request_fields(event) if fields is None else fields
+    payload = dumps(project(body, fields))
+    response_headers = {'Content-Type': 'application/json; charset=utf-8', **CORS_HEADERS, **(headers or {})}
+    compress = COMPRESS_RESPONSES if compress is None else compress
+
+    encoding = accepted_encoding(event) if compress and len(payload) >= MIN_COMPRESS_BYTES else None
+    if encoding:
+        if encoding == 'br':
+            payload = brotli.compress(payload, quality=BROTLI_QUALITY)
+        else:
+            payload = gzip.compress(payload, compresslevel=GZIP_LEVEL, mtime=0)
+        response_headers['Content-Encoding'] = encoding
+    if compress and event is not None:
+        # Caches in front of API Gateway must key on Accept-Encoding once bodies depend on it
+        response_headers['Vary'] = 'Accept-Encoding'
+
+    response = {'statusCode': status_code, 'headers': response_headers}
+    if encoding:
+        response['body'] = base64.b64encode(payload).decode('ascii')
+        response['isBase64Encoded'] = True
+    else:
+        response['body'] = payload.decode('utf-8')
+    return response
+
+
+if __name__ == "__main__":
+    import time
+
+    def benchmark(count=200):
+        """Serialize a verified article-sized result with the stdlib encoder and the response layer"""
+        result = {
+            'url': 'https://thestar.com.my/news/nation/2026/10/19/story',
+            'page_title': 'Story headline',
+            'main_text': 'Sentence of the article body, with a few numbers 123 and some ringgit RM45. ' * 400,
+            'paragraphs': ['Paragraph text of the article body. ' * 8] * 60,
+            'links': [f'https://thestar.com.my/news/{i}' for i in range(150)],
+            'verification_result': {
+                'verification_success': True,
+                'verification_response': 'x' * 20000,
+                'structured_verification': {'claims': [{'status': 'VERIFIED', 'confidence': 80}] * 12}
+            }
+        }
+        event = {'headers': {'Accept-Encoding': 'gzip, deflate, br'}}
+
+        started = time.perf_counter()
+        for _ in range(count):
+            plain = json.dumps(result, ensure_ascii=False)
+        stdlib_ms = (time.perf_counter() - started) / count * 1000
+
+        started = time.perf_counter()
+        for _ in range(count):
+            response = json_response(result, event, compress=True)
+        layer_ms = (time.perf_counter() - started) / count * 1000
+
+        verdict_only = json_response(result, {**event, 'queryStringParameters': {'fields': 'verdict'}}, compress=True)
+        print(f"encoder: {'orjson' if orjson else 'json'}, compression: {response['headers'].get('Content-Encoding')}")
+        print(f"json.dumps: {stdlib_ms:.2f} ms, {len(plain.encode('utf-8'))} bytes")
+        print(f"json_response: {layer_ms:.2f} ms, {len(response['body'])} base64 bytes")
+        print(f"fields=verdict: {verdict_only['body'] if not verdict_only.get('isBase64Encoded') else 'compressed'}")
+
+    benchmark()
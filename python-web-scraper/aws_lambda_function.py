@@ -18,12 +18,88 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, WebDriverException
+from link_expander import LinkExpander
+from near_duplicate import NearDuplicateIndex
+from claim_cache import ClaimCache
+from similarity_index import SimilarityIndex, article_text
+from item_layout import HotColdItemStore
+from access_patterns import ScrapeAccessPatterns, index_attributes, item_id_for_url
+from url_canon import tweet_status_id, page_type
+from structured_data import StructuredDataExtractor
+from scrape_cache import ScrapeCache
+from revalidation import Revalidator
+from chrome_cache import ChromeCacheManager
+from scroll_driver import ScrollDriver
+from deadline import Deadline, run_with_deadline
+from single_flight import RequestCoalescer, DynamoLeaseStore
+from api_response import json_response
+
+# Short links are resolved once at scrape time so the verification webhook sees the real sources
+link_expander = LinkExpander(cache_path=os.environ.get('LINK_CACHE_PATH', '/tmp/link-expansion-cache.json'))
+
+# MinHash index of verified articles; republished copies reuse the stored verification
+near_duplicate_index = NearDuplicateIndex(
+    path=os.environ.get('NEAR_DUP_INDEX_PATH', '/tmp/near-dup-index'),
+    threshold=float(os.environ.get('NEAR_DUP_THRESHOLD', '0.8')),
+    s3_bucket=os.environ.get('NEAR_DUP_INDEX_BUCKET'),
+    s3_sync_seconds=float(os.environ.get('NEAR_DUP_S3_SYNC_SECONDS', '300'))
+)
+
+# Verified claims keyed by fingerprint; CLAIM_CACHE_TABLE shares them across containers
+CLAIM_CACHE_TABLE = os.environ.get('CLAIM_CACHE_TABLE')
+claim_cache = ClaimCache(
+    path=os.environ.get('CLAIM_CACHE_PATH', '/tmp/claim-cache.json'),
+    table=boto3.resource('dynamodb').Table(CLAIM_CACHE_TABLE) if CLAIM_CACHE_TABLE else None,
+    ttl_seconds=int(os.environ.get('CLAIM_CACHE_TTL_HOURS', '168')) * 3600,
+    min_confidence=int(os.environ.get('CLAIM_CACHE_MIN_CONFIDENCE', '70'))
+)
+
+# TF-IDF index of verified articles, used to attach already-verified stories about the same event
+similarity_index = SimilarityIndex(path=os.environ.get('SIMILARITY_INDEX_PATH', '/tmp/similarity-index'))
+SIMILAR_ARTICLES_K = int(os.environ.get('SIMILAR_ARTICLES_K', '3'))
+SIMILAR_ARTICLES_MIN_SCORE = float(os.environ.get('SIMILAR_ARTICLES_MIN_SCORE', '0.3'))
+
+# Concurrent requests for one URL share a single scrape and verification: followers wait for the leader's
+# result. LEASE_TABLE_NAME extends this across containers; without it only this container is coalesced.
+LEASE_TABLE_NAME = os.environ.get('LEASE_TABLE_NAME')
+coalescer = RequestCoalescer(
+    lease_store=DynamoLeaseStore(boto3.resource('dynamodb').Table(LEASE_TABLE_NAME)) if LEASE_TABLE_NAME else None,
+    ttl_seconds=int(os.environ.get('VERIFY_LEASE_TTL_SECONDS', '900')),
+    key_prefix='verify#'
+)
+
+# 'single' keeps one item per scrape; 'hot_cold' writes a small hot item plus a compressed body
+DYNAMODB_LAYOUT = os.environ.get('DYNAMODB_LAYOUT', 'single')
+
+# Per-driver Chrome profiles seeded from a shared, size-capped static asset cache (CHROME_SHARED_CACHE_MB)
+chrome_cache = ChromeCacheManager()
+
+# Viewport-step scrolling for lazy content, bounded by SCROLL_BUDGET_SECONDS per page
+scroll_driver = ScrollDriver()
+
+# JSON-LD / AMP articles over plain HTTP before rendering; STRUCTURED_DATA_FIRST=false always uses Chrome
+STRUCTURED_DATA_FIRST = os.environ.get('STRUCTURED_DATA_FIRST', 'true').lower() == 'true'
+structured_extractor = StructuredDataExtractor()
+
+# Recently scraped (or feed-crawled) articles; SCRAPE_CACHE_TABLE shares them with the feed crawler and other containers.
+# Expired articles are revalidated with a conditional GET for up to SCRAPE_CACHE_STALE_HOURS before being re-scraped.
+SCRAPE_CACHE_TABLE = os.environ.get('SCRAPE_CACHE_TABLE')
+scrape_cache = ScrapeCache(
+    table=boto3.resource('dynamodb').Table(SCRAPE_CACHE_TABLE) if SCRAPE_CACHE_TABLE else None,
+    ttl_seconds=int(os.environ.get('SCRAPE_CACHE_TTL_HOURS', '6')) * 3600,
+    revalidator=Revalidator(structured_extractor),
+    stale_seconds=int(os.environ.get('SCRAPE_CACHE_STALE_HOURS', '72')) * 3600
+)
 
 class LambdaWebScraper:
     """Web scraper optimized for AWS Lambda using Selenium - supports Twitter and news websites"""
     
-    def __init__(self):
+    def __init__(self, deadline: Optional[Deadline] = None):
         self.driver = None
+        # Stage budgets from the invocation's remaining time; unbounded for local runs and backfills
+        self.deadline = deadline or Deadline()
+        # Latest state of the current scrape, returned as a partial result if the deadline cuts it short
+        self.partial_data = None
         self.dynamodb = boto3.resource('dynamodb')
         self.table_name = os.environ.get('DYNAMODB_TABLE_NAME', 'twitter-scraped-data')
         self.verification_webhook_url = os.environ.get('VERIFICATION_WEBHOOK_URL', 'https://n8n-staging.ai-spacex.co/webhook/1f21eafb-d9eb-438c-a239-5fe4c9676078')
@@ -35,7 +111,7 @@ class LambdaWebScraper:
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Context manager exit"""
         if self.driver:
-            self.driver.quit()
+            chrome_cache.quit(self.driver)
     
     def save_to_dynamodb(self, data: Dict[str, Any], url: str, verification_data: Dict[str, Any] = None) -> str:
         """Save response data to DynamoDB including verification results"""
@@ -79,17 +155,52 @@ class LambdaWebScraper:
                         if key not in item:  # Don't overwrite existing fields
                             item[f'verified_{key}'] = value
             
+            # Keys for the URL, date and verdict indexes
+            item.update(index_attributes(item))
+            
             # Save to DynamoDB
             table = self.dynamodb.Table(self.table_name)
-            table.put_item(Item=item)
+            if DYNAMODB_LAYOUT == 'hot_cold':
+                HotColdItemStore(table).put(item)
+            else:
+                table.put_item(Item=item)
             
             print(f"Response saved to DynamoDB: tweet_id={tweet_id}")
+            if verification_data and verification_data.get('verification_success'):
+                self.index_for_similarity(tweet_id, data, url, verification_data)
             return tweet_id
             
         except Exception as e:
             print(f"Error saving to DynamoDB: {str(e)}")
             return None
     
+    def index_for_similarity(self, doc_id: str, data: Dict[str, Any], url: str, verification_data: Dict[str, Any]) -> None:
+        """Append a verified item to the similarity index so later articles about the same event find it"""
+        try:
+            claims = verification_data.get('structured_verification', {}).get('claims', [])
+            similarity_index.add(doc_id, article_text(data), {
+                'url': url,
+                'page_title': data.get('page_title', ''),
+                'verified_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'claim_statuses': [claim.get('status', 'UNKNOWN') for claim in claims]
+            })
+            similarity_index.save()
+        except Exception as e:
+            print(f"Error updating similarity index: {str(e)}")
+    
+    def find_similar_articles(self, scraped_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Top matches among previously verified articles, best first"""
+        try:
+            return similarity_index.query(
+                article_text(scraped_data),
+                k=SIMILAR_ARTICLES_K,
+                min_score=SIMILAR_ARTICLES_MIN_SCORE,
+                exclude=scraped_data.get('dynamodb_id')
+            )
+        except Exception as e:
+            print(f"Error querying similarity index: {str(e)}")
+            return []
+    
     def parse_verification_response(self, verification_result: Dict[str, Any]) -> Dict[str, Any]:
         """Parse verification response into structured claims format"""
         try:
@@ -176,8 +287,14 @@ class LambdaWebScraper:
             print(f"Error extracting sources: {e}")
             return []
     
-    def verify_content(self, scraped_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Send scraped data to verification API and return verification response"""
+    def verify_content(self, scraped_data: Dict[str, Any], known_claims: List[Dict[str, Any]] = None,
+                       timeout: float = 120) -> Dict[str, Any]:
+        """Send scraped data to verification API and return verification response
+        
+        known_claims are cached verdicts for claims in this article; the verifier can skip them and they
+        are merged back into structured_verification alongside the freshly verified claims.
+        """
+        known_claims = known_claims or []
         try:
             print(f"Sending data to verification API: {self.verification_webhook_url}")
             
@@ -199,6 +316,11 @@ class LambdaWebScraper:
                 "dynamodb_id": scraped_data.get('dynamodb_id', ''),
                 "saved_to_dynamodb": scraped_data.get('saved_to_dynamodb', False)
             }
+            if known_claims:
+                verification_payload["known_claims"] = [
+                    {field: claim.get(field) for field in ('claim', 'status', 'confidence', 'summary', 'sources')}
+                    for claim in known_claims
+                ]
             
             print(f"Payload being sent: {json.dumps(verification_payload, indent=2)}")
             
@@ -207,7 +329,7 @@ class LambdaWebScraper:
                 self.verification_webhook_url,
                 json=verification_payload,
                 headers={'Content-Type': 'application/json'},
-                timeout=120  # Increased to 2 minutes
+                timeout=timeout  # Up to 2 minutes, less when the Lambda deadline is close
             )
             
             if response.status_code == 200:
@@ -217,6 +339,7 @@ class LambdaWebScraper:
                     
                     # Parse the structured verification data
                     structured_verification = self.parse_verification_response(verification_result)
+                    claim_cache.store(structured_verification['claims'], scraped_data)
                     
                 except json.JSONDecodeError as e:
                     print(f"Failed to parse JSON response: {e}")
@@ -224,6 +347,7 @@ class LambdaWebScraper:
                     verification_result = {"error": "Invalid JSON response", "raw_response": response.text}
                     structured_verification = {"claims": []}
                 
+                structured_verification = claim_cache.assemble(structured_verification['claims'], known_claims)
                 return {
                     "verification_success": True,
                     "verification_response": verification_result,
@@ -246,17 +370,55 @@ class LambdaWebScraper:
                 "verification_status_code": 0
             }
     
+    def find_near_duplicate_verification(self, scraped_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Return the stored verification of a near-duplicate article, or None if there is no close match"""
+        try:
+            signature = near_duplicate_index.signature_for(scraped_data)
+            if signature is None:
+                return None
+            match = near_duplicate_index.query(signature)
+            if not match:
+                return None
+            doc_id, similarity, payload = match
+            print(f"Reusing verification of near-duplicate {payload.get('url')} (similarity {similarity:.2f})")
+            verification_result = dict(payload['verification_result'])
+            verification_result['near_duplicate_of'] = {
+                'dynamodb_id': doc_id,
+                'url': payload.get('url'),
+                'similarity': round(similarity, 3)
+            }
+            return verification_result
+        except Exception as e:
+            print(f"Error checking near-duplicate index: {str(e)}")
+            return None
+    
+    def index_verified_article(self, scraped_data: Dict[str, Any], verification_result: Dict[str, Any]) -> None:
+        """Add a successfully verified article to the near-duplicate index"""
+        if not verification_result.get('verification_success'):
+            return
+        try:
+            signature = near_duplicate_index.signature_for(scraped_data)
+            if signature is None:
+                return
+            near_duplicate_index.add(
+                scraped_data.get('dynamodb_id') or scraped_data.get('url', ''),
+                signature,
+                {'url': scraped_data.get('url', ''), 'verification_result': verification_result}
+            )
+            near_duplicate_index.save()
+        except Exception as e:
+            print(f"Error updating near-duplicate index: {str(e)}")
+    
     def _extract_tweet_id(self, url: str) -> str:
         """Extract tweet ID from Twitter URL"""
         try:
-            # Extract status ID from URL like https://x.com/user/status/1234567890
-            import re
-            match = re.search(r'/status/(\d+)', url)
-            if match:
-                return match.group(1)
+            # Status ID from X/Twitter post URLs like https://x.com/user/status/1234567890
+            status_id = tweet_status_id(url)
+            if status_id:
+                return status_id
             else:
-                # Fallback: use hash of URL
-                return str(hash(url))[-10:]
+                # Fallback: stable hash of the canonical URL, so re-scrapes update the same item
+                return item_id_for_url(url)
         except:
             return str(int(time.time()))
     
@@ -277,9 +439,9 @@ class LambdaWebScraper:
         chrome_options.add_argument('--window-size=1920,1080')
         chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
         # Use /tmp for any Chrome state to avoid permission issues on Lambda
-        chrome_options.add_argument('--user-data-dir=/tmp/chrome-user-data')
-        chrome_options.add_argument('--data-path=/tmp/chrome-data')
-        chrome_options.add_argument('--disk-cache-dir=/tmp/chrome-cache')
+        profile = chrome_cache.new_profile()
+        for argument in chrome_cache.chrome_arguments(profile):
+            chrome_options.add_argument(argument)
         # Additional anti-detection measures
         chrome_options.add_argument('--disable-blink-features=AutomationControlled')
         chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
@@ -360,6 +522,7 @@ class LambdaWebScraper:
             except Exception as _e:
                 print(f"Could not list /var/task/bin: {_e}")
             print("Hint: Ensure your Lambda layer or package provides both Chrome and Chromedriver, and set CHROME_PATH/CHROMEDRIVER_PATH env vars if using nonstandard paths.")
+            chrome_cache.discard_profile(profile)
             return False
         
         # Set Chrome binary location
@@ -390,406 +553,528 @@ class LambdaWebScraper:
             else:
                 # Try without specifying driver path
                 self.driver = webdriver.Chrome(options=chrome_options)
+            chrome_cache.attach(self.driver, profile)
             
             self.driver.set_page_load_timeout(30)
             print("Selenium WebDriver setup successful!")
             return True
         except Exception as e:
             print(f"Selenium setup failed: {e}")
+            chrome_cache.discard_profile(profile)
             return False
     
     
-    def scrape_website(self, url: str) -> Dict[str, Any]:
-        """Scrape website content using Selenium WebDriver - supports Twitter and news sites"""
-        try:
-            if not self.setup_selenium_driver():
-                return {"error": "Failed to setup Selenium driver", "url": url}
-            
-            print(f"Loading URL: {url}")
-            
-            # Execute script to hide automation indicators
-            self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-            
-            self.driver.get(url)
-            
+    def extract_page(self, url: str) -> Dict[str, Any]:
+        """Extract a URL's content, without saving or verifying it
+
+        Articles in the scrape cache (e.g. pre-scraped by the feed crawler) are returned as they are, pages
+        with a JSON-LD/AMP article body are read over plain HTTP and everything else is loaded in Chrome.
+        """
+        cached = scrape_cache.get(url)
+        if cached:
+            print(f"Serving {url} from the scrape cache ({cached['cache_source']}, {cached['cached_at']})")
+            return cached
+        
+        if STRUCTURED_DATA_FIRST and page_type(url) != 'twitter_post':
+            with self.deadline.stage('navigation'):
+                structured = structured_extractor.extract(url, timeout=self.deadline.budget('navigation', cap=structured_extractor.timeout))
+            if structured:
+                print(f"Extracted {url} from {structured['structured_source']} structured data without rendering")
+                structured = link_expander.expand_result(structured)
+                scrape_cache.put(url, structured)
+                return structured
+        
+        if not self.driver and not self.setup_selenium_driver():
+            raise WebDriverException("Failed to setup Selenium driver")
+        
+        print(f"Loading URL: {url}")
+        
+        # Execute script to hide automation indicators
+        self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+        
+        timed_out = False
+        with self.deadline.stage('navigation'):
+            self.driver.set_page_load_timeout(max(1, self.deadline.budget('navigation', cap=30)))
+            try:
+                self.driver.get(url)
+            except TimeoutException:
+                # Out of navigation budget: stop loading and extract whatever has arrived
+                print(f"Page load for {url} ran out of budget, extracting what has loaded")
+                self.driver.execute_script("window.stop();")
+                self.deadline.cut_short('navigation')
+                timed_out = True
+        
+        with self.deadline.stage('readiness'):
             # Wait for content to load (reduced timeout)
             WebDriverWait(self.driver, 10).until(
                 EC.presence_of_element_located((By.TAG_NAME, "body"))
             )
             
-            # Wait for dynamic content to load
-            time.sleep(5)
-            
-            # Try scrolling to trigger lazy loading
-            self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(2)
-            self.driver.execute_script("window.scrollTo(0, 0);")
-            time.sleep(2)
+            # Scroll in viewport steps until lazily loaded content stops arriving
+            if not timed_out and self.deadline.allows('readiness'):
+                scroll_driver.scroll(self.driver, url, self.deadline.budget('readiness', cap=scroll_driver.budget_seconds))
             
             # Check if we're on a login/signup page
-
             page_source = self.driver.page_source.lower()
-            if 'sign up' in page_source or 'log in' in page_source or 'create account' in page_source:
+            if not timed_out and ('sign up' in page_source or 'log in' in page_source or 'create account' in page_source) and self.deadline.allows('readiness'):
                 print("Detected login/signup page, trying to wait longer...")
-                time.sleep(10)  # Wait longer for potential redirect
+                time.sleep(self.deadline.budget('readiness', cap=10))  # Wait longer for potential redirect
                 
                 # Try scrolling to trigger lazy loading
-                self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                time.sleep(3)
-                self.driver.execute_script("window.scrollTo(0, 0);")
-                time.sleep(2)
-            
-            # Extract data using JavaScript
-            data = self.driver.execute_script("""
-                // Debug: Log page structure for troubleshooting
-                console.log('Page title:', document.title);
-                console.log('Page URL:', window.location.href);
-                console.log('Body content length:', document.body.textContent.length);
-                
-                // Check for common content containers
-                const contentContainers = [
-                    '.article-page-content',
-                    '[itemprop="articleBody"]',
-                    '.article-content',
-                    '.content',
-                    'main',
-                    'article'
-                ];
-                
-                for (const selector of contentContainers) {
+                scroll_driver.scroll(self.driver, url, self.deadline.budget('readiness', cap=scroll_driver.budget_seconds))
+        
+        # Structured data in the rendered page beats the extraction script's selector heuristics
+        extraction_started = time.monotonic()
+        structured, metadata = structured_extractor.analyze(self.driver.page_source, url, follow_amp=False)
+        if structured:
+            data = structured
+        else:
+            data = self._extract_with_script()
+            # JSON-LD and meta tags are more reliable than the script's title, author and date guesses
+            for field in ('page_title', 'author', 'timestamp'):
+                if metadata.get(field):
+                    data[field] = metadata[field]
+            data['scraping_method'] = 'selenium_webdriver'
+            # Lets the scrape cache revalidate the page later with a plain GET instead of a re-render
+            if metadata.get('digest'):
+                data['validators'] = {'digest': metadata['digest']}
+        
+        data['scraped_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
+        data['lambda_ready'] = True
+        if timed_out:
+            # Cut off mid-load: returned flagged, never cached
+            data['partial'] = True
+        link_expander.expand_result(data)
+        scrape_cache.put(url, data)
+        chrome_cache.record_page(self.driver, url)
+        self.deadline.record('extraction', time.monotonic() - extraction_started)
+        return data
+    
+    def _extract_with_script(self) -> Dict[str, Any]:
+        """Extract title, text, paragraphs, links, images and metadata from the loaded page with JavaScript"""
+        return self.driver.execute_script("""
+            // Debug: Log page structure for troubleshooting
+            console.log('Page title:', document.title);
+            console.log('Page URL:', window.location.href);
+            console.log('Body content length:', document.body.textContent.length);
+            
+            // Check for common content containers
+            const contentContainers = [
+                '.article-page-content',
+                '[itemprop="articleBody"]',
+                '.article-content',
+                '.content',
+                'main',
+                'article'
+            ];
+            
+            for (const selector of contentContainers) {
+                const element = document.querySelector(selector);
+                if (element) {
+                    console.log('Found container:', selector, 'with text length:', element.textContent.length);
+                }
+            }
+            const safe_extract = (selector) => {
+                try {
                     const element = document.querySelector(selector);
-                    if (element) {
-                        console.log('Found container:', selector, 'with text length:', element.textContent.length);
-                    }
+                    return element ? element.textContent.trim() : null;
+                } catch (e) {
+                    return null;
                 }
-                const safe_extract = (selector) => {
-                    try {
-                        const element = document.querySelector(selector);
-                        return element ? element.textContent.trim() : null;
-                    } catch (e) {
-                        return null;
-                    }
-                };
-                
-                const safe_extract_all = (selector) => {
-                    try {
-                        const elements = document.querySelectorAll(selector);
-                        return Array.from(elements).map(el => el.textContent.trim()).filter(text => text.length > 0);
-                    } catch (e) {
-                        return [];
-                    }
-                };
-                
-                const extract_links = () => {
-                    try {
-                        return Array.from(document.querySelectorAll('a[href]'))
-                            .map(link => link.href)
-                            .filter(href => href && !href.startsWith('javascript:') && !href.startsWith('#'))
-                            .slice(0, 15);
-                    } catch (e) {
-                        return [];
-                    }
-                };
-                
-                const extract_images = () => {
-                    try {
-                        const images = [];
-                        // Try multiple selectors for images (both Twitter and news sites)
-                        const selectors = [
-                            'img[src*="pbs.twimg.com"]',  // Twitter's image CDN
-                            'img[src*="media"]',          // Media images
-                            'img[alt*="Image"]',          // Images with alt text
-                            'article img',                // Images in articles
-                            'div[data-testid="tweetPhoto"] img',  // Tweet photos
-                            'img[src*="twimg"]',          // Any Twitter images
-                            '.article-content img',       // News article images
-                            '.content img',               // General content images
-                            'main img',                   // Main content images
-                            'figure img',                 // Figure images
-                            '.article-page-content img',  // Sin Chew Daily article images
-                            '[itemprop="articleBody"] img', // Article body images
-                            '.article-text img',          // Article text images
-                            '.news-article img',          // News article images
-                            '.story img',                 // Story images
-                            '.post img'                   // Post images
-                        ];
-                        
-                        for (const selector of selectors) {
-                            const imgs = document.querySelectorAll(selector);
-                            for (const img of imgs) {
-                                const src = img.src;
-                                if (src && !src.includes('data:') && src.includes('http') && !images.includes(src)) {
-                                    images.push(src);
-                                }
+            };
+            
+            const safe_extract_all = (selector) => {
+                try {
+                    const elements = document.querySelectorAll(selector);
+                    return Array.from(elements).map(el => el.textContent.trim()).filter(text => text.length > 0);
+                } catch (e) {
+                    return [];
+                }
+            };
+            
+            const extract_links = () => {
+                try {
+                    return Array.from(document.querySelectorAll('a[href]'))
+                        .map(link => link.href)
+                        .filter(href => href && !href.startsWith('javascript:') && !href.startsWith('#'))
+                        .slice(0, 15);
+                } catch (e) {
+                    return [];
+                }
+            };
+            
+            const extract_images = () => {
+                try {
+                    const images = [];
+                    // Try multiple selectors for images (both Twitter and news sites)
+                    const selectors = [
+                        'img[src*="pbs.twimg.com"]',  // Twitter's image CDN
+                        'img[src*="media"]',          // Media images
+                        'img[alt*="Image"]',          // Images with alt text
+                        'article img',                // Images in articles
+                        'div[data-testid="tweetPhoto"] img',  // Tweet photos
+                        'img[src*="twimg"]',          // Any Twitter images
+                        '.article-content img',       // News article images
+                        '.content img',               // General content images
+                        'main img',                   // Main content images
+                        'figure img',                 // Figure images
+                        '.article-page-content img',  // Sin Chew Daily article images
+                        '[itemprop="articleBody"] img', // Article body images
+                        '.article-text img',          // Article text images
+                        '.news-article img',          // News article images
+                        '.story img',                 // Story images
+                        '.post img'                   // Post images
+                    ];
+                    
+                    for (const selector of selectors) {
+                        const imgs = document.querySelectorAll(selector);
+                        for (const img of imgs) {
+                            const src = img.src;
+                            if (src && !src.includes('data:') && src.includes('http') && !images.includes(src)) {
+                                images.push(src);
                             }
                         }
-                        
-                        return images.slice(0, 10);  // Return up to 10 images
-                    } catch (e) {
-                        return [];
                     }
-                };
-                
-                const extract_paragraphs = () => {
-                    try {
-                        const paragraphs = [];
-                        // Common selectors for article paragraphs
-                        const paragraphSelectors = [
-                            'article p',                  // Standard article paragraphs
-                            '.article-content p',         // Article content paragraphs
-                            '.content p',                 // General content paragraphs
-                            'main p',                     // Main content paragraphs
-                            '.story-content p',           // Story content paragraphs
-                            '.post-content p',            // Post content paragraphs
-                            '.entry-content p',           // Entry content paragraphs
-                            '[data-testid="tweetText"]',  // Twitter tweet text
-                            'div[data-testid="tweetText"]', // Twitter tweet text div
-                            'article div[lang]',          // Twitter article content
-                            'div[lang]',                  // General lang divs
-                            '.article-body p',            // Article body paragraphs
-                            '.news-content p',            // News content paragraphs
-                            '.text-content p',            // Text content paragraphs
-                            '.article-page-content p',    // Sin Chew Daily article content
-                            '[itemprop="articleBody"] p', // Article body with itemprop
-                            '#article-page-content p',    // Article content by ID
-                            '.article-text p',            // Article text paragraphs
-                            '.news-article p',            // News article paragraphs
-                            '.story p',                   // Story paragraphs
-                            '.post p'                     // Post paragraphs
-                        ];
-                        
-                        for (const selector of paragraphSelectors) {
-                            const elements = document.querySelectorAll(selector);
-                            for (const element of elements) {
-                                const text = element.textContent.trim();
-                                // Filter out very short text and navigation elements
-                                if (text && text.length > 20 && 
-                                    !text.toLowerCase().includes('cookie') &&
-                                    !text.toLowerCase().includes('subscribe') &&
-                                    !text.toLowerCase().includes('newsletter') &&
-                                    !text.toLowerCase().includes('advertisement') &&
-                                    !text.toLowerCase().includes('sponsored')) {
-                                    paragraphs.push(text);
-                                }
+                    
+                    return images.slice(0, 10);  // Return up to 10 images
+                } catch (e) {
+                    return [];
+                }
+            };
+            
+            const extract_paragraphs = () => {
+                try {
+                    const paragraphs = [];
+                    // Common selectors for article paragraphs
+                    const paragraphSelectors = [
+                        'article p',                  // Standard article paragraphs
+                        '.article-content p',         // Article content paragraphs
+                        '.content p',                 // General content paragraphs
+                        'main p',                     // Main content paragraphs
+                        '.story-content p',           // Story content paragraphs
+                        '.post-content p',            // Post content paragraphs
+                        '.entry-content p',           // Entry content paragraphs
+                        '[data-testid="tweetText"]',  // Twitter tweet text
+                        'div[data-testid="tweetText"]', // Twitter tweet text div
+                        'article div[lang]',          // Twitter article content
+                        'div[lang]',                  // General lang divs
+                        '.article-body p',            // Article body paragraphs
+                        '.news-content p',            // News content paragraphs
+                        '.text-content p',            // Text content paragraphs
+                        '.article-page-content p',    // Sin Chew Daily article content
+                        '[itemprop="articleBody"] p', // Article body with itemprop
+                        '#article-page-content p',    // Article content by ID
+                        '.article-text p',            // Article text paragraphs
+                        '.news-article p',            // News article paragraphs
+                        '.story p',                   // Story paragraphs
+                        '.post p'                     // Post paragraphs
+                    ];
+                    
+                    for (const selector of paragraphSelectors) {
+                        const elements = document.querySelectorAll(selector);
+                        for (const element of elements) {
+                            const text = element.textContent.trim();
+                            // Filter out very short text and navigation elements
+                            if (text && text.length > 20 && 
+                                !text.toLowerCase().includes('cookie') &&
+                                !text.toLowerCase().includes('subscribe') &&
+                                !text.toLowerCase().includes('newsletter') &&
+                                !text.toLowerCase().includes('advertisement') &&
+                                !text.toLowerCase().includes('sponsored')) {
+                                paragraphs.push(text);
                             }
                         }
-                        
-                        // Remove duplicates and return unique paragraphs
-                        return [...new Set(paragraphs)].slice(0, 20);  // Return up to 20 paragraphs
-                    } catch (e) {
-                        return [];
                     }
-                };
-                
-                const extract_metrics = () => {
-                    try {
-                        const metrics = {};
-                        const selectors = {
-                            'retweets': '[data-testid="retweet"]',
-                            'likes': '[data-testid="like"]',
-                            'replies': '[data-testid="reply"]'
-                        };
-                        
-                        for (const [metric, selector] of Object.entries(selectors)) {
-                            const element = document.querySelector(selector);
-                            if (element) {
-                                const text = element.textContent || element.getAttribute('aria-label') || '';
-                                const number = text.match(/[\\d,]+/);
-                                metrics[metric] = number ? number[0].replace(/,/g, '') : '0';
-                            }
+                    
+                    // Remove duplicates and return unique paragraphs
+                    return [...new Set(paragraphs)].slice(0, 20);  // Return up to 20 paragraphs
+                } catch (e) {
+                    return [];
+                }
+            };
+            
+            const extract_metrics = () => {
+                try {
+                    const metrics = {};
+                    const selectors = {
+                        'retweets': '[data-testid="retweet"]',
+                        'likes': '[data-testid="like"]',
+                        'replies': '[data-testid="reply"]'
+                    };
+                    
+                    for (const [metric, selector] of Object.entries(selectors)) {
+                        const element = document.querySelector(selector);
+                        if (element) {
+                            const text = element.textContent || element.getAttribute('aria-label') || '';
+                            const number = text.match(/[\\d,]+/);
+                            metrics[metric] = number ? number[0].replace(/,/g, '') : '0';
                         }
-                        
-                        return metrics;
-                    } catch (e) {
-                        return {};
                     }
-                };
-                
-                const extract_author = () => {
-                    try {
-                        // Try multiple selectors for author (both Twitter and news sites)
-                        const authorSelectors = [
-                            '[data-testid="User-Name"]',     // Twitter user name
-                            '[data-testid="UserName"]',      // Twitter user name
-                            'h1[data-testid="UserName"]',    // Twitter user name h1
-                            'div[data-testid="UserName"]',   // Twitter user name div
-                            '.author',                       // General author class
-                            '.byline',                       // Byline class
-                            '.article-author',               // Article author
-                            '.story-author',                 // Story author
-                            '.post-author',                  // Post author
-                            '.writer',                       // Writer class
-                            'meta[name="author"]',           // Meta author tag
-                            '.author-name',                  // Author name class
-                            '.byline-author'                 // Byline author class
-                        ];
-                        
-                        for (const selector of authorSelectors) {
-                            const author = safe_extract(selector);
-                            if (author && author.length > 1 && author.length < 100) {
-                                return author;
-                            }
-                        }
-                        
-                        // Try to extract from meta tags
-                        const metaAuthor = document.querySelector('meta[name="author"]');
-                        if (metaAuthor) {
-                            return metaAuthor.getAttribute('content');
+                    
+                    return metrics;
+                } catch (e) {
+                    return {};
+                }
+            };
+            
+            const extract_author = () => {
+                try {
+                    // Try multiple selectors for author (both Twitter and news sites)
+                    const authorSelectors = [
+                        '[data-testid="User-Name"]',     // Twitter user name
+                        '[data-testid="UserName"]',      // Twitter user name
+                        'h1[data-testid="UserName"]',    // Twitter user name h1
+                        'div[data-testid="UserName"]',   // Twitter user name div
+                        '.author',                       // General author class
+                        '.byline',                       // Byline class
+                        '.article-author',               // Article author
+                        '.story-author',                 // Story author
+                        '.post-author',                  // Post author
+                        '.writer',                       // Writer class
+                        'meta[name="author"]',           // Meta author tag
+                        '.author-name',                  // Author name class
+                        '.byline-author'                 // Byline author class
+                    ];
+                    
+                    for (const selector of authorSelectors) {
+                        const author = safe_extract(selector);
+                        if (author && author.length > 1 && author.length < 100) {
+                            return author;
                         }
-                        
-                        return 'Unknown author';
-                    } catch (e) {
-                        return 'Unknown author';
                     }
-                };
-                
-                const extract_timestamp = () => {
-                    try {
-                        // Try multiple selectors for timestamp (both Twitter and news sites)
-                        const timestampSelectors = [
-                            'time',                         // Standard time element
-                            'time[datetime]',               // Time with datetime attribute
-                            '.timestamp',                   // Timestamp class
-                            '.publish-date',                // Publish date
-                            '.article-date',                // Article date
-                            '.story-date',                  // Story date
-                            '.post-date',                   // Post date
-                            '.date',                        // Date class
-                            'meta[property="article:published_time"]', // Meta published time
-                            'meta[name="date"]'             // Meta date
-                        ];
-                        
-                        for (const selector of timestampSelectors) {
-                            const element = document.querySelector(selector);
-                            if (element) {
-                                const timestamp = element.getAttribute('datetime') || 
-                                                element.getAttribute('content') || 
-                                                element.textContent.trim();
-                                if (timestamp) {
-                                    return timestamp;
-                                }
-                            }
-                        }
-                        
-                        return null;
-                    } catch (e) {
-                        return null;
+                    
+                    // Try to extract from meta tags
+                    const metaAuthor = document.querySelector('meta[name="author"]');
+                    if (metaAuthor) {
+                        return metaAuthor.getAttribute('content');
                     }
-                };
-                
-                // Extract main content text (for Twitter compatibility)
-                let main_text = safe_extract('[data-testid="tweetText"]');
-                if (!main_text) {
-                    const tweetSelectors = [
-                        '[data-testid="tweetText"]',
-                        'div[data-testid="tweetText"]',
-                        'article div[lang]',
-                        'div[lang]'
+                    
+                    return 'Unknown author';
+                } catch (e) {
+                    return 'Unknown author';
+                }
+            };
+            
+            const extract_timestamp = () => {
+                try {
+                    // Try multiple selectors for timestamp (both Twitter and news sites)
+                    const timestampSelectors = [
+                        'time',                         // Standard time element
+                        'time[datetime]',               // Time with datetime attribute
+                        '.timestamp',                   // Timestamp class
+                        '.publish-date',                // Publish date
+                        '.article-date',                // Article date
+                        '.story-date',                  // Story date
+                        '.post-date',                   // Post date
+                        '.date',                        // Date class
+                        'meta[property="article:published_time"]', // Meta published time
+                        'meta[name="date"]'             // Meta date
                     ];
                     
-                    for (const selector of tweetSelectors) {
-                        main_text = safe_extract(selector);
-                        if (main_text && main_text.length > 10) break;
+                    for (const selector of timestampSelectors) {
+                        const element = document.querySelector(selector);
+                        if (element) {
+                            const timestamp = element.getAttribute('datetime') || 
+                                            element.getAttribute('content') || 
+                                            element.textContent.trim();
+                            if (timestamp) {
+                                return timestamp;
+                            }
+                        }
                     }
+                    
+                    return null;
+                } catch (e) {
+                    return null;
                 }
+            };
+            
+            // Extract main content text (for Twitter compatibility)
+            let main_text = safe_extract('[data-testid="tweetText"]');
+            if (!main_text) {
+                const tweetSelectors = [
+                    '[data-testid="tweetText"]',
+                    'div[data-testid="tweetText"]',
+                    'article div[lang]',
+                    'div[lang]'
+                ];
                 
-                // Extract paragraphs
-                const paragraphs = extract_paragraphs();
-                
-                // If we have paragraphs, use the first one as main text if no main text found
-                if (!main_text && paragraphs.length > 0) {
-                    main_text = paragraphs[0];
-                }
-                
-                if (!main_text) {
-                    main_text = 'Content extracted from page';
-                }
-                
-                const author = extract_author();
-                const timestamp = extract_timestamp();
-                
-                // Determine page type
-                let page_type = 'unknown';
-                if (paragraphs.length > 0) {
-                    page_type = 'news_article';
-                } else if (main_text && main_text !== 'Content extracted from page') {
-                    page_type = 'tweet';
-                } else {
-                    page_type = 'profile';
+                for (const selector of tweetSelectors) {
+                    main_text = safe_extract(selector);
+                    if (main_text && main_text.length > 10) break;
                 }
-                
-                return {
-                    main_text: main_text,
-                    paragraphs: paragraphs,
-                    author: author,
-                    timestamp: timestamp,
-                    links: extract_links(),
-                    images: extract_images(),
-                    metrics: extract_metrics(),
-                    page_title: document.title,
-                    url: window.location.href,
-                    page_type: page_type
-                };
-            """)
+            }
             
-            data['scraping_method'] = 'selenium_webdriver'
-            data['scraped_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
-            data['lambda_ready'] = True
+            // Extract paragraphs
+            const paragraphs = extract_paragraphs();
+            
+            // If we have paragraphs, use the first one as main text if no main text found
+            if (!main_text && paragraphs.length > 0) {
+                main_text = paragraphs[0];
+            }
+            
+            if (!main_text) {
+                main_text = 'Content extracted from page';
+            }
+            
+            const author = extract_author();
+            const timestamp = extract_timestamp();
+            
+            // Determine page type
+            let page_type = 'unknown';
+            if (paragraphs.length > 0) {
+                page_type = 'news_article';
+            } else if (main_text && main_text !== 'Content extracted from page') {
+                page_type = 'tweet';
+            } else {
+                page_type = 'profile';
+            }
+            
+            return {
+                main_text: main_text,
+                paragraphs: paragraphs,
+                author: author,
+                timestamp: timestamp,
+                links: extract_links(),
+                images: extract_images(),
+                metrics: extract_metrics(),
+                page_title: document.title,
+                url: window.location.href,
+                page_type: page_type
+            };
+        """)
+    
+    def scrape_website(self, url: str) -> Dict[str, Any]:
+        """Scrape website content using Selenium WebDriver - supports Twitter and news sites"""
+        try:
+            self.partial_data = {"error": "Deadline reached before the page was extracted", "url": url, "scraping_method": "selenium_webdriver"}
+            # Chrome is only launched if the page needs rendering
+            data = self.extract_page(url)
+            self.partial_data = data
             
             # Step 1: Save scraped data to DynamoDB first (ensures data is never lost)
-            dynamodb_id = self.save_to_dynamodb(data, url)
+            with self.deadline.stage('persistence'):
+                dynamodb_id = self.save_to_dynamodb(data, url)
             if dynamodb_id:
                 data['dynamodb_id'] = dynamodb_id
                 data['saved_to_dynamodb'] = True
             else:
                 data['saved_to_dynamodb'] = False
             
-            # Step 2: Send scraped data to verification API
-            verification_result = self.verify_content(data)
+            data['similar_articles'] = self.find_similar_articles(data)
+            
+            # Step 2: Reuse a near-duplicate's verification, otherwise send scraped data to verification API
+            verification_result = self.find_near_duplicate_verification(data)
+            if verification_result is None and self.deadline.allows('verification'):
+                with self.deadline.stage('verification'):
+                    verification_result = self.verify_content(
+                        data, claim_cache.match(data), timeout=self.deadline.budget('verification', cap=120)
+                    )
+                self.deadline.check('indexing')
+                self.index_verified_article(data, verification_result)
+            elif verification_result is None:
+                verification_result = {
+                    "verification_success": False,
+                    "verification_response": "Skipped: not enough time left before the Lambda deadline",
+                    "verification_status_code": 0,
+                    "verification_skipped": True
+                }
             
             # Step 3: Combine scraped data with verification result
             combined_data = data.copy()
             combined_data['verification_result'] = verification_result
+            self.partial_data = combined_data
             
             # Step 4: Update DynamoDB with verification results
             if dynamodb_id:
-                updated_dynamodb_id = self.save_to_dynamodb(combined_data, url, verification_result)
+                with self.deadline.stage('persistence'):
+                    updated_dynamodb_id = self.save_to_dynamodb(combined_data, url, verification_result)
                 if updated_dynamodb_id:
                     combined_data['verification_saved_to_dynamodb'] = True
                 else:
                     combined_data['verification_saved_to_dynamodb'] = False
             
-            return combined_data
+            return self.deadline.annotate(combined_data)
             
         except Exception as e:
             return {"error": str(e), "url": url, "scraping_method": "selenium_webdriver"}
         finally:
             if self.driver:
-                self.driver.quit()
+                chrome_cache.quit(self.driver)
                 self.driver = None
     
+    def partial_result(self) -> Dict[str, Any]:
+        """Whatever the current scrape has gathered so far, flagged as partial"""
+        return self.deadline.annotate(dict(self.partial_data or {"error": "Deadline reached before scraping started"}))
     
 
+
 # AWS Lambda Handler Function
 def lambda_handler(event, context):
     """AWS Lambda handler function"""
     
+    # Index lookups: {"lookup": "url", "url": ...}, {"lookup": "date", "date": "YYYY-MM-DD"}, {"lookup": "verdict", "status": ...}
+    if event.get('lookup'):
+        return lookup_handler(event)
+    
     # Extract URL from event
     url = event.get('url', 'https://www.freemalaysiatoday.com/category/nation/2024/12/19/register-vehicles-for-subsidised-ron95-petrol-transport-companies-told/')
     
-    # Scrape website data
-    with LambdaWebScraper() as scraper:
-        result = scraper.scrape_website(url)
+    # Scrape website data, returning a partial result rather than being killed at the timeout
+    deadline = Deadline.from_context(context)
+    
+    def scrape():
+        with LambdaWebScraper(deadline) as scraper:
+            return run_with_deadline(deadline, lambda: scraper.scrape_website(url), scraper.partial_result)
+    
+    if not coalescer.join(url, None):
+        # Another request is already scraping and verifying this URL: wait for its result instead
+        shared = coalescer.wait_for_result(url, timeout=deadline.remaining())
+        if shared is not None:
+            print(f"Returning the result of the in-flight scrape of {url}")
+            return json_response({**shared, 'coalesced': True}, event)
+        if deadline.remaining() <= 0:
+            result = deadline.annotate({"error": "Deadline reached while waiting for the in-flight scrape of this URL",
+                                        "url": url, "partial": True})
+            return json_response(result, event)
+        # The leader ended without sharing a result (it failed or ran out of time); scrape here instead
+        return json_response(scrape(), event)
+    
+    try:
+        result = scrape()
+        # A partial result reflects this invocation's deadline; followers are better off scraping themselves
+        if isinstance(result, dict) and not result.get('partial'):
+            coalescer.share(url, result)
+    finally:
+        coalescer.complete(url)
     
-    # Return Lambda response
-    return {
-        'statusCode': 200,
-        'body': json.dumps(result, ensure_ascii=False),
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*'
-        }
-    }
+    # Serialized once, projected to fields= (e.g. fields=verdict) and compressed per Accept-Encoding
+    return json_response(result, event)
+
+def lookup_handler(event):
+    """Answer URL, date and verdict lookups from the secondary indexes"""
+    lookup = event.get('lookup')
+    limit = int(event.get('limit', 50))
+    try:
+        table = boto3.resource('dynamodb').Table(os.environ.get('DYNAMODB_TABLE_NAME', 'twitter-scraped-data'))
+        patterns = ScrapeAccessPatterns(table)
+        
+        if lookup == 'url' and event.get('url'):
+            items = patterns.find_by_url(event['url'], limit=limit)
+        elif lookup == 'date' and event.get('date'):
+            items = patterns.scraped_on(event['date'], event.get('start_time'), event.get('end_time'), limit=limit)
+        elif lookup == 'verdict' and event.get('status'):
+            items = patterns.by_verdict(event['status'], since=event.get('since'), limit=limit)
+        else:
+            return json_response({'error': f"Unsupported lookup: {lookup}"}, event, status_code=400)
+        
+        return json_response({'items': items, 'count': len(items)}, event)
+    except Exception as e:
+        error = str(e)
+        print(f"Lookup {lookup} failed: {error}")
+        if 'index' in error.lower():
+            error += ' (run `python access_patterns.py --table <table>` to add the lookup indexes)'
+        return json_response({'error': error}, event, status_code=500)
 
 # For local testing (remove this in production)
 if __name__ == "__main__":
@@ -0,0 +1,383 @@
+"""
+Bulk re-verification and field backfill over the scraped-data table
+Streams the table with a segmented parallel scan, re-runs verification and/or page extraction for each
+stored item under one shared concurrency budget, and writes back only the attributes that changed.
+Progress is checkpointed per segment after every page, so an interrupted run resumes where it stopped;
+items that failed are recorded in the checkpoint and retried first on the next run. The checkpoint is
+tied to the table, mode and filters it was written for and a mismatched one is refused.
+
+Usage:
+    python backfill.py --mode reverify --segments 4 --concurrency 2
+    python backfill.py --mode reextract --since "2026-10-01" --limit 200
+    python backfill.py --mode both --local items.jsonl --dry-run    # offline, against a LocalTable
+
+Verification goes to VERIFICATION_WEBHOOK_URL, as in aws_lambda_function.
+"""
+
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import concurrent.futures
+from decimal import Decimal
+
+EXTRACTED_FIELDS = (
+    'main_text', 'paragraphs', 'author', 'timestamp', 'page_title', 'page_type', 'images', 'links', 'metrics',
+    'scraping_method', 'short_links'
+)
+VERIFICATION_FIELDS = ('verification_success', 'verification_response', 'verification_status_code', 'structured_verification')
+# Records stored in the same table that aren't scraped items (leases, claim cache, cold bodies, scrape cache, feed state)
+INTERNAL_KEY_PREFIXES = ('lease#', 'claim#', 'body#', 'scrape#', 'feed#')
+
+
+def to_plain(value):
+    """DynamoDB Decimals -> int/float so items can be re-sent as JSON"""
+    return json.loads(json.dumps(value, default=lambda v: int(v) if isinstance(v, Decimal) and v == v.to_integral_value() else float(v)))
+
+
+def to_dynamo(value):
+    """Floats -> Decimal, which is the only number type DynamoDB accepts"""
+    return json.loads(json.dumps(value, ensure_ascii=False), parse_float=Decimal)
+
+
+def default_checkpoint_path(table_name, mode, local=None, dry_run=False):
+    """Checkpoint file for one table, mode and source, so different runs never resume each other"""
+    source = f"-local-{os.path.splitext(os.path.basename(local))[0]}" if local else ''
+    return f"/tmp/backfill-{table_name}-{mode}{source}{'-dry-run' if dry_run else ''}.json"
+
+
+class Checkpoint:
+    """Per-segment scan position, counters and failed item keys, written atomically after every page"""
+
+    def __init__(self, path, total_segments, run=None):
+        self.path = path
+        self._lock = threading.Lock()
+        # What the checkpoint was written for (table, mode, source, filters); resuming another run is refused
+        run = run or {}
+        self.state = {'total_segments': total_segments, 'run': run, 'segments': {}}
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                saved = json.load(f)
+            if saved.get('total_segments') != total_segments:
+                raise ValueError(f"Checkpoint {path} was written with {saved.get('total_segments')} segments; "
+                                 f"rerun with --segments {saved.get('total_segments')} or remove it")
+            if saved.get('run', {}) != run:
+                raise ValueError(f"Checkpoint {path} belongs to a different run ({saved.get('run')}); "
+                                 f"pass another --checkpoint or remove it")
+            self.state = saved
+
+    def segment(self, number):
+        """Saved state of one segment ({'last_key', 'done', 'processed', 'failed'})"""
+        with self._lock:
+            state = self.state['segments'].get(str(number), {})
+            return {'last_key': None, 'done': False, 'processed': 0, 'failed': [], **state}
+
+    def update(self, number, last_key, done, processed, failed=()):
+        """Record that a segment has handled everything up to last_key, except the failed item keys"""
+        with self._lock:
+            self.state['segments'][str(number)] = {'last_key': last_key, 'done': done, 'processed': processed,
+                                                   'failed': list(failed)}
+            if not self.path:
+                return
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f, default=str)
+            os.replace(tmp_path, self.path)
+
+
+class DeltaWriter:
+    """Writes changed attributes with update_item, a batch at a time, retrying throttled requests"""
+
+    def __init__(self, table, key_attribute='tweet_id', max_workers=4, max_attempts=5, dry_run=False):
+        self.table = table
+        self.key_attribute = key_attribute
+        self.max_attempts = max_attempts
+        self.dry_run = dry_run
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='delta')
+        self._lock = threading.Lock()
+        self.written = 0
+        self.failed = 0
+
+    def _update(self, item_id, changes):
+        """SET only the changed attributes of one item"""
+        names = {f'#a{i}': name for i, name in enumerate(changes)}
+        values = {f':v{i}': to_dynamo(value) for i, value in enumerate(changes.values())}
+        for attempt in range(self.max_attempts):
+            try:
+                self.table.update_item(
+                    Key={self.key_attribute: item_id},
+                    UpdateExpression='SET ' + ', '.join(f'#a{i} = :v{i}' for i in range(len(changes))),
+                    ExpressionAttributeNames=names,
+                    ExpressionAttributeValues=values
+                )
+                return True
+            except Exception as e:
+                code = getattr(e, 'response', {}).get('Error', {}).get('Code', '')
+                if code not in ('ProvisionedThroughputExceededException', 'ThrottlingException') or attempt + 1 == self.max_attempts:
+                    print(f"Error updating {item_id}: {str(e)}")
+                    return False
+                time.sleep(0.2 * (2 ** attempt) * (0.5 + random.random()))
+        return False
+
+    def write(self, deltas):
+        """Apply a batch of (item_id, changes) concurrently; returns the IDs of the items that failed"""
+        deltas = [(item_id, changes) for item_id, changes in deltas if changes]
+        if self.dry_run:
+            for item_id, changes in deltas:
+                print(f"[dry run] {item_id}: would update {sorted(changes)}")
+            return []
+        results = list(self._executor.map(lambda delta: self._update(*delta), deltas))
+        with self._lock:
+            self.written += sum(results)
+            self.failed += len(results) - sum(results)
+        return [item_id for (item_id, _), ok in zip(deltas, results) if not ok]
+
+    def close(self):
+        """Wait for in-flight updates and stop the writer threads"""
+        self._executor.shutdown(wait=True)
+
+
+class Backfill:
+    """Segmented parallel scan feeding a bounded pool of re-verification / re-extraction workers"""
+
+    def __init__(self, table, mode='reverify', segments=4, concurrency=2, page_size=50, checkpoint_path=None,
+                 since=None, status=None, limit=None, dry_run=False, source=None):
+        if mode not in ('reverify', 'reextract', 'both'):
+            raise ValueError(f"Unknown mode: {mode}")
+        from item_layout import HotColdItemStore
+
+        self.table = table
+        self.mode = mode
+        self.segments = segments
+        self.page_size = page_size
+        self.since = since
+        self.status = status
+        self.limit = limit
+        self.dry_run = dry_run
+        run = {'table': getattr(table, 'name', None), 'mode': mode, 'source': source, 'since': since, 'status': status,
+               'dry_run': dry_run}
+        self.checkpoint = Checkpoint(checkpoint_path, segments, run)
+        self.writer = DeltaWriter(table, dry_run=dry_run)
+        self.item_store = HotColdItemStore(table)
+        # One budget shared by every segment, so segments only parallelize the scan itself
+        self._workers = concurrent.futures.ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='backfill')
+        self._local = threading.local()
+        self._scrapers = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.processed = 0
+        self.changed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.retried = 0
+
+    def _scraper(self):
+        """One LambdaWebScraper (and Chrome, once needed) per worker thread, reused across items"""
+        if not hasattr(self._local, 'scraper'):
+            from aws_lambda_function import LambdaWebScraper
+
+            self._local.scraper = LambdaWebScraper()
+            with self._lock:
+                self._scrapers.append(self._local.scraper)
+        return self._local.scraper
+
+    def _wanted(self, item):
+        """Apply the key-prefix, --since and --status filters"""
+        item_id = str(item.get('tweet_id', ''))
+        if item_id.startswith(INTERNAL_KEY_PREFIXES) or not item.get('url'):
+            return False
+        if self.since and str(item.get('scraped_at', '')) < self.since:
+            return False
+        if self.status and item.get('verdict_status') != self.status:
+            return False
+        return True
+
+    def process_item(self, item):
+        """Re-run extraction and/or verification for one item; returns (item_id, changed attributes)"""
+        from access_patterns import index_attributes
+        from aws_lambda_function import claim_cache
+
+        hot_cold = item.get('layout') == 'hot_cold'
+        current = to_plain(self.item_store.get_full(item['tweet_id']) if hot_cold else item)
+        changes = {}
+
+        if self.mode in ('reextract', 'both'):
+            data = self._scraper().extract_page(current['url'])
+            changes.update({
+                field: data[field] for field in EXTRACTED_FIELDS
+                if field in data and data[field] != current.get(field)
+            })
+            changes['reextracted_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
+
+        if self.mode in ('reverify', 'both'):
+            scraped = {**current, **changes}
+            result = self._scraper().verify_content(scraped, claim_cache.match(scraped))
+            if not result.get('verification_success'):
+                raise RuntimeError(f"Verification failed with status {result.get('verification_status_code')}")
+            changes.update({
+                field: result[field] for field in VERIFICATION_FIELDS
+                if field in result and result[field] != current.get(field)
+            })
+            changes['verified_at'] = changes['reverified_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
+
+        changes.update({
+            name: value for name, value in index_attributes({**current, **changes}).items()
+            if value != current.get(name)
+        })
+        if hot_cold and not self.dry_run:
+            # The body is one compressed blob, so hot/cold items are rewritten whole rather than patched
+            self.item_store.put(to_dynamo({**current, **changes}))
+            return item['tweet_id'], {}
+        return item['tweet_id'], changes
+
+    def _process(self, items):
+        """Process items on the worker pool and write their changes; returns the IDs of the ones that failed"""
+        futures = {self._workers.submit(self.process_item, item): item for item in items}
+        deltas = []
+        failed = []
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                deltas.append(future.result())
+            except Exception as e:
+                print(f"Error backfilling {futures[future].get('tweet_id')}: {str(e)}")
+                failed.append(futures[future]['tweet_id'])
+        failed += self.writer.write(deltas)
+        with self._lock:
+            self.changed += sum(1 for item_id, changes in deltas if changes and item_id not in failed)
+            self.failed += len(failed)
+        return failed
+
+    def _retry_failed(self, item_ids):
+        """Re-read and reprocess items an earlier run failed on; returns the IDs that failed again"""
+        items = []
+        for item_id in item_ids:
+            item = self.table.get_item(Key={'tweet_id': item_id}).get('Item')
+            if item and self._wanted(item):
+                items.append(item)
+        with self._lock:
+            self.retried += len(items)
+        print(f"Retrying {len(items)} items that failed in an earlier run")
+        return self._process(items) if items else []
+
+    def _run_segment(self, number):
+        """Scan one segment page by page, checkpointing after each page's updates are written"""
+        state = self.checkpoint.segment(number)
+        processed = state['processed']
+        last_key = state['last_key']
+        failed = self._retry_failed(state['failed']) if state['failed'] else []
+        if state['done']:
+            self.checkpoint.update(number, last_key, True, processed, failed)
+            return
+        while not self._stop.is_set():
+            kwargs = {'Segment': number, 'TotalSegments': self.segments, 'Limit': self.page_size}
+            if last_key:
+                kwargs['ExclusiveStartKey'] = last_key
+            response = self.table.scan(**kwargs)
+
+            wanted = [item for item in response.get('Items', []) if self._wanted(item)]
+            with self._lock:
+                self.skipped += len(response.get('Items', [])) - len(wanted)
+                items = wanted[:self.limit - self.processed] if self.limit else wanted
+                self.processed += len(items)
+                if self.limit and self.processed >= self.limit:
+                    self._stop.set()
+
+            page_failed = self._process(items)
+
+            # A page cut short by --limit isn't checkpointed, so the next run picks up its remaining items
+            if len(items) < len(wanted):
+                break
+            # Failed items are moved past but kept in the checkpoint, and retried by the next run
+            failed += page_failed
+            processed += len(items)
+            last_key = response.get('LastEvaluatedKey')
+            self.checkpoint.update(number, last_key, last_key is None, processed, failed)
+            if last_key is None:
+                break
+
+    def run(self):
+        """Scan all segments in parallel; returns the run metrics"""
+        started = time.time()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.segments, thread_name_prefix='segment') as segments:
+            for future in [segments.submit(self._run_segment, number) for number in range(self.segments)]:
+                future.result()
+        self._workers.shutdown(wait=True)
+        self.writer.close()
+        if self._scrapers:
+            from aws_lambda_function import chrome_cache
+            for scraper in self._scrapers:
+                chrome_cache.quit(scraper.driver)
+
+        elapsed = time.time() - started
+        metrics = {
+            'metric': 'backfill',
+            'mode': self.mode,
+            'processed': self.processed,
+            'changed': self.changed,
+            'failed': self.failed,
+            'retried': self.retried,
+            'skipped': self.skipped,
+            'items_per_second': round(self.processed / elapsed, 2) if elapsed else 0,
+            'elapsed_seconds': round(elapsed, 1)
+        }
+        print(json.dumps(metrics))
+        return metrics
+
+
+def load_local_table(path, table_name):
+    """LocalTable with the production key schema, filled from a JSONL export of items"""
+    from access_patterns import table_definition
+    from local_table import LocalTable
+
+    table = LocalTable(table_definition(table_name))
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                table.put_item(Item=to_dynamo(json.loads(line)))
+    return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Re-verify or re-extract stored items in bulk')
+    parser.add_argument('--mode', choices=('reverify', 'reextract', 'both'), default='reverify')
+    parser.add_argument('--table', default=os.environ.get('DYNAMODB_TABLE_NAME', 'twitter-scraped-data'))
+    parser.add_argument('--segments', type=int, default=4, help='parallel scan segments')
+    parser.add_argument('--concurrency', type=int, default=2, help='items processed at once across all segments')
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--checkpoint', help="resume file (default: /tmp/backfill-<table>-<mode>[-local-<file>][-dry-run].json; '' to disable)")
+    parser.add_argument('--since', help="only items with scraped_at >= this ('YYYY-MM-DD[ HH:MM:SS]')")
+    parser.add_argument('--status', help='only items whose verdict_status is this')
+    parser.add_argument('--limit', type=int, help='stop after this many items')
+    parser.add_argument('--dry-run', action='store_true', help='compute changes without writing them')
+    parser.add_argument('--local', help='run against a LocalTable loaded from this JSONL file instead of DynamoDB')
+    parser.add_argument('--local-output', help='where to write the LocalTable afterwards (default: <local>.backfilled.jsonl)')
+    args = parser.parse_args(argv)
+
+    if args.local:
+        # LambdaWebScraper still creates a boto3 resource; give it a region so no AWS config is needed
+        os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+        table = load_local_table(args.local, args.table)
+    else:
+        import boto3
+        table = boto3.resource('dynamodb').Table(args.table)
+
+    checkpoint = default_checkpoint_path(args.table, args.mode, args.local, args.dry_run) if args.checkpoint is None else args.checkpoint
+    metrics = Backfill(
+        table, mode=args.mode, segments=args.segments, concurrency=args.concurrency, page_size=args.page_size,
+        checkpoint_path=checkpoint or None, since=args.since, status=args.status, limit=args.limit,
+        dry_run=args.dry_run, source=os.path.abspath(args.local) if args.local else args.table
+    ).run()
+
+    if args.local:
+        output = args.local_output or f"{os.path.splitext(args.local)[0]}.backfilled.jsonl"
+        with open(output, 'w', encoding='utf-8') as f:
+            for item in table.scan()['Items']:
+                f.write(json.dumps(to_plain(item), ensure_ascii=False) + '\n')
+        print(f"Wrote {output}")
+    return 0 if not metrics['failed'] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,6 +1,6 @@
 import json
 import os
-import requests
+import boto3
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
@@ -11,13 +11,87 @@ from selenium.common.exceptions import TimeoutException, WebDriverException
 import time
 from datetime import datetime
 import re
+import concurrent.futures
+from browser_warmup import WarmBrowser
+from tab_scheduler import TabScheduler
+from memory_governor import BrowserMemoryGovernor
+from chrome_cache import ChromeCacheManager
+from scroll_driver import ScrollDriver
+from deadline import Deadline, run_with_deadline
+from single_flight import RequestCoalescer, DynamoLeaseStore
+from url_canon import page_type as classify_url
+from structured_data import StructuredDataExtractor
+from scrape_cache import ScrapeCache
+from revalidation import Revalidator
+from feed_crawler import FeedCrawler, FeedStateStore
+from n8n_delivery import N8nDeliveryQueue
+from politeness import PolitenessScheduler
+from link_expander import LinkExpander
+
+N8N_WEBHOOK_URL = "https://n8n-staging.ai-spacex.co/webhook/d3afd105-4db6-47d3-8aaa-87f9d268c3ea"
+
+# Results are buffered and delivered in batches; undelivered ones spill to /tmp and retry on the next flush
+delivery_queue = N8nDeliveryQueue(
+    N8N_WEBHOOK_URL,
+    batch_webhook_url=os.environ.get('N8N_BATCH_WEBHOOK_URL'),
+    max_attempts=int(os.environ.get('N8N_DELIVERY_MAX_ATTEMPTS', '3')),
+    spill_path=os.environ.get('N8N_DELIVERY_SPILL_PATH', '/tmp/n8n-undelivered.jsonl')
+)
+
+# SQS batch consumer settings; MAX_BATCH_SIZE should equal the event source mapping's BatchSize
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', '10'))
+MAX_RECEIVE_COUNT = int(os.environ.get('MAX_RECEIVE_COUNT', '3'))
+MAX_TABS = int(os.environ.get('MAX_TABS', '4'))
+TAB_TIMEOUT_SECONDS = int(os.environ.get('TAB_TIMEOUT_SECONDS', '30'))
+# Tabs share the default context (and so the shared disk cache); cookies are still cleared between leases.
+# TAB_ISOLATED_CONTEXTS=true gives each tab its own off-the-record context instead, with an in-memory cache.
+TAB_ISOLATED_CONTEXTS = os.environ.get('TAB_ISOLATED_CONTEXTS', 'false').lower() == 'true'
+
+# Per-driver Chrome profiles seeded from a shared, size-capped static asset cache (CHROME_SHARED_CACHE_MB)
+chrome_cache = ChromeCacheManager()
+
+memory_governor = BrowserMemoryGovernor(seeded_mb=chrome_cache.seeded_mb)
+
+# Viewport-step scrolling for lazy content, bounded by SCROLL_BUDGET_SECONDS per page
+scroll_driver = ScrollDriver()
+
+# JSON-LD / AMP articles over plain HTTP before rendering; STRUCTURED_DATA_FIRST=false always uses Chrome
+STRUCTURED_DATA_FIRST = os.environ.get('STRUCTURED_DATA_FIRST', 'true').lower() == 'true'
+structured_extractor = StructuredDataExtractor()
+
+# Recently scraped (or feed-crawled) articles; SCRAPE_CACHE_TABLE shares them with the feed crawler and other containers.
+# Expired articles are revalidated with a conditional GET for up to SCRAPE_CACHE_STALE_HOURS before being re-scraped.
+SCRAPE_CACHE_TABLE = os.environ.get('SCRAPE_CACHE_TABLE')
+scrape_cache = ScrapeCache(
+    table=boto3.resource('dynamodb').Table(SCRAPE_CACHE_TABLE) if SCRAPE_CACHE_TABLE else None,
+    ttl_seconds=int(os.environ.get('SCRAPE_CACHE_TTL_HOURS', '6')) * 3600,
+    revalidator=Revalidator(structured_extractor),
+    stale_seconds=int(os.environ.get('SCRAPE_CACHE_STALE_HOURS', '72')) * 3600
+)
+
+# Per-domain concurrency and rate limits (site defaults in politeness.SITE_POLICIES, overrides in POLITENESS_POLICIES)
+politeness = PolitenessScheduler.from_env()
+
+# Resolves t.co and other short links once at scrape time; the cache lives in /tmp for the container's lifetime
+link_expander = LinkExpander(cache_path=os.environ.get('LINK_CACHE_PATH', '/tmp/link-expansion-cache.json'))
+
+# Releases the ingress Lambda's scrape lease and returns every chatId that coalesced onto the URL
+LEASE_TABLE_NAME = os.environ.get('LEASE_TABLE_NAME')
+coalescer = RequestCoalescer(
+    lease_store=DynamoLeaseStore(boto3.resource('dynamodb').Table(LEASE_TABLE_NAME)) if LEASE_TABLE_NAME else None
+)
 
 class SimpleWebScraper:
     """Simple web scraper optimized for AWS Lambda using Selenium - no verification API calls"""
     
-    def __init__(self):
-        self.driver = None
-        self.n8n_webhook_url = "https://n8n-staging.ai-spacex.co/webhook/d3afd105-4db6-47d3-8aaa-87f9d268c3ea"
+    def __init__(self, driver=None, deadline=None):
+        self.driver = driver
+        # A driver handed in (e.g. the warm browser) belongs to the caller and is not quit on exit
+        self.owns_driver = driver is None
+        # Stage budgets from the invocation's remaining time; unbounded when none is given
+        self.deadline = deadline or Deadline()
+        self.partial_data = None
+        self.n8n_webhook_url = N8N_WEBHOOK_URL
         
     def __enter__(self):
         """Context manager entry"""
@@ -25,14 +99,14 @@ class SimpleWebScraper:
         
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Context manager exit - cleanup resources"""
-        if self.driver:
-            try:
-                self.driver.quit()
-            except Exception as e:
-                print(f"Error closing driver: {e}")
+        if self.driver and self.owns_driver:
+            chrome_cache.quit(self.driver)
+            # Only this driver's flag; the warm browser's stays set until it is recycled itself
+            memory_governor.recycled(self.driver)
     
     def setup_selenium_driver(self):
         """Setup Selenium WebDriver with Chrome for AWS Lambda"""
+        profile = None
         try:
             # Chrome options for Lambda (same as working main scraper)
             chrome_options = Options()
@@ -50,9 +124,9 @@ class SimpleWebScraper:
             chrome_options.add_argument('--window-size=1920,1080')
             chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
             # Use /tmp for any Chrome state to avoid permission issues on Lambda
-            chrome_options.add_argument('--user-data-dir=/tmp/chrome-user-data')
-            chrome_options.add_argument('--data-path=/tmp/chrome-data')
-            chrome_options.add_argument('--disk-cache-dir=/tmp/chrome-cache')
+            profile = chrome_cache.new_profile()
+            for argument in chrome_cache.chrome_arguments(profile):
+                chrome_options.add_argument(argument)
             # Additional anti-detection measures
             chrome_options.add_argument('--disable-blink-features=AutomationControlled')
             chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
@@ -104,6 +178,7 @@ class SimpleWebScraper:
                 print(f"Failed to create WebDriver with service: {e}")
                 # Try without specifying driver path
                 self.driver = webdriver.Chrome(options=chrome_options)
+            chrome_cache.attach(self.driver, profile)
             
             # Execute script to remove webdriver property
             self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
@@ -116,49 +191,111 @@ class SimpleWebScraper:
             
         except Exception as e:
             print(f"Error setting up Selenium driver: {str(e)}")
+            # A driver that never launched would otherwise leave its profile behind in /tmp
+            chrome_cache.discard_profile(profile)
             return False
     
-    def scrape_website(self, url):
-        """Scrape website content using Selenium"""
+    def scrape_website(self, url, check_cache=True):
+        """Scrape website content, from the scrape cache or structured data over HTTP when possible, otherwise with Selenium"""
         try:
+            cached = scrape_cache.get(url) if check_cache else None
+            if cached:
+                print(f"Serving {url} from the scrape cache ({cached['cache_source']}, {cached['cached_at']})")
+                return self.deadline.annotate(cached)
+            
+            if STRUCTURED_DATA_FIRST and classify_url(url) != "twitter_post":
+                with self.deadline.stage('navigation'):
+                    structured = structured_extractor.extract(url, timeout=self.deadline.budget('navigation', cap=structured_extractor.timeout))
+                if structured:
+                    print(f"Extracted {url} from {structured['structured_source']} structured data without rendering")
+                    structured = link_expander.expand_result(structured)
+                    scrape_cache.put(url, structured)
+                    return self.deadline.annotate(structured)
+            
             if not self.driver:
                 if not self.setup_selenium_driver():
                     return {"error": "Failed to setup Selenium driver"}
             
+            self.partial_data = {"error": "Deadline reached before the page was extracted", "url": url, "scraping_method": "selenium_webdriver"}
             print(f"Loading URL: {url}")
-            self.driver.get(url)
+            timed_out = False
+            with self.deadline.stage('navigation'):
+                self.driver.set_page_load_timeout(max(1, self.deadline.budget('navigation', cap=30)))
+                try:
+                    self.driver.get(url)
+                except TimeoutException:
+                    # Out of navigation budget: stop loading and extract whatever has arrived
+                    print(f"Page load for {url} ran out of budget, extracting what has loaded")
+                    self.driver.execute_script("window.stop();")
+                    self.deadline.cut_short('navigation')
+                    timed_out = True
             
             # Wait for page to load
-            time.sleep(3)
+            if not timed_out and self.deadline.allows('readiness'):
+                time.sleep(self.deadline.budget('readiness', cap=3))
+            
+            return self.deadline.annotate(self.extract_loaded_page(url, partial=timed_out))
+                
+        except Exception as e:
+            print(f"Error scraping website: {str(e)}")
+            return {"error": str(e), "url": url, "scraping_method": "selenium_webdriver"}
+    
+    def extract_loaded_page(self, url, partial=False):
+        """Extract content from the page already loaded in the driver's current tab
+
+        partial marks a page whose load was cut off; it is returned flagged but never cached.
+        """
+        with self.deadline.stage('extraction'):
+            result = link_expander.expand_result(self._extract_page_content(url))
+        if partial:
+            result['partial'] = True
+        scrape_cache.put(url, result)
+        # Sample memory once the page is done so leaks on ad-heavy pages trigger a purge or recycle
+        memory_governor.after_page(self.driver, url)
+        chrome_cache.record_page(self.driver, url)
+        return result
+    
+    def partial_result(self):
+        """Whatever the current scrape has gathered so far, flagged as partial"""
+        return self.deadline.annotate(dict(self.partial_data or {"error": "Deadline reached before scraping started"}))
+    
+    def _extract_page_content(self, url):
+        """Dispatch extraction on page type"""
+        try:
+            html = self.driver.page_source
+            page_type = classify_url(url)
+            
+            # Structured data in the rendered page is more accurate than the CSS selector heuristics below
+            metadata = {}
+            if page_type != "twitter_post":
+                structured, metadata = structured_extractor.analyze(html, url, follow_amp=False)
+                if structured:
+                    return structured
             
             # Check if we're on a login/signup page
-            page_source = self.driver.page_source.lower()
-            if any(keyword in page_source for keyword in ['sign in', 'log in', 'login', 'sign up', 'register']):
+            page_source = html.lower()
+            if any(keyword in page_source for keyword in ['sign in', 'log in', 'login', 'sign up', 'register']) and self.deadline.allows('readiness'):
                 print("Detected login/signup page, waiting longer for dynamic content...")
-                time.sleep(5)
-                self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                time.sleep(2)
+                time.sleep(self.deadline.budget('readiness', cap=5))
+                scroll_driver.scroll(self.driver, url, self.deadline.budget('readiness', cap=scroll_driver.budget_seconds))
             
             # Get page title
             page_title = self.driver.title or "No title"
             
-            # Determine page type
-            page_type = "unknown"
-            if "twitter.com" in url or "x.com" in url:
-                page_type = "twitter_post"
-            elif any(news_site in url for news_site in ["freemalaysiatoday.com", "sinchew.com.my", "malaysiakini.com", "thestar.com.my"]):
-                page_type = "news_article"
-            
             # Extract content based on page type
             if page_type == "twitter_post":
                 return self._scrape_twitter_post(url, page_title)
             elif page_type == "news_article":
-                return self._scrape_news_article(url, page_title)
+                result = self._scrape_news_article(url, page_title)
             else:
-                return self._scrape_generic_page(url, page_title)
+                result = self._scrape_generic_page(url, page_title)
+            # Lets the scrape cache revalidate the page later with a plain GET instead of a re-render
+            if metadata.get('digest') and 'error' not in result:
+                result['validators'] = {'digest': metadata['digest']}
+            return result
                 
         except Exception as e:
-            print(f"Error scraping website: {str(e)}")
+            print(f"Error extracting page: {str(e)}")
             return {"error": str(e), "url": url, "scraping_method": "selenium_webdriver"}
     
     def _scrape_twitter_post(self, url, page_title):
@@ -247,12 +384,9 @@ class SimpleWebScraper:
     def _scrape_news_article(self, url, page_title):
         """Scrape news article content"""
         try:
-            # Wait for content to load
-            time.sleep(3)
-            
-            # Scroll to load dynamic content
-            self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(2)
+            # Scroll in viewport steps until lazily loaded content stops arriving
+            if self.deadline.allows('readiness'):
+                scroll_driver.scroll(self.driver, url, self.deadline.budget('readiness', cap=scroll_driver.budget_seconds))
             
             # Extract main content
             main_text = ""
@@ -413,10 +547,10 @@ class SimpleWebScraper:
             return {"error": str(e), "url": url, "scraping_method": "selenium_webdriver"}
     
     def send_result_to_n8n(self, result, original_url, chat_id=None):
-        """Send scraping result back to n8n webhook"""
+        """Queue a scraping result for delivery to the n8n webhook, returning its delivery ID (None if it wasn't accepted)"""
         try:
             payload = {
-                "status": "completed",
+                "status": "partial" if result.get('partial') else "completed",
                 "url": original_url,
                 "result": result,
                 "timestamp": datetime.utcnow().isoformat() + "Z"
@@ -426,20 +560,104 @@ class SimpleWebScraper:
             if chat_id:
                 payload["chatId"] = chat_id
             
-            response = requests.post(
-                self.n8n_webhook_url,
-                json=payload,
-                headers={'Content-Type': 'application/json'},
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                print(f"Successfully sent result to n8n webhook for URL: {original_url}")
-            else:
-                print(f"Failed to send result to n8n webhook. Status: {response.status_code}, Response: {response.text}")
+            # Delivered (with batching, retries and spill-to-disk) on the next delivery_queue.flush()
+            delivery_id = delivery_queue.enqueue(payload)
+            print(f"Queued result for n8n webhook for URL: {original_url}")
+            return delivery_id
                 
         except Exception as e:
-            print(f"Error sending result to n8n webhook: {str(e)}")
+            print(f"Error queueing result for n8n webhook: {str(e)}")
+            return None
+
+
+def _launch_driver():
+    """Create a Chrome driver for the warm browser"""
+    scraper = SimpleWebScraper()
+    return scraper.driver if scraper.setup_selenium_driver() else None
+
+
+def lookup_scrape_cache(urls):
+    """Cached results (e.g. pre-scraped by the feed crawler), keyed by position in urls"""
+    results = {}
+    for index, url in enumerate(urls):
+        cached = scrape_cache.get(url)
+        if cached:
+            results[index] = cached
+    if results:
+        print(f"Scrape cache covered {len(results)} of {len(urls)} URLs")
+    return results
+
+
+def extract_structured_first(urls, deadline):
+    """Results for the URLs whose JSON-LD/AMP structured data suffices, keyed by position in urls"""
+    candidates = [(index, url) for index, url in enumerate(urls) if classify_url(url) != "twitter_post"]
+    if not STRUCTURED_DATA_FIRST or not candidates:
+        return {}
+
+    def fetch(url):
+        # A throttled domain isn't worth the whole budget here; its URLs fall through to rendering
+        with politeness.slot(url, timeout=deadline.budget('navigation', cap=structured_extractor.timeout)):
+            return structured_extractor.extract(url, timeout=deadline.budget('navigation', cap=structured_extractor.timeout))
+
+    results = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(MAX_TABS, len(candidates)), thread_name_prefix='structured') as executor:
+        futures = {executor.submit(fetch, url): index for index, url in candidates}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Structured data extraction failed for {urls[futures[future]]}: {str(e)}")
+                continue
+            if result:
+                index = futures[future]
+                results[index] = link_expander.expand_result(result)
+                scrape_cache.put(urls[index], results[index])
+    print(f"Structured data covered {len(results)} of {len(urls)} URLs; rendering the rest")
+    return results
+
+
+def render_with_warm_browser(urls, deadline):
+    """Scrape URLs as isolated tabs of the shared warm browser"""
+    with warm_browser.lease(blocking=True) as driver:
+        with SimpleWebScraper(driver=driver, deadline=deadline) as scraper:
+            if not scraper.driver and not scraper.setup_selenium_driver():
+                raise Exception("Failed to setup Selenium driver")
+            scheduler = TabScheduler(
+                scraper.driver,
+                scraper.extract_loaded_page,
+                max_tabs=MAX_TABS,
+                tab_timeout=TAB_TIMEOUT_SECONDS,
+                politeness=politeness,
+                deadline=deadline,
+                isolated=TAB_ISOLATED_CONTEXTS
+            )
+            return scheduler.run(urls)
+
+
+def send_result_to_waiters(result, url, chat_id):
+    """Send a result to the requester and to every chatId that coalesced onto the same URL
+
+    Returns the delivery ID of the requester's own result, or None if it could not be queued.
+    """
+    scraper = SimpleWebScraper()
+    delivery_ids = [scraper.send_result_to_n8n(result, url, waiting_chat_id)
+                    for waiting_chat_id in coalescer.complete(url, chat_id) or [None]]
+    return delivery_ids[0]
+
+
+# Launched lazily by the first batch and reused by every later invocation in this container
+warm_browser = WarmBrowser(_launch_driver, governor=memory_governor, chrome_cache=chrome_cache)
+
+# Scheduled feed polling (crawl_handler); feed state shares SCRAPE_CACHE_TABLE when set, /tmp otherwise
+feed_crawler = FeedCrawler(
+    scrape_cache,
+    lambda url, timeout: link_expander.expand_result(structured_extractor.extract(url, timeout=timeout)),
+    sources=FeedCrawler.sources_from_env(),
+    state_store=FeedStateStore(table=scrape_cache.table),
+    politeness=politeness,
+    max_articles_per_run=int(os.environ.get('CRAWL_MAX_ARTICLES_PER_RUN', '40')),
+    max_age_hours=int(os.environ.get('CRAWL_MAX_AGE_HOURS', '48'))
+)
 
 def lambda_handler(event, context):
     """Background scraper Lambda handler"""
@@ -461,12 +679,18 @@ def lambda_handler(event, context):
         
         print(f"Starting background scraping for URL: {url}, chatId: {chat_id}")
         
-        with SimpleWebScraper() as scraper:
+        # Delivery keeps its minimum share of the invocation, so a slow page yields a partial result instead of nothing
+        deadline = Deadline.from_context(context)
+        with SimpleWebScraper(deadline=deadline) as scraper:
             print(f"Scraper initialized, starting scraping...")
-            scraped_data = scraper.scrape_website(url)
+            scraped_data = run_with_deadline(
+                deadline, lambda: scraper.scrape_website(url), scraper.partial_result,
+                leave_seconds=deadline.stages['delivery'][1]
+            )
             print(f"Scraping completed, sending to n8n...")
-            scraper.send_result_to_n8n(scraped_data, url, chat_id)
-            print(f"Result sent to n8n successfully")
+        send_result_to_waiters(scraped_data, url, chat_id)
+        delivery_queue.flush(max_seconds=deadline.budget('delivery'))
+        print(f"Result sent to n8n successfully")
         
         return {
             'statusCode': 200,
@@ -477,9 +701,9 @@ def lambda_handler(event, context):
         print(f"Background scraper error: {str(e)}")
         # Try to send error result to n8n
         try:
-            with SimpleWebScraper() as scraper:
-                error_result = {"error": str(e), "url": event.get('url', ''), "scraping_method": "selenium_webdriver"}
-                scraper.send_result_to_n8n(error_result, event.get('url', ''), event.get('chatId'))
+            error_result = {"error": str(e), "url": event.get('url', ''), "scraping_method": "selenium_webdriver"}
+            send_result_to_waiters(error_result, event.get('url', ''), event.get('chatId'))
+            delivery_queue.flush()
         except:
             pass
         
@@ -487,3 +711,104 @@ def lambda_handler(event, context):
             'statusCode': 500,
             'body': json.dumps({'error': str(e)})
         }
+
+
+def batch_handler(event, context):
+    """SQS batch consumer - scrapes a batch of messages (sized by the event source's BatchSize) through one shared warm browser"""
+    records = event.get('Records', [])
+    print(f"Batch consumer received {len(records)} messages")
+    
+    if len(records) > MAX_BATCH_SIZE:
+        # Handing the extra records back would count a receive against maxReceiveCount without any attempt,
+        # so they are scraped too; the tab scheduler still caps concurrency. Match the event source's BatchSize.
+        print(f"Batch of {len(records)} exceeds MAX_BATCH_SIZE={MAX_BATCH_SIZE}; set the event source BatchSize to match")
+    
+    failures = []
+    jobs = []
+    for record in records:
+        message_id = record.get('messageId')
+        try:
+            body = record.get('body') or '{}'
+            payload = json.loads(body) if isinstance(body, str) else body
+            url = payload.get('url')
+            if not url:
+                raise ValueError('URL is required')
+            receive_count = int(record.get('attributes', {}).get('ApproximateReceiveCount', '1'))
+            jobs.append({
+                'message_id': message_id,
+                'url': url,
+                'chat_id': payload.get('chatId'),
+                'final_attempt': receive_count >= MAX_RECEIVE_COUNT
+            })
+        except Exception as e:
+            print(f"Invalid message {message_id}: {str(e)}")
+            failures.append(message_id)
+    
+    if jobs:
+        urls = [job['url'] for job in jobs]
+        deadline = Deadline.from_context(context)
+        try:
+            ready = lookup_scrape_cache(urls)
+            uncached = [index for index in range(len(urls)) if index not in ready]
+            structured = extract_structured_first([urls[index] for index in uncached], deadline)
+            ready.update({uncached[position]: result for position, result in structured.items()})
+            render_urls = [url for index, url in enumerate(urls) if index not in ready]
+            rendered = iter(render_with_warm_browser(render_urls, deadline) if render_urls else [])
+            results = [ready[index] if index in ready else next(rendered) for index in range(len(urls))]
+            print(f"Politeness queue waits: {json.dumps(politeness.metrics())}")
+            print(f"Scroll steps per domain: {json.dumps(scroll_driver.metrics())}")
+            print(f"Scrape cache: {json.dumps(scrape_cache.metrics())}")
+        except Exception as e:
+            print(f"Batch scraping error: {str(e)}")
+            results = [{"error": str(e), "url": url, "scraping_method": "selenium_webdriver"} for url in urls]
+        
+        # delivery ID -> message ID for each requester's own result
+        own_deliveries = {}
+        for job, result in zip(jobs, results):
+            # Failed scrapes go back to the queue for a retry; the last attempt reports the error instead
+            if 'error' in result and not job['final_attempt']:
+                failures.append(job['message_id'])
+                continue
+            delivery_id = send_result_to_waiters(result, job['url'], job['chat_id'])
+            if delivery_id is None:
+                failures.append(job['message_id'])
+                continue
+            own_deliveries[delivery_id] = job['message_id']
+        
+        # An undelivered requester result fails its message, so SQS (not a /tmp file that dies with
+        # the container) keeps it; results for coalesced chatIds are spilled and retried by the next flush
+        undelivered = delivery_queue.flush(max_seconds=deadline.budget('delivery'), retry_elsewhere=own_deliveries)
+        failures.extend(own_deliveries[delivery_id] for delivery_id in undelivered if delivery_id in own_deliveries)
+        print(json.dumps({'metric': 'deadline', **deadline.report()}))
+    
+    print(f"Batch consumer finished: {len(records) - len(failures)} succeeded, {len(failures)} failed")
+    return {
+        'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failures]
+    }
+
+
+def crawl_handler(event, context):
+    """Scheduled (EventBridge) feed crawl: pre-scrapes new articles into the scrape cache
+
+    {"domains": [...]} limits the run to some outlets; {"force": true} ignores their poll intervals.
+    """
+    event = event or {}
+    deadline = Deadline.from_context(context)
+    stats = feed_crawler.run(deadline=deadline, domains=event.get('domains'), force=bool(event.get('force')))
+    print(f"Structured data fast path: {json.dumps(structured_extractor.metrics())}")
+    return {'statusCode': 200, 'body': json.dumps(stats)}
+
+
+# For local testing
+if __name__ == "__main__":
+    from local_queue import InMemoryQueue
+    
+    def test_local():
+        queue = InMemoryQueue()
+        queue.send_message(json.dumps({"url": "https://www.freemalaysiatoday.com/category/nation/2024/12/19/register-vehicles-for-subsidised-ron95-petrol-transport-companies-told/"}))
+        queue.send_message(json.dumps({"url": "https://www.thestar.com.my/news/nation"}))
+        result = queue.deliver(batch_handler, max_messages=MAX_BATCH_SIZE)
+        print(json.dumps(result, indent=2))
+        print(f"Messages left in queue: {queue.approximate_depth()}")
+    
+    test_local()
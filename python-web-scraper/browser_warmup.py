@@ -0,0 +1,108 @@
+"""
+Init-phase warm-up helpers for the scraper Lambdas
+Launches Chrome while the container is initialising and has it preconnect to the outlets we scrape
+(Chrome keeps its own socket pool, so only connections Chrome opens help its first navigation)
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+# Outlets our users submit most often, plus the social hosts we scrape
+TOP_NEWS_DOMAINS = [
+    'www.freemalaysiatoday.com',
+    'www.sinchew.com.my',
+    'www.malaysiakini.com',
+    'www.thestar.com.my',
+    'x.com',
+    'twitter.com'
+]
+
+
+class WarmBrowser:
+    """Holds one Chrome launched during init and lends it to one request at a time"""
+
+    def __init__(self, driver_factory, preconnect_hosts=None, governor=None, chrome_cache=None):
+        self.driver_factory = driver_factory
+        self.preconnect_hosts = preconnect_hosts or []
+        # Optional BrowserMemoryGovernor; when it flags a recycle the driver is replaced between leases
+        self.governor = governor
+        # Optional ChromeCacheManager; quitting through it folds the driver's static assets into the shared cache
+        self.chrome_cache = chrome_cache
+        self.driver = None
+        self.launched_at = None
+        self._lock = threading.Lock()
+
+    def warm(self):
+        """Launch Chrome and let it preconnect to the hosts we expect to scrape"""
+        try:
+            started = time.time()
+            self.driver = self.driver_factory()
+            if not self.driver:
+                return False
+            self.launched_at = time.time()
+            self._preconnect()
+            print(f"Warm browser ready in {round((self.launched_at - started) * 1000)} ms")
+            return True
+        except Exception as e:
+            print(f"Error warming browser: {str(e)}")
+            self.driver = None
+            return False
+
+    def _preconnect(self):
+        """Ask Chrome to open DNS/TCP/TLS to each host so the first navigation skips the handshake"""
+        if not self.preconnect_hosts:
+            return
+        try:
+            self.driver.execute_script("""
+                for (const host of arguments[0]) {
+                    const link = document.createElement('link');
+                    link.rel = 'preconnect';
+                    link.href = 'https://' + host;
+                    document.head.appendChild(link);
+                }
+            """, self.preconnect_hosts)
+        except Exception as e:
+            print(f"Error preconnecting warm browser: {str(e)}")
+
+    @contextmanager
+    def lease(self, blocking=False):
+        """Yield the warm driver if it is free (launching it if needed), otherwise None"""
+        if not self._lock.acquire(blocking=blocking):
+            yield None
+            return
+        try:
+            if self.driver is None:
+                self.warm()
+            yield self.driver
+        finally:
+            if self.governor and self.governor.needs_recycle(self.driver):
+                driver = self.driver
+                self.discard()
+                self.governor.recycled(driver)
+            else:
+                self._reset()
+            self._lock.release()
+
+    def _reset(self):
+        """Clear per-request state so the next lease starts clean, discarding a dead driver"""
+        if not self.driver:
+            return
+        try:
+            self.driver.delete_all_cookies()
+            self.driver.get('about:blank')
+        except Exception as e:
+            print(f"Warm browser unusable after request, discarding: {str(e)}")
+            self.discard()
+
+    def discard(self):
+        """Quit the current driver; the next lease launches a fresh one"""
+        if self.driver and self.chrome_cache:
+            self.chrome_cache.quit(self.driver)
+        elif self.driver:
+            try:
+                self.driver.quit()
+            except Exception as e:
+                print(f"Error closing warm driver: {e}")
+        self.driver = None
+        self.launched_at = None
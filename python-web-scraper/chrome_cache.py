@@ -0,0 +1,264 @@
+"""
+Managed Chrome disk cache and per-driver profile directories
+Every driver gets its own profile (user data, data path and disk cache) under /tmp/chrome-profiles, so
+concurrent drivers never share a locked directory. Static assets (CSS, JS bundles, fonts) a driver
+fetched are merged into a shared, size-capped store when it quits and copied into the next driver's
+cache, so repeat visits to the same outlets skip most asset downloads. The store evicts LRU entries.
+Live profiles never share files with the store: seeding copies entries out, and only profiles whose
+Chrome has quit are linked back in, so nothing a running Chrome writes can reach another driver.
+Only pages loaded in the default browser context use the disk cache: CDP browser contexts (isolated
+tabs, see tab_scheduler) are off-the-record and keep their HTTP cache in memory.
+"""
+
+import json
+import os
+import re
+import shutil
+import struct
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+# Chrome's simple cache backend: <16 hex>_0 holds the key, _1 and _s hold further streams
+_ENTRY_RE = re.compile(r'^([0-9a-f]{16})_(0|1|s)$')
+_ENTRY_MAGIC = 0xfcfb6d1ba7725c30
+STATIC_EXTENSIONS = ('.css', '.js', '.mjs', '.woff', '.woff2', '.ttf', '.otf', '.eot', '.svg')
+
+# Collected after each page; transferSize 0 with a non-empty body means the response came from cache.
+# Cross-origin resources without Timing-Allow-Origin report zero for both and are left out.
+RESOURCE_TIMING_SCRIPT = """
+    return performance.getEntriesByType('resource').map(e => [e.name, e.transferSize, e.decodedBodySize]);
+"""
+
+
+def is_static_asset(url):
+    """True for CSS, JS and font URLs"""
+    return urlsplit(url).path.lower().endswith(STATIC_EXTENSIONS)
+
+
+def entry_url(path):
+    """URL stored in a simple-cache entry's _0 file, or None if it can't be read"""
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(24)
+            magic, _, key_length, _ = struct.unpack('<QIII', header[:20])
+            if magic != _ENTRY_MAGIC or key_length > 8192:
+                return None
+            key = f.read(key_length).decode('utf-8', 'replace')
+    except (OSError, struct.error):
+        return None
+    # Partitioned keys look like '1/0/_dk_<site> <site> <url>'; the URL is always last
+    return key.rsplit(' ', 1)[-1]
+
+
+class ChromeProfile:
+    """Directories for one driver and the static asset URLs its pages requested"""
+
+    def __init__(self, root):
+        self.root = root
+        self.user_data_dir = os.path.join(root, 'user-data')
+        self.data_path = os.path.join(root, 'data')
+        self.cache_dir = os.path.join(root, 'cache')
+        self.used_urls = set()
+        # Bytes copied in from the shared store: a fixed start-up cost, not growth (see memory_governor)
+        self.seeded_bytes = 0
+        for path in (self.user_data_dir, self.data_path, self.cache_dir):
+            os.makedirs(path, exist_ok=True)
+
+
+class ChromeCacheManager:
+    """Hands out per-driver profiles seeded from a shared LRU store of static assets"""
+
+    def __init__(self, store_dir=None, profiles_root=None, max_store_mb=None):
+        self.store_dir = store_dir or os.environ.get('CHROME_SHARED_CACHE_DIR', '/tmp/chrome-shared-cache')
+        self.profiles_root = profiles_root or os.environ.get('CHROME_PROFILES_DIR', '/tmp/chrome-profiles')
+        self.max_store_bytes = int((max_store_mb or float(os.environ.get('CHROME_SHARED_CACHE_MB', '150'))) * 1024 * 1024)
+        self._profiles = {}
+        self._lock = threading.Lock()
+        self.static_requests = 0
+        self.static_hits = 0
+        os.makedirs(self.store_dir, exist_ok=True)
+        os.makedirs(self.profiles_root, exist_ok=True)
+
+    def new_profile(self):
+        """Create a profile whose disk cache starts with copies of the shared store's entries"""
+        profile = ChromeProfile(os.path.join(self.profiles_root, uuid.uuid4().hex[:12]))
+        with self._lock:
+            names = os.listdir(self.store_dir)
+        for name in names:
+            if not _ENTRY_RE.match(name):
+                continue
+            source, target = os.path.join(self.store_dir, name), os.path.join(profile.cache_dir, name)
+            try:
+                # A copy, not a link: Chrome may rewrite entry files in place, and a link would carry
+                # that write into the store and every other profile seeded from it
+                shutil.copy2(source, target)
+                profile.seeded_bytes += os.path.getsize(target)
+            except OSError:
+                continue
+        return profile
+
+    def seeded_mb(self):
+        """MB of store entries copied into the profiles of drivers still running"""
+        with self._lock:
+            return sum(profile.seeded_bytes for profile in self._profiles.values()) / (1024 * 1024)
+
+    def discard_profile(self, profile):
+        """Delete a profile whose driver never started (e.g. Chrome wasn't found)"""
+        if not profile:
+            return
+        with self._lock:
+            attached = any(attached is profile for attached in self._profiles.values())
+        if not attached:
+            shutil.rmtree(profile.root, ignore_errors=True)
+
+    def chrome_arguments(self, profile):
+        """Chrome switches pointing the driver at its own profile"""
+        return [
+            f'--user-data-dir={profile.user_data_dir}',
+            f'--data-path={profile.data_path}',
+            f'--disk-cache-dir={profile.cache_dir}',
+            f'--disk-cache-size={self.max_store_bytes}'
+        ]
+
+    def attach(self, driver, profile):
+        """Remember which profile a driver was launched with"""
+        with self._lock:
+            self._profiles[id(driver)] = profile
+
+    def record_page(self, driver, url):
+        """Count static-asset cache hits for the page just loaded and note which assets it used"""
+        profile = self._profiles.get(id(driver))
+        try:
+            entries = driver.execute_script(RESOURCE_TIMING_SCRIPT) or []
+        except Exception as e:
+            print(f"Error reading resource timings: {e}")
+            return None
+        requests = hits = 0
+        for name, transfer_size, body_size in entries:
+            if not is_static_asset(name):
+                continue
+            if profile:
+                profile.used_urls.add(name)
+            if body_size:
+                requests += 1
+                hits += transfer_size == 0
+        with self._lock:
+            self.static_requests += requests
+            self.static_hits += hits
+        page_ratio = round(hits / requests, 3) if requests else None
+        print(json.dumps({'metric': 'chrome_cache', 'url': url, 'static_requests': requests,
+                          'static_hits': hits, 'page_hit_ratio': page_ratio, 'hit_ratio': self.hit_ratio()}))
+        return page_ratio
+
+    def quit(self, driver):
+        """Quit a driver and fold its profile back into the shared store"""
+        if not driver:
+            return
+        try:
+            driver.quit()
+        except Exception as e:
+            print(f"Error closing driver: {e}")
+        self.release(driver)
+
+    def release(self, driver):
+        """Merge a quit driver's static assets into the store, delete its profile and enforce the size cap"""
+        with self._lock:
+            profile = self._profiles.pop(id(driver), None)
+        if not profile:
+            return
+        merged = 0
+        try:
+            for name in os.listdir(profile.cache_dir):
+                match = _ENTRY_RE.match(name)
+                if not match or match.group(2) != '0':
+                    continue
+                url = entry_url(os.path.join(profile.cache_dir, name))
+                if not url or not is_static_asset(url):
+                    continue
+                stored = os.path.join(self.store_dir, name)
+                # New assets join the store; assets the driver's pages actually used are marked recently used
+                if os.path.exists(stored) and url not in profile.used_urls:
+                    continue
+                merged += self._merge_entry(profile.cache_dir, match.group(1))
+        except OSError as e:
+            print(f"Error merging Chrome cache: {e}")
+        shutil.rmtree(profile.root, ignore_errors=True)
+        self.evict()
+        print(f"Merged {merged} static cache entries into the shared Chrome cache")
+
+    def _merge_entry(self, cache_dir, entry_hash):
+        """Link every stream file of one entry into the store and stamp it as just used
+
+        Only called for a profile whose Chrome has quit, so the linked files are never written again
+        """
+        now = time.time()
+        linked = 0
+        with self._lock:
+            for suffix in ('0', '1', 's'):
+                source = os.path.join(cache_dir, f'{entry_hash}_{suffix}')
+                if not os.path.exists(source):
+                    continue
+                target = os.path.join(self.store_dir, f'{entry_hash}_{suffix}')
+                tmp_target = target + '.tmp'
+                try:
+                    if os.path.exists(tmp_target):
+                        os.remove(tmp_target)
+                    try:
+                        os.link(source, tmp_target)
+                    except OSError:
+                        shutil.copy2(source, tmp_target)
+                    os.replace(tmp_target, target)
+                    os.utime(target, (now, now))
+                    linked = 1
+                except OSError as e:
+                    print(f"Error storing cache entry {entry_hash}: {e}")
+        return linked
+
+    def evict(self):
+        """Delete least recently used entries until the store is under its size cap"""
+        with self._lock:
+            entries = {}
+            for name in os.listdir(self.store_dir):
+                match = _ENTRY_RE.match(name)
+                if not match:
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.store_dir, name))
+                except OSError:
+                    continue
+                size, last_used = entries.get(match.group(1), (0, 0))
+                entries[match.group(1)] = (size + stat.st_size, max(last_used, stat.st_mtime))
+
+            total = sum(size for size, _ in entries.values())
+            evicted = 0
+            for entry_hash, (size, _) in sorted(entries.items(), key=lambda item: item[1][1]):
+                if total <= self.max_store_bytes:
+                    break
+                for suffix in ('0', '1', 's'):
+                    try:
+                        os.remove(os.path.join(self.store_dir, f'{entry_hash}_{suffix}'))
+                    except OSError:
+                        pass
+                total -= size
+                evicted += 1
+        if evicted:
+            print(f"Evicted {evicted} entries from the shared Chrome cache")
+        return evicted
+
+    def hit_ratio(self):
+        """Share of measurable static-asset requests served from cache so far"""
+        return round(self.static_hits / self.static_requests, 3) if self.static_requests else None
+
+    def metrics(self):
+        """Store size and entry count plus the container's static-asset hit ratio"""
+        with self._lock:
+            names = [name for name in os.listdir(self.store_dir) if _ENTRY_RE.match(name)]
+            size = sum(os.path.getsize(os.path.join(self.store_dir, name)) for name in names)
+        return {
+            'store_mb': round(size / (1024 * 1024), 1),
+            'store_entries': sum(1 for name in names if name.endswith('_0')),
+            'static_requests': self.static_requests,
+            'hit_ratio': self.hit_ratio()
+        }
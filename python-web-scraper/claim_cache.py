@@ -0,0 +1,267 @@
+"""
+Claim-level verification cache
+Verified claims are stored under a normalized fingerprint so recurring claims (the same hoax shared
+across many URLs) are sent to the verifier as already known, and the final structured_verification
+is assembled from cached and freshly verified claims
+"""
+
+import json
+import os
+import re
+import hashlib
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+_URL_RE = re.compile(r'https?://\S+')
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+_SENTENCE_RE = re.compile(r'(?<=[.!?。！？])\s+|\n+')
+# Function words that vary between rewordings of the same claim; Malay ones cover local outlets
+_STOPWORDS = {
+    'a', 'an', 'the', 'and', 'or', 'but', 'of', 'to', 'in', 'on', 'at', 'for', 'by', 'with', 'from', 'as',
+    'is', 'are', 'was', 'were', 'be', 'been', 'being', 'has', 'have', 'had', 'that', 'this', 'these', 'those',
+    'it', 'its', 'will', 'would', 'can', 'could', 'said', 'says', 'claim', 'claims', 'claimed', 'reportedly',
+    'yang', 'dan', 'di', 'ke', 'dari', 'untuk', 'ini', 'itu', 'dengan', 'pada', 'telah', 'akan', 'adalah'
+}
+
+CLAIM_FIELDS = ('claim', 'status', 'confidence', 'summary', 'sources')
+
+
+def claim_tokens(text):
+    """Content words of a claim after Unicode normalization, with URLs, punctuation and stopwords removed"""
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    text = _URL_RE.sub(' ', text)
+    return [word for word in _WORD_RE.findall(text) if word not in _STOPWORDS]
+
+
+def claim_fingerprint(text):
+    """Fingerprint of a claim's content words in order, or None if it has none
+
+    Word order is kept: "A sued B" and "B sued A" share every word but not their verdict
+    """
+    tokens = claim_tokens(text)
+    if not tokens:
+        return None
+    return hashlib.sha1(' '.join(tokens).encode('utf-8')).hexdigest()[:20]
+
+
+def claim_bigrams(tokens):
+    """Adjacent content-word pairs, so containment checks respect who did what to whom"""
+    return set(zip(tokens, tokens[1:]))
+
+
+def split_sentences(scraped_data):
+    """Candidate claim sentences from a scrape result's paragraphs (or main text)"""
+    paragraphs = scraped_data.get('paragraphs') or [scraped_data.get('main_text', '')]
+    sentences = []
+    for paragraph in paragraphs:
+        sentences.extend(s.strip() for s in _SENTENCE_RE.split(paragraph or '') if s.strip())
+    return sentences
+
+
+class ClaimCache:
+    """Verified claims keyed by fingerprint, kept under /tmp and optionally shared through a DynamoDB table
+
+    A cached claim matches an article when one of its sentences has the same fingerprint (verbatim
+    reposts, looked up in DynamoDB too) or contains at least match_containment of the claim's word
+    bigrams; content words are indexed only to find the candidates.
+    """
+
+    def __init__(self, path='/tmp/claim-cache.json', table=None, key_attribute='tweet_id',
+                 ttl_seconds=7 * 24 * 3600, min_confidence=70, match_containment=0.8,
+                 min_claim_tokens=4, max_entries=20000):
+        self.path = path
+        self.table = table
+        self.key_attribute = key_attribute
+        self.ttl_seconds = ttl_seconds
+        self.min_confidence = min_confidence
+        self.match_containment = match_containment
+        self.min_claim_tokens = min_claim_tokens
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._claims = OrderedDict()
+        self._token_index = {}
+        self._load()
+
+    def _load(self):
+        """Load claims cached by earlier invocations in this container"""
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, encoding='utf-8') as f:
+                    for fingerprint, record in json.load(f).items():
+                        self._put_local(fingerprint, record)
+        except Exception as e:
+            print(f"Error loading claim cache: {e}")
+
+    def _save(self):
+        """Persist unexpired claims, keeping only the most recently verified entries"""
+        try:
+            now = time.time()
+            with self._lock:
+                while len(self._claims) > self.max_entries:
+                    self._drop_local(next(iter(self._claims)))
+                snapshot = {fp: record for fp, record in self._claims.items() if record['expires_at'] > now}
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Error saving claim cache: {e}")
+
+    def _put_local(self, fingerprint, record):
+        """Store a record and index its content words for containment matching (caller holds the lock when shared)"""
+        if fingerprint in self._claims:
+            self._drop_local(fingerprint)
+        self._claims[fingerprint] = record
+        for token in set(claim_tokens(record['claim'])):
+            self._token_index.setdefault(token, set()).add(fingerprint)
+
+    def _drop_local(self, fingerprint):
+        """Remove a record and its token index entries"""
+        record = self._claims.pop(fingerprint)
+        for token in set(claim_tokens(record['claim'])):
+            fingerprints = self._token_index.get(token)
+            if fingerprints:
+                fingerprints.discard(fingerprint)
+                if not fingerprints:
+                    del self._token_index[token]
+
+    def _fetch_shared(self, fingerprints):
+        """Look fingerprints up in the shared table and cache whatever is found locally"""
+        if not self.table or not fingerprints:
+            return {}
+        found = {}
+        keys = [{self.key_attribute: f'claim#{fp}'} for fp in fingerprints]
+        try:
+            client = self.table.meta.client
+            for i in range(0, len(keys), 100):
+                request = {self.table.name: {'Keys': keys[i:i + 100]}}
+                # Unprocessed keys are simply treated as misses; the claim gets verified again
+                response = client.batch_get_item(RequestItems=request)
+                for item in response.get('Responses', {}).get(self.table.name, []):
+                    fingerprint = item[self.key_attribute].split('#', 1)[1]
+                    found[fingerprint] = {
+                        **{field: item.get(field) for field in CLAIM_FIELDS},
+                        'confidence': int(item.get('confidence', 0)),
+                        'sources': list(item.get('sources', [])),
+                        'verified_at': item.get('verified_at', ''),
+                        'expires_at': int(item.get('expires_at', 0))
+                    }
+        except Exception as e:
+            print(f"Error reading shared claim cache: {e}")
+        with self._lock:
+            for fingerprint, record in found.items():
+                self._put_local(fingerprint, record)
+        return found
+
+    def match(self, scraped_data):
+        """Unexpired cached claims that appear in a scrape result, each with its fingerprint"""
+        sentences = split_sentences(scraped_data)
+        sentence_fingerprints = {claim_fingerprint(sentence) for sentence in sentences} - {None}
+        now = time.time()
+
+        with self._lock:
+            missing = [fp for fp in sentence_fingerprints if fp not in self._claims]
+        self._fetch_shared(missing)
+
+        matched = {}
+        with self._lock:
+            for fingerprint in sentence_fingerprints:
+                if fingerprint in self._claims:
+                    matched[fingerprint] = self._claims[fingerprint]
+            for sentence in sentences:
+                tokens = claim_tokens(sentence)
+                bigrams = claim_bigrams(tokens)
+                candidates = set()
+                for token in set(tokens):
+                    candidates.update(self._token_index.get(token, ()))
+                for fingerprint in candidates - matched.keys():
+                    record = self._claims[fingerprint]
+                    words = claim_tokens(record['claim'])
+                    pairs = claim_bigrams(words)
+                    if len(words) >= self.min_claim_tokens and pairs and len(pairs & bigrams) / len(pairs) >= self.match_containment:
+                        matched[fingerprint] = record
+            # One claim may be cached under several sentence fingerprints; report it once
+            known = {
+                claim_fingerprint(record['claim']): record
+                for record in matched.values() if record['expires_at'] > now
+            }
+            cached_claims = len(self._claims)
+
+        unique = [{'fingerprint': fp, **record} for fp, record in known.items()]
+        print(json.dumps({'metric': 'claim_cache', 'sentences': len(sentences), 'known_claims': len(unique),
+                          'cached_claims': cached_claims}))
+        return unique
+
+    def store(self, claims, scraped_data=None):
+        """Cache confidently verified claims, also under the fingerprint of the article sentence they came from"""
+        now = int(time.time())
+        sentences = split_sentences(scraped_data or {})
+        records = {}
+        for claim in claims:
+            fingerprint = claim_fingerprint(claim.get('claim', ''))
+            if not fingerprint or claim.get('status', 'UNKNOWN') == 'UNKNOWN' or claim.get('confidence', 0) < self.min_confidence:
+                continue
+            record = {
+                **{field: claim.get(field) for field in CLAIM_FIELDS},
+                'verified_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'expires_at': now + self.ttl_seconds
+            }
+            records[fingerprint] = record
+            source_sentence = self._source_sentence(record['claim'], sentences)
+            if source_sentence:
+                records[claim_fingerprint(source_sentence)] = record
+        if not records:
+            return 0
+
+        with self._lock:
+            for fingerprint, record in records.items():
+                self._put_local(fingerprint, record)
+        self._save()
+        if self.table:
+            try:
+                with self.table.batch_writer(overwrite_by_pkeys=[self.key_attribute]) as batch:
+                    for fingerprint, record in records.items():
+                        batch.put_item(Item={self.key_attribute: f'claim#{fingerprint}', **record})
+            except Exception as e:
+                print(f"Error writing shared claim cache: {e}")
+        return len(records)
+
+    def _source_sentence(self, claim_text, sentences):
+        """Article sentence that best contains the claim's word bigrams, if any contains enough of them"""
+        words = claim_tokens(claim_text)
+        pairs = claim_bigrams(words)
+        if len(words) < self.min_claim_tokens or not pairs:
+            return None
+        best, best_score = None, 0.6
+        for sentence in sentences:
+            score = len(pairs & claim_bigrams(claim_tokens(sentence))) / len(pairs)
+            if score >= best_score:
+                best, best_score = sentence, score
+        return best
+
+    def assemble(self, fresh_claims, known_claims):
+        """structured_verification from fresh claims plus cached claims the verifier didn't re-report"""
+        claims = []
+        seen = set()
+        for claim in fresh_claims:
+            fingerprint = claim_fingerprint(claim.get('claim', ''))
+            seen.add(fingerprint)
+            claims.append({**claim, 'fingerprint': fingerprint, 'cached': False})
+        for record in known_claims:
+            fingerprint = claim_fingerprint(record['claim'])
+            if fingerprint in seen:
+                continue
+            seen.add(fingerprint)
+            claims.append({
+                **{field: record.get(field) for field in CLAIM_FIELDS},
+                'fingerprint': fingerprint,
+                'cached': True,
+                'verified_at': record.get('verified_at', '')
+            })
+        return {
+            'claims': claims,
+            'fresh_claim_count': len(fresh_claims),
+            'cached_claim_count': len(claims) - len(fresh_claims)
+        }
@@ -0,0 +1,184 @@
+"""
+Deadline-aware stage budgets for Lambda invocations
+Splits the invocation's remaining time (context.get_remaining_time_in_millis) across the scrape
+stages in proportion to their weights, keeps a reserve for delivering the result, and lets optional
+stages be skipped once the deadline gets close. A result that had stages skipped or cut short is
+flagged partial, and run_with_deadline returns whatever was gathered before the hard timeout and
+cancels the abandoned work at its next stage boundary.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# (weight, minimum seconds worth starting the stage with, optional); order is the order stages run in
+STAGES = {
+    'navigation': (30, 5.0, False),
+    'readiness': (10, 1.0, True),
+    'extraction': (10, 2.0, False),
+    'persistence': (5, 1.0, False),
+    'verification': (60, 10.0, True),
+    'delivery': (10, 2.0, False)
+}
+# Kept back from every budget so the partial result can still be serialized and returned or delivered
+RESERVE_SECONDS = float(os.environ.get('DEADLINE_RESERVE_SECONDS', '3'))
+
+
+class DeadlineCancelled(Exception):
+    """Raised at a stage boundary once run_with_deadline has given up on the work"""
+
+
+class Deadline:
+    """Remaining-time tracker that hands out per-stage budgets"""
+
+    def __init__(self, remaining_seconds=None, reserve_seconds=None, stages=None):
+        self.started = time.monotonic()
+        # None means no deadline (local runs, backfills): every budget is just the stage's own cap
+        self.expires_at = None if remaining_seconds is None else self.started + remaining_seconds
+        self.reserve_seconds = RESERVE_SECONDS if reserve_seconds is None else reserve_seconds
+        self.stages = stages or STAGES
+        self.skipped = []
+        self.shortened = []
+        self.elapsed = {}
+        self.partial = False
+        self.cancelled = False
+
+    @classmethod
+    def from_context(cls, context, **kwargs):
+        """Deadline for a Lambda context; unbounded when there is no context (local testing)"""
+        if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+            return cls(**kwargs)
+        return cls(context.get_remaining_time_in_millis() / 1000, **kwargs)
+
+    @property
+    def bounded(self):
+        return self.expires_at is not None
+
+    def remaining(self):
+        """Seconds left before the reserve, never negative (infinite when unbounded)"""
+        if self.expires_at is None:
+            return float('inf')
+        return max(0.0, self.expires_at - time.monotonic() - self.reserve_seconds)
+
+    def hard_remaining(self):
+        """Seconds left before the invocation is killed, including the reserve"""
+        if self.expires_at is None:
+            return float('inf')
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def budget(self, stage, cap=None):
+        """Seconds this stage may use: its weighted share of the time left for it and every later stage
+
+        Time earlier stages left unused is in the time left, so it is shared out by weight as well;
+        a stage only gets more than its share to reach its own minimum, and only if the later
+        required stages' minimums still fit.
+        """
+        if self.expires_at is None:
+            return cap if cap is not None else float('inf')
+        names = list(self.stages)
+        later = names[names.index(stage):]
+        remaining = self.remaining()
+        share = remaining * self.stages[stage][0] / sum(self.stages[name][0] for name in later)
+        spare = remaining - sum(self.stages[name][1] for name in later[1:] if not self.stages[name][2])
+        seconds = max(share, min(self.stages[stage][1], spare))
+        if cap is not None and seconds < cap:
+            self.shortened.append(stage)
+        return max(0.0, seconds if cap is None else min(seconds, cap))
+
+    def allows(self, stage):
+        """False when an optional stage should be skipped because too little time is left"""
+        self.check(stage)
+        _, minimum, optional = self.stages[stage]
+        if not optional or self.remaining() >= minimum:
+            return True
+        self.skip(stage)
+        return False
+
+    def cancel(self):
+        """Stop the work at its next stage boundary; the caller has already returned without it"""
+        self.cancelled = True
+
+    def check(self, stage):
+        """Raise DeadlineCancelled instead of starting stage once the work has been given up on"""
+        if self.cancelled:
+            raise DeadlineCancelled(f"Deadline passed, not starting {stage}")
+
+    def cut_short(self, stage):
+        """Record a stage that ran out of budget before it finished; the result becomes partial"""
+        self.shortened.append(stage)
+        self.partial = True
+
+    def skip(self, stage):
+        """Record a stage that did not run; the result becomes partial"""
+        self.skipped.append(stage)
+        self.partial = True
+        print(f"Skipping {stage}: {self.remaining():.1f}s left before the deadline")
+
+    def record(self, stage, seconds):
+        """Add time spent in a stage"""
+        self.elapsed[stage] = round(self.elapsed.get(stage, 0) + seconds, 3)
+
+    @contextmanager
+    def stage(self, name):
+        """Time a stage (raising DeadlineCancelled instead once the work has been given up on)"""
+        self.check(name)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(name, time.monotonic() - started)
+
+    def report(self):
+        """Stage timings and what was skipped or shortened, for the result and the metric line"""
+        return {
+            'partial': self.partial,
+            'skipped_stages': list(self.skipped),
+            'shortened_stages': sorted(set(self.shortened)),
+            'stage_seconds': dict(self.elapsed),
+            'remaining_seconds': None if self.expires_at is None else round(self.hard_remaining(), 2)
+        }
+
+    def annotate(self, result):
+        """Flag a result dict as partial (when it is) and attach the deadline report"""
+        if isinstance(result, dict):
+            if self.partial:
+                result['partial'] = True
+            result['deadline'] = self.report()
+        print(json.dumps({'metric': 'deadline', **self.report()}))
+        return result
+
+
+def run_with_deadline(deadline, work, partial_result, leave_seconds=0):
+    """Run work() but give up before the hard timeout, returning partial_result() flagged as partial
+
+    work runs on a daemon thread; if it is still going when only the reserve (plus leave_seconds, e.g.
+    for delivering the result) is left, the caller gets whatever partial_result() builds from the state
+    gathered so far. The deadline is cancelled, so the abandoned thread raises DeadlineCancelled at its
+    next stage rather than persisting, verifying or driving a browser the caller has since released.
+    """
+    if not deadline.bounded:
+        return work()
+    outcome = {}
+
+    def target():
+        try:
+            outcome['result'] = work()
+        except Exception as e:
+            outcome['error'] = e
+
+    worker = threading.Thread(target=target, name='deadline-work', daemon=True)
+    worker.start()
+    worker.join(max(0.0, deadline.remaining() - leave_seconds))
+    if 'error' in outcome:
+        raise outcome['error']
+    if 'result' in outcome:
+        return outcome['result']
+
+    print(f"Deadline reached with {deadline.hard_remaining():.1f}s left, returning a partial result")
+    deadline.cancel()
+    deadline.partial = True
+    result = partial_result()
+    result['partial'] = True
+    return result
@@ -0,0 +1,294 @@
+"""
+Streaming export of scraped articles and claim verdicts
+Scans the table a page at a time (optionally in parallel segments), reading only the attributes the
+export needs, flattens structured_verification.claims into a claims table, and writes both tables as
+date-partitioned Parquet (when pyarrow is installed) or JSONL.gz files. Memory stays bounded regardless
+of table size: once a writer's buffers pass max_buffer_bytes its largest partitions are written out
+early, so a scan that touches many dates never holds them all until the end.
+
+Usage:
+    python export.py --output /tmp/export --segments 4
+    python export.py --output /tmp/export --format jsonl --since 2026-10-01
+    python export.py --output /tmp/export --local items.jsonl      # from a JSONL export via LocalTable
+
+Output layout:
+    <output>/articles/date=YYYY-MM-DD/part-s00-00000.parquet
+    <output>/claims/date=YYYY-MM-DD/part-s00-00000.parquet
+"""
+
+import argparse
+import gzip
+import json
+import os
+import threading
+import time
+import concurrent.futures
+from decimal import Decimal
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Parquet output is optional; JSONL.gz works everywhere
+    pyarrow = None
+
+# Attributes read from the table; raw verification_response and its verified_* copies are skipped
+SCAN_ATTRIBUTES = (
+    'tweet_id', 'url', 'url_hash', 'scraped_at', 'verified_at', 'page_title', 'author', 'page_type', 'timestamp',
+    'main_text', 'paragraphs', 'links', 'images', 'scraping_method', 'verification_success', 'verdict_status',
+    'structured_verification', 'layout', 'verdict'
+)
+INTERNAL_KEY_PREFIXES = ('lease#', 'claim#', 'body#', 'scrape#', 'feed#')
+
+ARTICLE_COLUMNS = {
+    'tweet_id': 'string', 'url': 'string', 'url_hash': 'string', 'scraped_at': 'string', 'verified_at': 'string',
+    'page_title': 'string', 'author': 'string', 'page_type': 'string', 'timestamp': 'string', 'main_text': 'string',
+    'paragraph_count': 'int64', 'link_count': 'int64', 'image_count': 'int64', 'scraping_method': 'string',
+    'verification_success': 'bool', 'verdict_status': 'string', 'claim_count': 'int64'
+}
+CLAIM_COLUMNS = {
+    'tweet_id': 'string', 'url': 'string', 'scraped_at': 'string', 'claim_index': 'int64', 'claim': 'string',
+    'status': 'string', 'confidence': 'int64', 'summary': 'string', 'sources': 'list<string>',
+    'fingerprint': 'string', 'cached': 'bool'
+}
+
+
+def _plain(value):
+    """DynamoDB Decimal -> int/float, recursively"""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, list):
+        return [_plain(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    return value
+
+
+def flatten(item):
+    """One article row and its claim rows from a stored item"""
+    claims = (item.get('structured_verification') or {}).get('claims', [])
+    article = {
+        **{column: item.get(column) for column in ARTICLE_COLUMNS if column in item},
+        'paragraph_count': len(item.get('paragraphs') or []),
+        'link_count': len(item.get('links') or []),
+        'image_count': len(item.get('images') or []),
+        'claim_count': len(claims) if claims else (item.get('verdict') or {}).get('claim_count', 0)
+    }
+    claim_rows = [
+        {
+            'tweet_id': item.get('tweet_id'),
+            'url': item.get('url'),
+            'scraped_at': item.get('scraped_at'),
+            'claim_index': position,
+            'claim': claim.get('claim'),
+            'status': claim.get('status'),
+            'confidence': int(claim.get('confidence') or 0),
+            'summary': claim.get('summary'),
+            'sources': [str(source) for source in claim.get('sources') or []],
+            'fingerprint': claim.get('fingerprint'),
+            'cached': claim.get('cached')
+        }
+        for position, claim in enumerate(claims)
+    ]
+    return article, claim_rows
+
+
+def _arrow_schema(columns):
+    """Fixed Arrow schema so every part file of a table has identical columns"""
+    types = {'string': pyarrow.string(), 'int64': pyarrow.int64(), 'bool': pyarrow.bool_(),
+             'list<string>': pyarrow.list_(pyarrow.string())}
+    return pyarrow.schema([(name, types[kind]) for name, kind in columns.items()])
+
+
+def _row_bytes(row):
+    """Rough in-memory size of a row, dominated by its text columns"""
+    return 64 + sum(len(value) if isinstance(value, str) else 16 for value in row.values())
+
+
+class PartitionedWriter:
+    """Buffers rows per date partition and writes each full buffer as a new part file
+
+    Buffers are written when a partition reaches rows_per_file rows or, largest first, when all of
+    them together pass max_buffer_bytes.
+    """
+
+    def __init__(self, root, table_name, columns, file_format, prefix, rows_per_file=5000,
+                 max_buffer_bytes=32 * 1024 * 1024):
+        self.root = root
+        self.table_name = table_name
+        self.columns = columns
+        self.file_format = file_format
+        self.prefix = prefix
+        self.rows_per_file = rows_per_file
+        self.max_buffer_bytes = max_buffer_bytes
+        self._schema = _arrow_schema(columns) if file_format == 'parquet' else None
+        self._buffers = {}
+        self._buffer_bytes = {}
+        self._parts = {}
+        self.rows = 0
+        self.bytes_written = 0
+
+    def add(self, partition, row):
+        """Buffer a row, writing the partition's part file once it is full or buffers are over budget"""
+        row = {column: row.get(column) for column in self.columns}
+        buffer = self._buffers.setdefault(partition, [])
+        buffer.append(row)
+        self._buffer_bytes[partition] = self._buffer_bytes.get(partition, 0) + _row_bytes(row)
+        if len(buffer) >= self.rows_per_file:
+            self._write(partition)
+        elif sum(self._buffer_bytes.values()) > self.max_buffer_bytes:
+            # Smaller part files beat unbounded memory; write the biggest buffers until half the budget is free
+            for largest in sorted(self._buffer_bytes, key=self._buffer_bytes.get, reverse=True):
+                self._write(largest)
+                if sum(self._buffer_bytes.values()) <= self.max_buffer_bytes // 2:
+                    break
+
+    def _write(self, partition):
+        """Write and clear one partition's buffer"""
+        rows = self._buffers.pop(partition, [])
+        self._buffer_bytes.pop(partition, None)
+        if not rows:
+            return
+        directory = os.path.join(self.root, self.table_name, f'date={partition}')
+        os.makedirs(directory, exist_ok=True)
+        part = self._parts.get(partition, 0)
+        self._parts[partition] = part + 1
+        extension = 'parquet' if self.file_format == 'parquet' else 'jsonl.gz'
+        path = os.path.join(directory, f'part-{self.prefix}-{part:05d}.{extension}')
+
+        if self.file_format == 'parquet':
+            table = pyarrow.Table.from_pylist(rows, schema=self._schema)
+            pyarrow.parquet.write_table(table, path, compression='zstd')
+        else:
+            with gzip.open(path, 'wt', encoding='utf-8') as f:
+                for row in rows:
+                    f.write(json.dumps(row, ensure_ascii=False) + '\n')
+        self.rows += len(rows)
+        self.bytes_written += os.path.getsize(path)
+
+    def close(self):
+        """Write every partially filled buffer"""
+        for partition in list(self._buffers):
+            self._write(partition)
+
+
+class Exporter:
+    """Streams the table page by page into the articles and claims writers"""
+
+    def __init__(self, table, output, file_format=None, segments=1, page_size=200, rows_per_file=5000,
+                 since=None, with_bodies=True, max_buffer_bytes=32 * 1024 * 1024):
+        self.table = table
+        self.output = output
+        self.file_format = file_format or ('parquet' if pyarrow else 'jsonl')
+        if self.file_format == 'parquet' and not pyarrow:
+            raise RuntimeError('Parquet export needs pyarrow; install it or use --format jsonl')
+        self.segments = segments
+        self.page_size = page_size
+        self.rows_per_file = rows_per_file
+        # Per writer: each segment has an articles and a claims writer
+        self.max_buffer_bytes = max_buffer_bytes
+        self.since = since
+        self.with_bodies = with_bodies
+        self._lock = threading.Lock()
+        self.items = 0
+        self.claims = 0
+        self.bytes_written = 0
+
+    def _pages(self, segment):
+        """Scan pages of one segment, projecting only the exported attributes"""
+        kwargs = {
+            'Limit': self.page_size,
+            'ProjectionExpression': ', '.join(f'#p{i}' for i in range(len(SCAN_ATTRIBUTES))),
+            'ExpressionAttributeNames': {f'#p{i}': name for i, name in enumerate(SCAN_ATTRIBUTES)}
+        }
+        if self.segments > 1:
+            kwargs.update({'Segment': segment, 'TotalSegments': self.segments})
+        while True:
+            response = self.table.scan(**kwargs)
+            yield response.get('Items', [])
+            if 'LastEvaluatedKey' not in response:
+                return
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def _export_segment(self, segment):
+        """Export one scan segment into its own part files"""
+        from item_layout import HotColdItemStore
+
+        item_store = HotColdItemStore(self.table)
+        prefix = f's{segment:02d}'
+        articles = PartitionedWriter(self.output, 'articles', ARTICLE_COLUMNS, self.file_format, prefix,
+                                     self.rows_per_file, self.max_buffer_bytes)
+        claims = PartitionedWriter(self.output, 'claims', CLAIM_COLUMNS, self.file_format, prefix,
+                                   self.rows_per_file, self.max_buffer_bytes)
+        items = 0
+        for page in self._pages(segment):
+            for item in page:
+                if str(item.get('tweet_id', '')).startswith(INTERNAL_KEY_PREFIXES):
+                    continue
+                if self.since and str(item.get('scraped_at', '')) < self.since:
+                    continue
+                if item.get('layout') == 'hot_cold' and self.with_bodies:
+                    item = item_store.get_full(item['tweet_id']) or item
+                article, claim_rows = flatten(_plain(item))
+                partition = str(item.get('scraped_at') or 'unknown')[:10]
+                articles.add(partition, article)
+                for row in claim_rows:
+                    claims.add(partition, row)
+                items += 1
+        articles.close()
+        claims.close()
+        with self._lock:
+            self.items += items
+            self.claims += claims.rows
+            self.bytes_written += articles.bytes_written + claims.bytes_written
+
+    def run(self):
+        """Export every segment in parallel; returns throughput metrics"""
+        started = time.time()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.segments, thread_name_prefix='export') as executor:
+            for future in [executor.submit(self._export_segment, segment) for segment in range(self.segments)]:
+                future.result()
+        elapsed = time.time() - started
+        metrics = {
+            'metric': 'export',
+            'format': self.file_format,
+            'items': self.items,
+            'claims': self.claims,
+            'bytes_written': self.bytes_written,
+            'elapsed_seconds': round(elapsed, 2),
+            'items_per_second': round(self.items / elapsed, 1) if elapsed else 0
+        }
+        print(json.dumps(metrics))
+        return metrics
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export scraped articles and claim verdicts')
+    parser.add_argument('--output', required=True, help='output directory')
+    parser.add_argument('--table', default=os.environ.get('DYNAMODB_TABLE_NAME', 'twitter-scraped-data'))
+    parser.add_argument('--format', choices=('parquet', 'jsonl'), help='default: parquet if pyarrow is installed')
+    parser.add_argument('--segments', type=int, default=1, help='parallel scan segments')
+    parser.add_argument('--page-size', type=int, default=200)
+    parser.add_argument('--rows-per-file', type=int, default=5000)
+    parser.add_argument('--max-buffer-mb', type=int, default=32, help='buffered rows per writer before partitions are written early')
+    parser.add_argument('--since', help="only items with scraped_at >= this ('YYYY-MM-DD[ HH:MM:SS]')")
+    parser.add_argument('--hot-only', action='store_true', help="don't fetch cold bodies of hot/cold items")
+    parser.add_argument('--local', help='export a LocalTable loaded from this JSONL file instead of DynamoDB')
+    args = parser.parse_args(argv)
+
+    if args.local:
+        from backfill import load_local_table
+        table = load_local_table(args.local, args.table)
+    else:
+        import boto3
+        table = boto3.resource('dynamodb').Table(args.table)
+
+    Exporter(
+        table, args.output, file_format=args.format, segments=args.segments, page_size=args.page_size,
+        rows_per_file=args.rows_per_file, since=args.since, with_bodies=not args.hot_only,
+        max_buffer_bytes=args.max_buffer_mb * 1024 * 1024
+    ).run()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
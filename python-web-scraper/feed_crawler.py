@@ -0,0 +1,427 @@
+"""
+Scheduled RSS / news sitemap crawler that pre-scrapes new articles
+Each outlet's feeds and news sitemaps are polled on their own interval with conditional requests
+(If-None-Match / If-Modified-Since), so an unchanged feed costs one 304. Articles that appeared since
+the last poll are extracted over the static structured-data path and stored in the scrape cache,
+where scrape_website finds them when a user later submits the same story.
+"""
+
+import hashlib
+import json
+import os
+import time
+import concurrent.futures
+import xml.etree.ElementTree as ElementTree
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+
+from structured_data import BROWSER_HEADERS
+from url_canon import canonical_url
+
+# Per-outlet feeds, news sitemaps and poll interval; CRAWL_SOURCES (JSON) overrides or adds outlets
+CRAWL_SOURCES = {
+    'freemalaysiatoday.com': {
+        'feeds': ['https://www.freemalaysiatoday.com/feed/'],
+        'sitemaps': ['https://www.freemalaysiatoday.com/news-sitemap.xml'],
+        'interval_minutes': 10
+    },
+    'thestar.com.my': {
+        'feeds': ['https://www.thestar.com.my/rss/News/Nation'],
+        'sitemaps': ['https://www.thestar.com.my/sitemaps/news.xml'],
+        'interval_minutes': 10
+    },
+    'malaysiakini.com': {
+        'feeds': ['https://www.malaysiakini.com/rss/en/news.rss'],
+        'sitemaps': [],
+        'interval_minutes': 15
+    },
+    'sinchew.com.my': {
+        'feeds': ['https://www.sinchew.com.my/feed/'],
+        'sitemaps': [],
+        'interval_minutes': 15
+    }
+}
+DEFAULT_INTERVAL_MINUTES = 15
+FEED_HEADERS = {
+    **BROWSER_HEADERS,
+    'Accept': 'application/rss+xml, application/atom+xml, application/xml;q=0.9, text/xml;q=0.8, */*;q=0.5'
+}
+
+
+def _local(tag):
+    """Element tag without its namespace"""
+    return tag.rsplit('}', 1)[-1] if isinstance(tag, str) else ''
+
+
+def _child_text(element, *names):
+    """Stripped text of the first direct or nested child with one of the local names"""
+    for child in element.iter():
+        if child is not element and _local(child.tag) in names and (child.text or '').strip():
+            return child.text.strip()
+    return ''
+
+
+def _parse_date(value):
+    """Aware datetime from an RFC 822 (RSS) or ISO 8601 (Atom, sitemap) date, or None"""
+    if not value:
+        return None
+    try:
+        parsed = parsedate_to_datetime(value) if value[:1].isalpha() else datetime.fromisoformat(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def parse_feed(content):
+    """(articles, child sitemaps) from RSS, Atom, a sitemap or a sitemap index, each as (url, date or None)"""
+    root = ElementTree.fromstring(content)
+    kind = _local(root.tag)
+    entries, sitemaps = [], []
+    if kind == 'sitemapindex':
+        for sitemap in root:
+            if _local(sitemap.tag) == 'sitemap':
+                loc = _child_text(sitemap, 'loc')
+                if loc:
+                    sitemaps.append((loc, _parse_date(_child_text(sitemap, 'lastmod'))))
+    elif kind == 'urlset':
+        for url in root:
+            if _local(url.tag) == 'url':
+                loc = _child_text(url, 'loc')
+                if loc:
+                    entries.append((loc, _parse_date(_child_text(url, 'publication_date', 'lastmod'))))
+    elif kind == 'feed':
+        for entry in root:
+            if _local(entry.tag) != 'entry':
+                continue
+            links = [link for link in entry if _local(link.tag) == 'link' and link.get('href')]
+            link = next((l for l in links if l.get('rel', 'alternate') == 'alternate'), links[0] if links else None)
+            if link is not None:
+                entries.append((link.get('href').strip(), _parse_date(_child_text(entry, 'published', 'updated'))))
+    else:
+        # RSS 2.0 (<rss><channel><item>) and RSS 1.0 (<rdf:RDF><item>)
+        for item in root.iter():
+            if _local(item.tag) != 'item':
+                continue
+            link = _child_text(item, 'link') or _child_text(item, 'guid')
+            if link.startswith(('http://', 'https://')):
+                entries.append((link, _parse_date(_child_text(item, 'pubDate', 'date'))))
+    return entries, sitemaps
+
+
+class FeedStateStore:
+    """Validators, last poll time and recently seen articles per feed, in a /tmp file or the result table"""
+
+    def __init__(self, path='/tmp/feed-crawler-state.json', table=None, key_attribute='tweet_id'):
+        self.path = path
+        self.table = table
+        self.key_attribute = key_attribute
+        self._states = {}
+        if table is None:
+            try:
+                if os.path.exists(path):
+                    with open(path, encoding='utf-8') as f:
+                        self._states = json.load(f)
+            except Exception as e:
+                print(f"Error loading feed state: {e}")
+
+    def _key(self, feed_url):
+        return {self.key_attribute: f"feed#{hashlib.sha1(feed_url.encode('utf-8')).hexdigest()}"}
+
+    def get(self, feed_url):
+        """State for a feed: etag, last_modified, polled_at and seen URLs"""
+        if feed_url not in self._states and self.table is not None:
+            try:
+                item = self.table.get_item(Key=self._key(feed_url)).get('Item') or {}
+            except Exception as e:
+                print(f"Error reading feed state for {feed_url}: {e}")
+                item = {}
+            self._states[feed_url] = {
+                'etag': item.get('etag'),
+                'last_modified': item.get('last_modified'),
+                'polled_at': int(item.get('polled_at', 0)),
+                'seen': list(item.get('seen', []))
+            }
+        return self._states.setdefault(feed_url, {'etag': None, 'last_modified': None, 'polled_at': 0, 'seen': []})
+
+    def save(self, feed_url):
+        """Persist one feed's state"""
+        state = self._states[feed_url]
+        if self.table is None:
+            try:
+                tmp_path = self.path + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self._states, f)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                print(f"Error saving feed state: {e}")
+            return
+        try:
+            # DynamoDB rejects empty strings and None in some attribute positions, so drop them
+            self.table.put_item(Item={**self._key(feed_url), 'feed_url': feed_url,
+                                      **{k: v for k, v in state.items() if v not in (None, '')}})
+        except Exception as e:
+            print(f"Error saving feed state for {feed_url}: {e}")
+
+
+class FeedCrawler:
+    """Polls due feeds and sitemaps conditionally and pre-scrapes the articles they newly list"""
+
+    def __init__(self, scrape_cache, scrape, sources=None, state_store=None, politeness=None,
+                 max_age_hours=48, max_articles_per_run=40, max_workers=4, max_child_sitemaps=3,
+                 seen_per_feed=500, timeout=10, max_bytes=5 * 1024 * 1024):
+        self.scrape_cache = scrape_cache
+        # scrape(url, timeout) -> result or None; the static structured-data path, never a browser
+        self.scrape = scrape
+        self.sources = sources or CRAWL_SOURCES
+        self.state_store = state_store or FeedStateStore()
+        self.politeness = politeness
+        self.max_age_seconds = max_age_hours * 3600
+        self.max_articles_per_run = max_articles_per_run
+        self.max_workers = max_workers
+        self.max_child_sitemaps = max_child_sitemaps
+        self.seen_per_feed = seen_per_feed
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.session = requests.Session()
+        self.session.headers.update(FEED_HEADERS)
+
+    @staticmethod
+    def sources_from_env():
+        """Site defaults with any JSON overrides from CRAWL_SOURCES merged per domain"""
+        overrides = {}
+        try:
+            overrides = json.loads(os.environ.get('CRAWL_SOURCES', '{}'))
+        except ValueError as e:
+            print(f"Ignoring invalid CRAWL_SOURCES: {e}")
+        sources = {domain: dict(source) for domain, source in CRAWL_SOURCES.items()}
+        for domain, source in overrides.items():
+            sources[domain] = {**sources.get(domain, {}), **source}
+        return sources
+
+    def due_feeds(self, domains=None, force=False):
+        """(domain, feed URL) pairs whose domain's interval has passed since they were last polled"""
+        now = time.time()
+        due = []
+        for domain, source in self.sources.items():
+            if domains and domain not in domains:
+                continue
+            interval = float(source.get('interval_minutes', DEFAULT_INTERVAL_MINUTES)) * 60
+            for feed_url in list(source.get('feeds', [])) + list(source.get('sitemaps', [])):
+                # A little slack so a schedule matching the interval doesn't skip every other run
+                if force or now - self.state_store.get(feed_url)['polled_at'] >= interval - 30:
+                    due.append((domain, feed_url))
+        return due
+
+    def fetch(self, url, state=None):
+        """Conditional GET; returns (status code, body bytes or None, response headers)"""
+        headers = {}
+        if state and state.get('etag'):
+            headers['If-None-Match'] = state['etag']
+        if state and state.get('last_modified'):
+            headers['If-Modified-Since'] = state['last_modified']
+        response = self.session.get(url, headers=headers, timeout=self.timeout, stream=True)
+        try:
+            if response.status_code != 200:
+                return response.status_code, None, response.headers
+            return 200, response.raw.read(self.max_bytes, decode_content=True), response.headers
+        finally:
+            response.close()
+
+    def run(self, deadline=None, domains=None, force=False):
+        """Poll every due feed, pre-scrape new articles into the cache and return the run's metrics"""
+        started = time.time()
+        stats = {
+            'feeds_due': 0, 'feeds_polled': 0, 'not_modified': 0, 'fetch_errors': 0, 'parse_errors': 0,
+            'bytes_fetched': 0, 'fetch_seconds': 0.0, 'parse_seconds': 0.0, 'entries_parsed': 0,
+            'new_articles': 0, 'already_cached': 0, 'prescraped': 0, 'no_structured_data': 0,
+            'prescrape_errors': 0, 'deferred': 0
+        }
+        per_domain = {}
+        due = self.due_feeds(domains, force)
+        stats['feeds_due'] = len(due)
+
+        pending = []
+        for domain, feed_url in due:
+            if deadline is not None and deadline.remaining() < self.timeout:
+                break
+            new = self._poll(feed_url, stats)
+            per_domain.setdefault(domain, {'feeds': 0, 'new_articles': 0, 'prescraped': 0})['feeds'] += 1
+            per_domain[domain]['new_articles'] += len(new)
+            pending.append((domain, feed_url, new))
+
+        # An outlet lists the same story in several feeds and sitemaps; pre-scrape each canonical URL once
+        unique = {}
+        for domain, feed_url, new in pending:
+            for key, url, published in new:
+                unique.setdefault(key, (published, domain, key, url))
+        # Newest first across feeds, so a short run spends its time on the stories users are about to share
+        articles = sorted(
+            unique.values(), key=lambda article: article[0] or datetime.min.replace(tzinfo=timezone.utc), reverse=True
+        )
+        scraped = self._prescrape(articles[:self.max_articles_per_run], deadline, stats, per_domain)
+
+        # A feed's validators are only advanced once all of its new articles were handled; otherwise the
+        # next poll must fetch it in full again (seen URLs are skipped) rather than get a 304 and lose them
+        for domain, feed_url, new in pending:
+            state = self.state_store.get(feed_url)
+            handled = [key for key, _, _ in new if key in scraped]
+            state['seen'] = (state['seen'] + handled)[-self.seen_per_feed:]
+            if len(handled) < len(new):
+                stats['deferred'] += len(new) - len(handled)
+                state['etag'], state['last_modified'] = state.pop('previous_validators', (state['etag'], state['last_modified']))
+            else:
+                state.pop('previous_validators', None)
+            self.state_store.save(feed_url)
+
+        elapsed = time.time() - started
+        stats.update({
+            'fetch_seconds': round(stats['fetch_seconds'], 3),
+            'parse_seconds': round(stats['parse_seconds'], 3),
+            'entries_per_second': round(stats['entries_parsed'] / stats['parse_seconds'], 1) if stats['parse_seconds'] else None,
+            'fetch_mb_per_second': round(stats['bytes_fetched'] / 1e6 / stats['fetch_seconds'], 3) if stats['fetch_seconds'] else None,
+            'elapsed_seconds': round(elapsed, 2),
+            'domains': per_domain
+        })
+        print(json.dumps({'metric': 'feed_crawl', **stats}))
+        return stats
+
+    def _poll(self, feed_url, stats):
+        """Fetch and parse one feed (and a few of its child sitemaps); returns (key, url, published) for its new, fresh articles
+
+        The canonical URL is only the dedup key; the feed's own link is what gets fetched, since
+        canonicalization drops parameters and variants some publishers need to serve the page
+        """
+        state = self.state_store.get(feed_url)
+        now = time.time()
+        state['polled_at'] = int(now)
+        try:
+            fetch_started = time.time()
+            status, content, headers = self.fetch(feed_url, state)
+            stats['fetch_seconds'] += time.time() - fetch_started
+        except Exception as e:
+            print(f"Error fetching feed {feed_url}: {str(e)}")
+            stats['fetch_errors'] += 1
+            return []
+        stats['feeds_polled'] += 1
+        if status == 304:
+            stats['not_modified'] += 1
+            return []
+        if status != 200:
+            print(f"Feed {feed_url} returned {status}")
+            stats['fetch_errors'] += 1
+            return []
+        stats['bytes_fetched'] += len(content)
+        state['previous_validators'] = (state['etag'], state['last_modified'])
+        state['etag'] = headers.get('ETag')
+        state['last_modified'] = headers.get('Last-Modified')
+
+        entries = self._parse(feed_url, content, stats)
+        if entries is None:
+            return []
+        entries, sitemaps = entries
+        # News sitemap indexes list dated children; only the most recently changed are worth reading
+        sitemaps.sort(key=lambda sitemap: sitemap[1] or datetime.min.replace(tzinfo=timezone.utc), reverse=True)
+        for child_url, _ in sitemaps[:self.max_child_sitemaps]:
+            try:
+                fetch_started = time.time()
+                status, child, _ = self.fetch(child_url)
+                stats['fetch_seconds'] += time.time() - fetch_started
+            except Exception as e:
+                print(f"Error fetching sitemap {child_url}: {str(e)}")
+                stats['fetch_errors'] += 1
+                continue
+            if status == 200:
+                stats['bytes_fetched'] += len(child)
+                child_entries = self._parse(child_url, child, stats)
+                if child_entries:
+                    entries.extend(child_entries[0])
+
+        seen = set(state['seen'])
+        new = {}
+        for url, published in entries:
+            if published and now - published.timestamp() > self.max_age_seconds:
+                continue
+            key = canonical_url(url)
+            if key in seen or key in new:
+                continue
+            if self.scrape_cache.contains(url):
+                stats['already_cached'] += 1
+                seen.add(key)
+                state['seen'].append(key)
+                continue
+            new[key] = (key, url, published)
+        stats['new_articles'] += len(new)
+        print(f"Feed {feed_url}: {len(entries)} entries, {len(new)} new")
+        return list(new.values())
+
+    def _parse(self, url, content, stats):
+        """parse_feed with timing; None when the document isn't well-formed XML"""
+        parse_started = time.time()
+        try:
+            entries, sitemaps = parse_feed(content)
+        except ElementTree.ParseError as e:
+            print(f"Error parsing feed {url}: {e}")
+            stats['parse_errors'] += 1
+            return None
+        finally:
+            stats['parse_seconds'] += time.time() - parse_started
+        stats['entries_parsed'] += len(entries)
+        return entries, sitemaps
+
+    def _prescrape(self, articles, deadline, stats, per_domain):
+        """Extract articles concurrently and cache them; returns the canonical keys that were handled"""
+        handled = set()
+        if not articles:
+            return handled
+
+        def work(url):
+            if deadline is not None and deadline.remaining() < self.timeout:
+                return 'deferred'
+            if self.politeness is None:
+                return self.scrape(url, self.timeout)
+            remaining = None if deadline is None else max(0.0, deadline.remaining() - self.timeout)
+            try:
+                with self.politeness.slot(url, timeout=remaining):
+                    return self.scrape(url, self.timeout)
+            except TimeoutError:
+                return 'deferred'
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='prescrape') as executor:
+            futures = {executor.submit(work, url): (domain, key, url) for _, domain, key, url in articles}
+            for future in concurrent.futures.as_completed(futures):
+                domain, key, url = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"Error pre-scraping {url}: {str(e)}")
+                    stats['prescrape_errors'] += 1
+                    continue
+                if result == 'deferred':
+                    continue
+                # Pages without structured data are marked seen too: re-polling won't make them extractable
+                handled.add(key)
+                if result and self.scrape_cache.put(url, result, source='feed_crawler'):
+                    stats['prescraped'] += 1
+                    per_domain[domain]['prescraped'] += 1
+                else:
+                    stats['no_structured_data'] += 1
+        return handled
+
+
+if __name__ == "__main__":
+    from scrape_cache import ScrapeCache
+    from structured_data import StructuredDataExtractor
+
+    def crawl_once():
+        """Poll every configured feed once, keeping the results in memory"""
+        extractor = StructuredDataExtractor()
+        cache = ScrapeCache()
+        crawler = FeedCrawler(cache, extractor.extract, sources=FeedCrawler.sources_from_env(),
+                              state_store=FeedStateStore(path='/tmp/feed-crawler-local-state.json'))
+        stats = crawler.run(force=True)
+        print(json.dumps({k: v for k, v in stats.items() if k != 'domains'}, indent=2))
+        print(f"Scrape cache: {json.dumps(cache.metrics())}")
+
+    crawl_once()
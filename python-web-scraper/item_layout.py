@@ -0,0 +1,135 @@
+"""
+Hot/cold DynamoDB item layout
+A small hot item (IDs, URL, title, verdict summary, timestamps) is what dashboards and dedup checks
+read; the full scrape and verification payload is stored once as compressed JSON in cold body
+records under a 'body#' key prefix, keeping items far below the 400 KB limit and reads cheap
+"""
+
+import json
+import zlib
+from collections import Counter
+from decimal import Decimal
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; zlib is always available
+    zstandard = None
+
+HOT_FIELDS = (
+    'url', 'page_title', 'author', 'page_type', 'timestamp', 'scraped_at', 'scraping_method', 'lambda_ready',
+    'verification_success', 'verification_status_code', 'verified_at',
+    # Secondary index keys (see access_patterns), so index queries return hot items
+    'url_hash', 'date_bucket', 'verdict_status'
+)
+# DynamoDB caps an item at 400 KB; leave room for the key and bookkeeping attributes
+MAX_BODY_PART_BYTES = 350 * 1024
+
+
+def _json_default(value):
+    """Numbers read back from DynamoDB arrive as Decimal"""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return str(value)
+
+
+def compress_body(body, codec=None):
+    """Compress a JSON-serializable body; returns (codec, bytes)"""
+    codec = codec or ('zstd' if zstandard else 'zlib')
+    raw = json.dumps(body, ensure_ascii=False, separators=(',', ':'), default=_json_default).encode('utf-8')
+    if codec == 'zstd':
+        return codec, zstandard.ZstdCompressor(level=6).compress(raw)
+    return 'zlib', zlib.compress(raw, 6)
+
+
+def decompress_body(codec, payload):
+    """Inverse of compress_body"""
+    if codec == 'zstd':
+        if not zstandard:
+            raise RuntimeError('Item body is zstd-compressed but the zstandard package is not installed')
+        raw = zstandard.ZstdDecompressor().decompress(payload)
+    else:
+        raw = zlib.decompress(payload)
+    return json.loads(raw.decode('utf-8'))
+
+
+def verdict_summary(structured_verification):
+    """Compact per-item verdict: claim count, status counts, overall status and lowest confidence"""
+    claims = (structured_verification or {}).get('claims', [])
+    statuses = Counter(claim.get('status', 'UNKNOWN') for claim in claims)
+    return {
+        'claim_count': len(claims),
+        'status_counts': dict(statuses),
+        'overall_status': statuses.most_common(1)[0][0] if statuses else 'UNKNOWN',
+        'min_confidence': min((claim.get('confidence', 0) for claim in claims), default=0)
+    }
+
+
+class HotColdItemStore:
+    """Writes items as a hot item plus compressed cold body parts in the same table"""
+
+    def __init__(self, table, key_attribute='tweet_id', codec=None):
+        self.table = table
+        self.key_attribute = key_attribute
+        self.codec = codec
+
+    def _body_key(self, item_id, part):
+        """Key of one cold body part"""
+        return {self.key_attribute: f'body#{item_id}#{part}'}
+
+    def split(self, item):
+        """Return (hot_item, body_records) for a full item"""
+        item_id = item[self.key_attribute]
+        # Flattened verified_* copies only duplicate verification_response, which the body already holds
+        body = {
+            key: value for key, value in item.items()
+            if key != self.key_attribute and (key == 'verified_at' or not key.startswith('verified_'))
+        }
+        codec, payload = compress_body(body, self.codec)
+        parts = [payload[i:i + MAX_BODY_PART_BYTES] for i in range(0, len(payload), MAX_BODY_PART_BYTES)] or [b'']
+
+        hot = {self.key_attribute: item_id, **{field: item[field] for field in HOT_FIELDS if field in item}}
+        if 'structured_verification' in item or 'verification_success' in item:
+            hot['verdict'] = verdict_summary(item.get('structured_verification'))
+        hot.update({
+            'layout': 'hot_cold',
+            'body_codec': codec,
+            'body_parts': len(parts),
+            'body_bytes': len(payload)
+        })
+        records = [{**self._body_key(item_id, part), 'body': data} for part, data in enumerate(parts)]
+        return hot, records
+
+    def put(self, item):
+        """Write body parts first so the hot item never points at a body that isn't there"""
+        hot, records = self.split(item)
+        with self.table.batch_writer() as batch:
+            for record in records:
+                batch.put_item(Item=record)
+        self.table.put_item(Item=hot)
+        print(f"Saved hot/cold item {hot[self.key_attribute]}: {hot['body_bytes']} compressed body bytes in {hot['body_parts']} part(s)")
+        return hot
+
+    def get_hot(self, item_id):
+        """Only the small hot item (or a legacy single item as-is)"""
+        return self.table.get_item(Key={self.key_attribute: item_id}).get('Item')
+
+    def get_full(self, item_id):
+        """Hot item merged with its decompressed body; legacy single items are returned unchanged"""
+        hot = self.get_hot(item_id)
+        if not hot or hot.get('layout') != 'hot_cold':
+            return hot
+        keys = [self._body_key(item_id, part) for part in range(int(hot['body_parts']))]
+        parts = {}
+        request = {self.table.name: {'Keys': keys}}
+        # One round trip for every part; DynamoDB may hand some keys back unprocessed under load
+        while request:
+            response = self.table.meta.client.batch_get_item(RequestItems=request)
+            for record in response.get('Responses', {}).get(self.table.name, []):
+                body = record['body']
+                parts[record[self.key_attribute]] = bytes(body.value if hasattr(body, 'value') else body)
+            request = response.get('UnprocessedKeys') or None
+        missing = [key[self.key_attribute] for key in keys if key[self.key_attribute] not in parts]
+        if missing:
+            raise KeyError(f"Missing body parts for {item_id}: {missing}")
+        payload = b''.join(parts[key[self.key_attribute]] for key in keys)
+        return {**decompress_body(hot['body_codec'], payload), **hot}
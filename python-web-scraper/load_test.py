@@ -0,0 +1,669 @@
+"""
+Trace-replay load test for the request pipeline
+Replays a recorded or synthetic request trace (arrival times, URL mix, duplicate share) against the
+three lambda_handler functions in this process. n8n, the verifier, DynamoDB, SQS and async Lambda
+invokes are replaced by local stand-ins, and articles come from local fixture sites that carry the
+outlets' politeness policies, so a run measures our own pipeline: throughput, end-to-end latency
+percentiles, concurrency, memory and delivery success. Use it to size Lambda memory and concurrency.
+
+Recorded traces are JSONL, one request per line:
+    {"at": 0.42, "url": "https://...", "handler": "simple", "sync": false, "chatId": "123"}
+where at is seconds from the start of the trace and handler is 'simple', 'aws' or 'background'.
+"""
+
+import argparse
+import base64
+import contextlib
+import gzip
+import importlib
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from memory_governor import _read_proc_status, _descendant_pids
+from politeness import SITE_POLICIES
+from worker_pool import percentile
+
+HANDLERS = ('simple', 'aws', 'background')
+# Loopback addresses standing in for the outlets; each gets that outlet's politeness policy
+FIXTURE_OUTLETS = {
+    '127.0.0.2': 'thestar.com.my',
+    '127.0.0.3': 'freemalaysiatoday.com',
+    '127.0.0.4': 'malaysiakini.com',
+    '127.0.0.5': 'sinchew.com.my'
+}
+VERIFIER_OUTPUT = (
+    "- Claim: The ministry announced the subsidy change on Monday\n- Status: VERIFIED\n- Confidence: 85\n"
+    "- Summary: Matches the ministry's statement\n- Sources: [Bernama] [The Star]\n"
+)
+SENTENCES = (
+    "The ministry said the new measures would take effect at the start of next month.",
+    "Officials told reporters that the details were still being finalised with the states.",
+    "Transport operators have until the end of the year to register their vehicles.",
+    "Opposition lawmakers questioned whether the timeline was realistic for rural operators.",
+    "The announcement follows weeks of consultation with industry groups and consumer associations.",
+    "Analysts expect the change to reduce leakage while keeping prices stable for households."
+)
+
+
+def _quiet_handler(handle):
+    """BaseHTTPRequestHandler subclass that routes every method to handle(request) and doesn't log"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            handle(self)
+
+        def do_POST(self):
+            handle(self)
+
+        def do_HEAD(self):
+            handle(self)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def _serve(host, handle):
+    """Start a threaded HTTP server on an ephemeral port; returns (server, base URL)"""
+    server = ThreadingHTTPServer((host, 0), _quiet_handler(handle))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name=f'serve-{host}', daemon=True).start()
+    return server, f'http://{host}:{server.server_address[1]}'
+
+
+def _respond(request, status, body=b'', content_type='application/json', headers=None):
+    request.send_response(status)
+    request.send_header('Content-Type', content_type)
+    request.send_header('Content-Length', str(len(body)))
+    for name, value in (headers or {}).items():
+        request.send_header(name, value)
+    request.end_headers()
+    if request.command != 'HEAD':
+        request.wfile.write(body)
+
+
+class FixtureSite:
+    """Serves synthetic news articles with ETags, after a configurable latency
+
+    /news/<n> pages carry a JSON-LD body the structured-data path extracts over HTTP; /live/<n> pages
+    have no structured data and build their body in script, so they have to be rendered in Chrome
+    """
+
+    def __init__(self, host, latency_ms=80):
+        self.latency_ms = latency_ms
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.server, self.base_url = _serve(host, self._handle)
+
+    def _handle(self, request):
+        with self._lock:
+            self.requests += 1
+        time.sleep(random.uniform(0.5, 1.5) * self.latency_ms / 1000)
+        match = re.match(r'^/(news|live)/(\d+)', request.path)
+        if not match:
+            _respond(request, 404, b'not found', 'text/plain')
+            return
+        kind, story = match.group(1), int(match.group(2))
+        etag = f'"{kind}-{story}"'
+        if request.headers.get('If-None-Match') == etag:
+            _respond(request, 304, headers={'ETag': etag})
+            return
+        page = self.article(story) if kind == 'news' else self.rendered_article(story)
+        _respond(request, 200, page.encode('utf-8'), 'text/html; charset=utf-8', {'ETag': etag})
+
+    @staticmethod
+    def _paragraphs(story):
+        rng = random.Random(story)
+        paragraphs = [' '.join(rng.choice(SENTENCES) for _ in range(rng.randint(2, 5))) for _ in range(rng.randint(4, 30))]
+        links = ''.join(f'<a href="/news/{rng.randint(1, 10 ** 6)}">Related</a>' for _ in range(5))
+        return paragraphs, links
+
+    def rendered_article(self, story):
+        """The same story as a client-rendered page: no JSON-LD, and the body only exists once its script runs"""
+        paragraphs, links = self._paragraphs(story)
+        return (f'<html><head><title>Story {story}</title></head><body><article id="story"></article>'
+                f'<script>document.getElementById("story").innerHTML = {json.dumps("".join(f"<p>{p}</p>" for p in paragraphs) + links)};'
+                f'</script></body></html>')
+
+    def article(self, story):
+        """Deterministic article page; length varies with the story number like real coverage does"""
+        paragraphs, links = self._paragraphs(story)
+        document = {
+            '@context': 'https://schema.org', '@type': 'NewsArticle',
+            'headline': f'Story {story}: subsidy changes announced', 'datePublished': '2026-10-19T08:00:00+08:00',
+            'author': {'@type': 'Person', 'name': 'Staff Reporter'}, 'publisher': {'@type': 'Organization', 'name': 'Fixture News'},
+            'articleBody': '\n\n'.join(paragraphs)
+        }
+        return (f'<html><head><title>Story {story}</title><script type="application/ld+json">{json.dumps(document)}</script>'
+                f'</head><body><article>{"".join(f"<p>{p}</p>" for p in paragraphs)}{links}</article></body></html>')
+
+
+class Webhooks:
+    """Stand-in n8n webhook (single and batch) and verifier, with configurable latency and error rates"""
+
+    def __init__(self, n8n_latency_ms=150, n8n_error_rate=0.0, verifier_latency_ms=1500, verifier_error_rate=0.0):
+        self.n8n_latency_ms = n8n_latency_ms
+        self.n8n_error_rate = n8n_error_rate
+        self.verifier_latency_ms = verifier_latency_ms
+        self.verifier_error_rate = verifier_error_rate
+        # chatId -> first time a result for it was accepted
+        self.deliveries = {}
+        self.duplicates = 0
+        self.attempts = 0
+        self.errors = 0
+        self.verifications = 0
+        self._lock = threading.Lock()
+        self.server, self.base_url = _serve('127.0.0.1', self._handle)
+
+    def _handle(self, request):
+        length = int(request.headers.get('Content-Length') or 0)
+        body = json.loads(request.rfile.read(length) or b'{}')
+        if request.path == '/verify':
+            time.sleep(random.uniform(0.5, 1.5) * self.verifier_latency_ms / 1000)
+            with self._lock:
+                self.verifications += 1
+            if random.random() < self.verifier_error_rate:
+                _respond(request, 500, b'{"error": "verifier unavailable"}')
+            else:
+                _respond(request, 200, json.dumps({'output': VERIFIER_OUTPUT}).encode('utf-8'))
+            return
+
+        time.sleep(random.uniform(0.5, 1.5) * self.n8n_latency_ms / 1000)
+        with self._lock:
+            self.attempts += 1
+            if random.random() < self.n8n_error_rate:
+                self.errors += 1
+                failed = True
+            else:
+                failed = False
+                now = time.time()
+                for payload in body.get('results', [body]):
+                    chat_id = payload.get('chatId')
+                    if chat_id in self.deliveries:
+                        self.duplicates += 1
+                    elif chat_id:
+                        self.deliveries[chat_id] = now
+        _respond(request, 500 if failed else 200, b'{"error": "n8n unavailable"}' if failed else b'{"ok": true}')
+
+
+class LambdaContext:
+    """The part of the Lambda context the handlers use"""
+
+    def __init__(self, timeout_seconds):
+        self.aws_request_id = str(uuid.uuid4())
+        self._expires_at = time.time() + timeout_seconds
+
+    def get_remaining_time_in_millis(self):
+        return max(0, int((self._expires_at - time.time()) * 1000))
+
+
+class _TableResource:
+    def __init__(self, aws):
+        self.aws = aws
+
+    def Table(self, name):
+        return self.aws.table(name)
+
+
+class StandInAWS:
+    """boto3.resource/boto3.client replacements: LocalTables, async Lambda invokes on a worker pool and an SQS queue"""
+
+    def __init__(self, async_concurrency=10, batch_size=10, visibility_timeout=60):
+        from local_queue import InMemoryQueue
+
+        self.async_concurrency = async_concurrency
+        self.batch_size = batch_size
+        self.queue = InMemoryQueue(visibility_timeout=visibility_timeout)
+        self.background = None
+        self._tables = {}
+        self._lock = threading.Lock()
+        self._async_slots = threading.BoundedSemaphore(async_concurrency)
+        self._threads = []
+        self._running = False
+        self.async_inflight = 0
+        self.async_peak = 0
+        self.async_queue_waits = []
+        self._originals = None
+
+    def table(self, name):
+        from access_patterns import table_definition
+        from local_table import LocalTable
+
+        with self._lock:
+            if name not in self._tables:
+                self._tables[name] = LocalTable(table_definition(name))
+            return self._tables[name]
+
+    def resource(self, service_name, *args, **kwargs):
+        return _TableResource(self)
+
+    def client(self, service_name, *args, **kwargs):
+        # invoke and send_message_batch are the only calls the handlers make
+        return self
+
+    def invoke(self, FunctionName, InvocationType='Event', Payload='{}', **kwargs):
+        """Event invokes run background_scraper_lambda.lambda_handler once an async concurrency slot is free"""
+        queued_at = time.time()
+
+        def run():
+            with self._async_slots:
+                self._async_started(queued_at)
+                try:
+                    self.background.lambda_handler(json.loads(Payload), LambdaContext(900))
+                except Exception as e:
+                    print(f"Stand-in async invoke failed: {e}")
+                finally:
+                    self._async_finished()
+
+        thread = threading.Thread(target=run, name='async-invoke', daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        return {'StatusCode': 202}
+
+    def send_message_batch(self, QueueUrl, Entries, **kwargs):
+        for entry in Entries:
+            self.queue.send_message(entry['MessageBody'])
+        return {'Successful': [{'Id': entry['Id']} for entry in Entries], 'Failed': []}
+
+    def _async_started(self, queued_at):
+        with self._lock:
+            self.async_queue_waits.append(time.time() - queued_at)
+            self.async_inflight += 1
+            self.async_peak = max(self.async_peak, self.async_inflight)
+
+    def _async_finished(self):
+        with self._lock:
+            self.async_inflight -= 1
+
+    def _poll_queue(self):
+        """One SQS event source poller: batches go to batch_handler like the Lambda integration does"""
+        while self._running:
+            records = self.queue.receive_messages(self.batch_size)
+            if not records:
+                time.sleep(0.05)
+                continue
+            self._async_started(min(float(record['attributes']['SentTimestamp']) / 1000 for record in records))
+            try:
+                response = self.background.batch_handler({'Records': records}, LambdaContext(900)) or {}
+            except Exception as e:
+                print(f"Stand-in batch consumer failed: {e}")
+                response = {'batchItemFailures': [{'itemIdentifier': record['messageId']} for record in records]}
+            finally:
+                self._async_finished()
+            failed = {item['itemIdentifier'] for item in response.get('batchItemFailures', [])}
+            for record in records:
+                if record['messageId'] in failed:
+                    self.queue.release_message(record['receiptHandle'])
+                else:
+                    self.queue.delete_message(record['receiptHandle'])
+
+    def install(self):
+        """Point boto3 at the stand-ins (handlers look boto3.resource/client up at call time)"""
+        import boto3
+
+        self._originals = (boto3.resource, boto3.client)
+        boto3.resource, boto3.client = self.resource, self.client
+
+    def start_pollers(self):
+        self._running = True
+        for i in range(self.async_concurrency):
+            thread = threading.Thread(target=self._poll_queue, name=f'sqs-poller-{i}', daemon=True)
+            thread.start()
+
+    def wait_idle(self, timeout):
+        """Wait until no async invoke is running or queued; returns False on timeout"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with self._lock:
+                busy = self.async_inflight or any(thread.is_alive() for thread in self._threads)
+            if not busy and not self.queue.approximate_depth():
+                return True
+            time.sleep(0.1)
+        return False
+
+    def restore(self):
+        import boto3
+
+        self._running = False
+        if self._originals:
+            boto3.resource, boto3.client = self._originals
+
+
+class ResourceSampler:
+    """Samples this process's RSS, its Chrome descendants' RSS and the in-flight request count"""
+
+    def __init__(self, inflight, interval=0.25):
+        self.inflight = inflight
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='resource-sampler', daemon=True)
+
+    def _run(self):
+        pid = os.getpid()
+        while not self._stop.is_set():
+            children = sum(_read_proc_status(child)['rss_mb'] for child in _descendant_pids(pid))
+            self.samples.append((_read_proc_status(pid)['rss_mb'], children, self.inflight()))
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def report(self):
+        if not self.samples:
+            return {}
+        process, children, inflight = zip(*self.samples)
+        baseline = process[0] + children[0]
+        peak_total = max(p + c for p, c in zip(process, children))
+        peak_inflight = max(inflight)
+        return {
+            'rss_baseline_mb': round(baseline, 1),
+            'rss_peak_mb': round(max(process), 1),
+            'chrome_rss_peak_mb': round(max(children), 1),
+            'total_rss_peak_mb': round(peak_total, 1),
+            # Rough per-request memory for sizing: growth over baseline at peak concurrency
+            'rss_per_inflight_mb': round((peak_total - baseline) / peak_inflight, 1) if peak_inflight else None,
+            'concurrency_peak': peak_inflight,
+            'concurrency_mean': round(sum(inflight) / len(inflight), 2)
+        }
+
+
+def synthetic_trace(rate, duration, duplicate_rate=0.3, handler_mix=None, sync_fraction=0.0, base_urls=(), seed=7,
+                    render_share=0.2):
+    """Poisson arrivals at rate req/s for duration seconds; duplicates re-request a recent story like a spike does
+
+    render_share of the stories are pages without structured data, which only Chrome can extract
+    """
+    rng = random.Random(seed)
+    mix = handler_mix or {'simple': 1.0}
+    handlers, weights = list(mix), list(mix.values())
+    trace, recent, at, story = [], [], 0.0, 0
+    while True:
+        at += rng.expovariate(rate)
+        if at >= duration:
+            return trace
+        if recent and rng.random() < duplicate_rate:
+            # Popular stories get shared repeatedly: bias towards the newest ones
+            url = recent[-1 - min(len(recent) - 1, int(rng.expovariate(0.3)))]
+        else:
+            story += 1
+            kind = 'live' if rng.random() < render_share else 'news'
+            url = f'{rng.choice(base_urls)}/{kind}/{story}'
+            recent = (recent + [url])[-50:]
+        handler = rng.choices(handlers, weights)[0]
+        trace.append({'at': round(at, 3), 'url': url, 'handler': handler,
+                      'sync': handler == 'simple' and rng.random() < sync_fraction})
+
+
+def load_trace(path):
+    """Requests from a JSONL trace, sorted by arrival time"""
+    with open(path, encoding='utf-8') as f:
+        trace = [json.loads(line) for line in f if line.strip()]
+    for request in trace:
+        request.setdefault('handler', 'simple')
+        if request['handler'] not in HANDLERS:
+            raise ValueError(f"Unknown handler {request['handler']!r} in trace")
+    return sorted(trace, key=lambda request: float(request['at']))
+
+
+def _decode_body(response):
+    """JSON body of a proxy response, gunzipping base64 bodies"""
+    body = response.get('body') or '{}'
+    if response.get('isBase64Encoded'):
+        raw = base64.b64decode(body)
+        body = gzip.decompress(raw) if response.get('headers', {}).get('Content-Encoding') == 'gzip' else raw
+    return json.loads(body)
+
+
+class LoadTest:
+    """Replays a trace open-loop against the handlers and collects latency, throughput and delivery results"""
+
+    def __init__(self, modules, aws, webhooks, max_concurrency=100, speed=1.0):
+        self.modules = modules
+        self.aws = aws
+        self.webhooks = webhooks
+        self.max_concurrency = max_concurrency
+        self.speed = speed
+        self.inflight = 0
+        self.throttled = 0
+        self.errors = 0
+        self.sync_latencies = {}
+        self.accept_latencies = []
+        self.async_requests = {}
+        self._lock = threading.Lock()
+
+    def _invoke(self, request):
+        chat_id = str(request.get('chatId') or uuid.uuid4())
+        handler = request['handler']
+        started = time.time()
+        try:
+            if handler == 'aws':
+                response = self.modules['aws'].lambda_handler(
+                    {'url': request['url'], 'headers': {'Accept-Encoding': 'gzip'}}, LambdaContext(300)
+                )
+                ok = response.get('statusCode') == 200 and 'error' not in _decode_body(response)
+                self._finish(handler, started, ok)
+            elif handler == 'background':
+                with self._lock:
+                    self.async_requests[chat_id] = (started, handler)
+                self.modules['background'].lambda_handler({'url': request['url'], 'chatId': chat_id}, LambdaContext(900))
+                self._finish(None, started, True)
+            elif request.get('sync'):
+                response = self.modules['simple'].lambda_handler(
+                    {'url': request['url'], 'sync': True, 'headers': {'Accept-Encoding': 'gzip'}}, LambdaContext(30)
+                )
+                ok = response.get('statusCode') == 200 and 'error' not in _decode_body(response)
+                self._finish('simple_sync', started, ok)
+            else:
+                with self._lock:
+                    self.async_requests[chat_id] = (started, handler)
+                response = self.modules['simple'].lambda_handler({'url': request['url'], 'chatId': chat_id}, LambdaContext(30))
+                with self._lock:
+                    self.accept_latencies.append(time.time() - started)
+                self._finish(None, started, response.get('statusCode') == 200)
+        except Exception as e:
+            print(f"Load test request for {request['url']} failed: {e}")
+            self._finish(None, started, False)
+        finally:
+            with self._lock:
+                self.inflight -= 1
+
+    def _finish(self, latency_key, started, ok):
+        with self._lock:
+            if latency_key:
+                self.sync_latencies.setdefault(latency_key, []).append(time.time() - started)
+            if not ok:
+                self.errors += 1
+
+    def current_inflight(self):
+        return self.inflight + self.aws.async_inflight
+
+    def run(self, trace, drain_seconds=120):
+        """Replay the trace and wait for async deliveries; returns the report"""
+        sampler = ResourceSampler(self.current_inflight).start()
+        started = time.time()
+        threads = []
+        for request in trace:
+            delay = started + float(request['at']) / self.speed - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            with self._lock:
+                # Beyond the account's concurrency limit Lambda throttles the invoke
+                if self.inflight >= self.max_concurrency:
+                    self.throttled += 1
+                    continue
+                self.inflight += 1
+            thread = threading.Thread(target=self._invoke, args=(request,), name='request', daemon=True)
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        drained = self.aws.wait_idle(drain_seconds)
+        # Spilled results go out with the next invocation's flush; give them that chance
+        for name in ('simple', 'background'):
+            self.modules[name].delivery_queue.flush()
+        elapsed = time.time() - started
+        sampler.stop()
+        return self.report(trace, elapsed, drained, sampler.report())
+
+    def report(self, trace, elapsed, drained, resources):
+        """Throughput, latency percentiles per path, delivery success and resource use"""
+        delivered = self.webhooks.deliveries
+        async_latencies = {}
+        undelivered = 0
+        for chat_id, (started, handler) in self.async_requests.items():
+            if chat_id in delivered:
+                async_latencies.setdefault(f'{handler}_async', []).append(delivered[chat_id] - started)
+            else:
+                undelivered += 1
+        latencies = {**self.sync_latencies, **async_latencies}
+        all_latencies = [value for values in latencies.values() for value in values]
+        completed = len(all_latencies)
+
+        def summary(values):
+            return {
+                'count': len(values),
+                'p50_s': round(percentile(values, 50), 3),
+                'p95_s': round(percentile(values, 95), 3),
+                'p99_s': round(percentile(values, 99), 3),
+                'max_s': round(max(values), 3) if values else 0.0
+            }
+
+        expected = len(self.async_requests)
+        simple, background = self.modules['simple'], self.modules['background']
+        return {
+            'requests': len(trace),
+            'distinct_urls': len({request['url'] for request in trace}),
+            'throttled': self.throttled,
+            'errors': self.errors,
+            'completed': completed,
+            'elapsed_seconds': round(elapsed, 2),
+            'throughput_rps': round(completed / elapsed, 2) if elapsed else None,
+            'end_to_end': summary(all_latencies),
+            'by_path': {path: summary(values) for path, values in sorted(latencies.items())},
+            'accept_latency': summary(self.accept_latencies),
+            'delivery': {
+                'expected': expected,
+                'delivered': expected - undelivered,
+                'success_ratio': round((expected - undelivered) / expected, 4) if expected else None,
+                'webhook_attempts': self.webhooks.attempts,
+                'webhook_errors': self.webhooks.errors,
+                'duplicate_deliveries': self.webhooks.duplicates,
+                'spilled': simple.delivery_queue.spilled + background.delivery_queue.spilled,
+                'drained': drained
+            },
+            'async_invokes': {
+                'concurrency_peak': self.aws.async_peak,
+                'queue_wait_p95_s': round(percentile(self.aws.async_queue_waits, 95), 3)
+            },
+            'verifier_calls': self.webhooks.verifications,
+            'scrape_cache': {name: module.scrape_cache.metrics() for name, module in self.modules.items()},
+            'resources': resources
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay a request trace against the scraper Lambda handlers in-process')
+    parser.add_argument('--trace', help='JSONL trace to replay (default: a synthetic trace)')
+    parser.add_argument('--write-trace', help='save the synthetic trace here for later replays')
+    parser.add_argument('--rate', type=float, default=2.0, help='synthetic arrivals per second')
+    parser.add_argument('--duration', type=float, default=60, help='synthetic trace length in seconds')
+    parser.add_argument('--duplicate-rate', type=float, default=0.3, help='share of requests for an already requested story')
+    parser.add_argument('--mix', default='simple=1', help="handler weights, e.g. 'simple=0.8,aws=0.2'")
+    parser.add_argument('--render-share', type=float, default=0.2,
+                        help='share of synthetic stories without structured data, so they go through Chrome')
+    parser.add_argument('--sync-fraction', type=float, default=0.0, help="share of 'simple' requests made in sync mode")
+    parser.add_argument('--speed', type=float, default=1.0, help='replay speed multiplier')
+    parser.add_argument('--max-concurrency', type=int, default=100, help='concurrent handler invocations before throttling')
+    parser.add_argument('--async-concurrency', type=int, default=10, help='concurrent background invocations / queue pollers')
+    parser.add_argument('--queue', action='store_true', help='route background work through the SQS batch consumer')
+    parser.add_argument('--visibility-timeout', type=float, default=60,
+                        help='seconds a failed queue message stays hidden before it is retried')
+    parser.add_argument('--page-latency-ms', type=float, default=80)
+    parser.add_argument('--n8n-latency-ms', type=float, default=150)
+    parser.add_argument('--n8n-error-rate', type=float, default=0.0)
+    parser.add_argument('--verifier-latency-ms', type=float, default=1500)
+    parser.add_argument('--verifier-error-rate', type=float, default=0.0)
+    parser.add_argument('--drain-seconds', type=float, default=120, help='how long to wait for async deliveries')
+    parser.add_argument('--log', default='/tmp/load-test.log', help='where handler output goes')
+    parser.add_argument('--output', help='also write the report to this JSON file')
+    args = parser.parse_args(argv)
+
+    sites = [FixtureSite(host, args.page_latency_ms) for host in FIXTURE_OUTLETS]
+    webhooks = Webhooks(args.n8n_latency_ms, args.n8n_error_rate, args.verifier_latency_ms, args.verifier_error_rate)
+    workdir = tempfile.mkdtemp(prefix='load-test-')
+
+    # Read at import by the handler modules, so set before importing them
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-southeast-5')
+    os.environ['VERIFICATION_WEBHOOK_URL'] = f'{webhooks.base_url}/verify'
+    os.environ['SCRAPE_CACHE_TABLE'] = 'load-test-scrape-cache'
+    os.environ['POLITENESS_POLICIES'] = json.dumps({
+        site.base_url.split('//')[1].split(':')[0]: SITE_POLICIES[outlet] for site, outlet in zip(sites, FIXTURE_OUTLETS.values())
+    })
+    for name in ('LINK_CACHE_PATH', 'CLAIM_CACHE_PATH', 'NEAR_DUP_INDEX_PATH', 'SIMILARITY_INDEX_PATH'):
+        os.environ[name] = os.path.join(workdir, name.lower())
+    if args.queue:
+        os.environ['SCRAPE_QUEUE_URL'] = 'https://sqs.local/load-test'
+
+    aws = StandInAWS(async_concurrency=args.async_concurrency, visibility_timeout=args.visibility_timeout)
+    aws.install()
+    with open(args.log, 'w', encoding='utf-8') as log, contextlib.redirect_stdout(log):
+        modules = {
+            'simple': importlib.import_module('simple_scraper_lambda'),
+            'aws': importlib.import_module('aws_lambda_function'),
+            'background': importlib.import_module('background_scraper_lambda')
+        }
+        aws.background = modules['background']
+        from single_flight import InMemoryLeaseStore
+
+        # One lease store across the handlers, standing in for the shared lease table
+        leases = InMemoryLeaseStore()
+        for name in ('simple', 'background'):
+            module = modules[name]
+            module.coalescer.lease_store = leases
+            module.delivery_queue.webhook_url = f'{webhooks.base_url}/n8n'
+            module.delivery_queue.batch_webhook_url = f'{webhooks.base_url}/n8n-batch'
+            module.delivery_queue.spill_path = os.path.join(workdir, f'{name}-undelivered.jsonl')
+        modules['aws'].coalescer.lease_store = leases
+        if args.queue:
+            aws.start_pollers()
+
+        if args.trace:
+            trace = load_trace(args.trace)
+        else:
+            mix = {name: float(weight) for name, weight in (part.split('=') for part in args.mix.split(','))}
+            trace = synthetic_trace(args.rate, args.duration, args.duplicate_rate, mix, args.sync_fraction,
+                                    [site.base_url for site in sites], render_share=args.render_share)
+            if args.write_trace:
+                with open(args.write_trace, 'w', encoding='utf-8') as f:
+                    f.writelines(json.dumps(request) + '\n' for request in trace)
+
+        report = LoadTest(modules, aws, webhooks, args.max_concurrency, args.speed).run(trace, args.drain_seconds)
+        report['page_fetches'] = sum(site.requests for site in sites)
+        print(json.dumps({'metric': 'load_test', **report}))
+    aws.restore()
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 0 if report['delivery']['success_ratio'] in (None, 1.0) and not report['errors'] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
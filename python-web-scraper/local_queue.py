@@ -0,0 +1,90 @@
+"""
+In-memory stand-in for an SQS queue, for exercising the batch consumer locally
+Mirrors the parts of SQS the Lambda event source mapping relies on: visibility timeouts,
+receive counts and partial batch failure reporting
+"""
+
+import threading
+import time
+import uuid
+
+
+class InMemoryQueue:
+    """Minimal SQS-like queue that produces Lambda-shaped batch events"""
+
+    def __init__(self, visibility_timeout=30):
+        self.visibility_timeout = visibility_timeout
+        self._messages = {}
+        self._lock = threading.Lock()
+
+    def send_message(self, body):
+        """Enqueue a message body and return its message ID"""
+        message_id = str(uuid.uuid4())
+        with self._lock:
+            self._messages[message_id] = {
+                'body': body,
+                'receive_count': 0,
+                'visible_at': 0.0,
+                'sent_at': time.time()
+            }
+        return message_id
+
+    def receive_messages(self, max_messages=10):
+        """Return up to max_messages visible messages as SQS event records, hiding them for the visibility timeout"""
+        now = time.time()
+        records = []
+        with self._lock:
+            for message_id, message in self._messages.items():
+                if len(records) >= max_messages:
+                    break
+                if message['visible_at'] > now:
+                    continue
+                message['receive_count'] += 1
+                message['received_at'] = now
+                message['visible_at'] = now + self.visibility_timeout
+                records.append({
+                    'messageId': message_id,
+                    'receiptHandle': message_id,
+                    'body': message['body'],
+                    'attributes': {
+                        'ApproximateReceiveCount': str(message['receive_count']),
+                        'SentTimestamp': str(int(message['sent_at'] * 1000))
+                    },
+                    'eventSource': 'aws:sqs'
+                })
+        return records
+
+    def delete_message(self, receipt_handle):
+        """Remove a message once it has been processed"""
+        with self._lock:
+            self._messages.pop(receipt_handle, None)
+
+    def release_message(self, receipt_handle):
+        """Return a failed message to the queue; like SQS, it stays hidden until its visibility timeout runs out
+
+        SQS doesn't re-deliver messages reported in batchItemFailures early: they reappear
+        visibility_timeout after the receive that failed them.
+        """
+        with self._lock:
+            message = self._messages.get(receipt_handle)
+            if message:
+                message['visible_at'] = message.get('received_at', time.time()) + self.visibility_timeout
+
+    def deliver(self, handler, max_messages=10, context=None):
+        """Run one receive -> handler -> ack cycle, deleting every message not listed in batchItemFailures"""
+        records = self.receive_messages(max_messages)
+        if not records:
+            return {'batchItemFailures': []}
+        response = handler({'Records': records}, context) or {}
+        failed = {item['itemIdentifier'] for item in response.get('batchItemFailures', [])}
+        for record in records:
+            if record['messageId'] in failed:
+                self.release_message(record['receiptHandle'])
+            else:
+                self.delete_message(record['receiptHandle'])
+        return response
+
+    def approximate_depth(self):
+        """Number of messages still in the queue, visible or in flight"""
+        with self._lock:
+            return len(self._messages)
@@ -0,0 +1,211 @@
+"""
+In-memory stand-in for a DynamoDB table, for exercising the storage code locally
+Built from the same create_table definition as the real table, and enforces its key schema: items
+need their primary key, indexes are sparse, and queries must target an index's keys
+"""
+
+import copy
+import re
+import threading
+import zlib
+from contextlib import contextmanager
+
+
+class ValidationException(Exception):
+    """Raised where DynamoDB would reject the request"""
+
+
+def _evaluate(condition, item):
+    """Evaluate a boto3 Key condition against an item; returns (matches, attribute names used)"""
+    expression = condition.get_expression()
+    operator, values = expression['operator'], expression['values']
+    if operator == 'AND':
+        left_match, left_names = _evaluate(values[0], item)
+        right_match, right_names = _evaluate(values[1], item)
+        return left_match and right_match, left_names + right_names
+
+    name = values[0].name
+    value = item.get(name)
+    if value is None:
+        return False, [(name, operator)]
+    if operator == '=':
+        matches = value == values[1]
+    elif operator == '<':
+        matches = value < values[1]
+    elif operator == '<=':
+        matches = value <= values[1]
+    elif operator == '>':
+        matches = value > values[1]
+    elif operator == '>=':
+        matches = value >= values[1]
+    elif operator == 'BETWEEN':
+        matches = values[1] <= value <= values[2]
+    elif operator == 'begins_with':
+        matches = value.startswith(values[1])
+    else:
+        raise ValidationException(f"Unsupported key condition operator: {operator}")
+    return matches, [(name, operator)]
+
+
+class _LocalClient:
+    """The client calls code reaches through Table.meta.client, answered by one LocalTable"""
+
+    def __init__(self, table):
+        self.table = table
+
+    def batch_get_item(self, RequestItems, **kwargs):
+        """Fetch up to 100 items by primary key; missing keys are simply absent from Responses"""
+        responses = {}
+        for table_name, request in RequestItems.items():
+            if table_name != self.table.name:
+                raise ValidationException(f"Requested resource not found: {table_name}")
+            keys = request['Keys']
+            if len(keys) > 100:
+                raise ValidationException('Too many items requested for the BatchGetItem call')
+            responses[table_name] = [
+                item for item in (self.table.get_item(Key=key).get('Item') for key in keys) if item is not None
+            ]
+        return {'Responses': responses, 'UnprocessedKeys': {}}
+
+
+class _LocalMeta:
+    def __init__(self, table):
+        self.client = _LocalClient(table)
+
+
+class LocalTable:
+    """Dict-backed table with the key schema and GSIs of a create_table definition"""
+
+    def __init__(self, definition):
+        self.name = definition['TableName']
+        self.key_schema = self._keys(definition['KeySchema'])
+        self.indexes = {
+            index['IndexName']: self._keys(index['KeySchema'])
+            for index in definition.get('GlobalSecondaryIndexes', [])
+        }
+        self._items = {}
+        self._lock = threading.Lock()
+        self.meta = _LocalMeta(self)
+
+    @staticmethod
+    def _keys(key_schema):
+        """(partition key, sort key or None) from a KeySchema list"""
+        keys = {entry['KeyType']: entry['AttributeName'] for entry in key_schema}
+        return keys['HASH'], keys.get('RANGE')
+
+    def _primary_key(self, item):
+        """Primary key tuple of an item or Key dict, validating it like DynamoDB does"""
+        key = []
+        for name in self.key_schema:
+            if name is None:
+                continue
+            value = item.get(name)
+            if value is None or value == '':
+                raise ValidationException(f"Missing or empty key attribute: {name}")
+            if not isinstance(value, (str, int, bytes)):
+                raise ValidationException(f"Key attribute {name} must be a string, number or binary")
+            key.append(value)
+        return tuple(key)
+
+    def put_item(self, Item, **kwargs):
+        """Insert or replace an item by primary key"""
+        with self._lock:
+            self._items[self._primary_key(Item)] = copy.deepcopy(Item)
+        return {}
+
+    def get_item(self, Key, **kwargs):
+        """Fetch an item by its full primary key"""
+        if set(Key) != {name for name in self.key_schema if name}:
+            raise ValidationException('The provided key element does not match the schema')
+        with self._lock:
+            item = self._items.get(self._primary_key(Key))
+        return {'Item': copy.deepcopy(item)} if item is not None else {}
+
+    def delete_item(self, Key, ReturnValues='NONE', **kwargs):
+        """Delete an item by primary key"""
+        with self._lock:
+            item = self._items.pop(self._primary_key(Key), None)
+        return {'Attributes': item} if item is not None and ReturnValues == 'ALL_OLD' else {}
+
+    def query(self, KeyConditionExpression, IndexName=None, ScanIndexForward=True, Limit=None,
+              ExclusiveStartKey=None, **kwargs):
+        """Key-condition query on the table or a GSI, sorted by the sort key and paginated like DynamoDB"""
+        if IndexName is not None and IndexName not in self.indexes:
+            raise ValidationException(f"The table does not have the specified index: {IndexName}")
+        partition_key, sort_key = self.indexes[IndexName] if IndexName else self.key_schema
+
+        conditions = _evaluate(KeyConditionExpression, {})[1]
+        if not any(name == partition_key and operator == '=' for name, operator in conditions):
+            raise ValidationException(f"Query condition must be an equality on the partition key {partition_key}")
+        for name, _ in conditions:
+            if name not in (partition_key, sort_key):
+                raise ValidationException(f"Query key condition not supported on non-key attribute {name}")
+
+        with self._lock:
+            items = list(self._items.values())
+        # Indexes are sparse: items without the index's key attributes are not in it
+        matched = [
+            item for item in items
+            if item.get(partition_key) is not None and (sort_key is None or item.get(sort_key) is not None)
+            and _evaluate(KeyConditionExpression, item)[0]
+        ]
+        matched.sort(key=lambda item: item.get(sort_key, '') if sort_key else '', reverse=not ScanIndexForward)
+        if ExclusiveStartKey:
+            positions = [i for i, item in enumerate(matched) if self._primary_key(item) == self._primary_key(ExclusiveStartKey)]
+            matched = matched[positions[0] + 1:] if positions else []
+        response = {}
+        if Limit and len(matched) > Limit:
+            matched = matched[:Limit]
+            last = matched[-1]
+            response['LastEvaluatedKey'] = {
+                name: last[name] for name in {*self.key_schema, partition_key, sort_key} if name
+            }
+        response.update({'Items': copy.deepcopy(matched), 'Count': len(matched)})
+        return response
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeNames=None, ExpressionAttributeValues=None, **kwargs):
+        """Apply a 'SET a = :a, #b = :b' update, creating the item if needed (conditions are not evaluated)"""
+        names = ExpressionAttributeNames or {}
+        values = ExpressionAttributeValues or {}
+        match = re.fullmatch(r'\s*SET\s+(.+)', UpdateExpression, re.IGNORECASE | re.DOTALL)
+        if not match:
+            raise ValidationException(f"Only SET update expressions are supported: {UpdateExpression}")
+        with self._lock:
+            key = self._primary_key(Key)
+            item = self._items.setdefault(key, copy.deepcopy(Key))
+            for assignment in match.group(1).split(','):
+                target, _, source = (part.strip() for part in assignment.partition('='))
+                name = names.get(target, target)
+                if name in Key:
+                    raise ValidationException(f"Cannot update attribute {name}. This attribute is part of the key")
+                if source not in values:
+                    raise ValidationException(f"Unsupported update value: {source}")
+                item[name] = copy.deepcopy(values[source])
+        return {}
+
+    def _segment(self, key, total_segments):
+        """Stable scan segment for a primary key"""
+        return zlib.crc32(repr(key).encode('utf-8')) % total_segments
+
+    def scan(self, Limit=None, ExclusiveStartKey=None, Segment=None, TotalSegments=None, **kwargs):
+        """Paginated scan, optionally of one segment of a parallel scan"""
+        if (Segment is None) != (TotalSegments is None):
+            raise ValidationException('Segment and TotalSegments must be provided together')
+        with self._lock:
+            keys = sorted(self._items, key=repr)
+            if TotalSegments:
+                keys = [key for key in keys if self._segment(key, TotalSegments) == Segment]
+            if ExclusiveStartKey:
+                start = self._primary_key(ExclusiveStartKey)
+                keys = keys[keys.index(start) + 1:] if start in keys else [key for key in keys if repr(key) > repr(start)]
+            page = keys[:Limit] if Limit else keys
+            items = [copy.deepcopy(self._items[key]) for key in page]
+        response = {'Items': items, 'Count': len(items)}
+        if Limit and len(keys) > Limit:
+            response['LastEvaluatedKey'] = {name: items[-1][name] for name in self.key_schema if name}
+        return response
+
+    @contextmanager
+    def batch_writer(self, overwrite_by_pkeys=None):
+        """Same shape as Table.batch_writer; writes apply immediately"""
+        yield self
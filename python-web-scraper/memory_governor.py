@@ -0,0 +1,174 @@
+"""
+Browser memory governor for long-lived Chrome drivers
+Samples Chrome/chromedriver RSS and /tmp usage after each page and purges or recycles past thresholds
+"""
+
+import json
+import os
+import time
+import weakref
+from collections import OrderedDict
+
+# Per-driver profiles (see chrome_cache); the shared static-asset store is size-capped on its own.
+# What profiles were seeded with from that store is subtracted (seeded_mb), so only growth counts.
+CHROME_TMP_DIRS = [os.environ.get('CHROME_PROFILES_DIR', '/tmp/chrome-profiles')]
+
+
+def _read_proc_status(pid):
+    """Return VmRSS and VmHWM for a process in MB, or zeros if it has gone away"""
+    values = {'rss_mb': 0.0, 'hwm_mb': 0.0}
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    values['rss_mb'] = int(line.split()[1]) / 1024
+                elif line.startswith('VmHWM:'):
+                    values['hwm_mb'] = int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return values
+
+
+def _descendant_pids(root_pid):
+    """Find every process below root_pid by walking /proc parent links"""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces, so parse after its closing paren
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+            children.setdefault(ppid, []).append(int(entry))
+        except (OSError, ValueError, IndexError):
+            continue
+
+    found = []
+    stack = [root_pid]
+    while stack:
+        for child in children.get(stack.pop(), []):
+            found.append(child)
+            stack.append(child)
+    return found
+
+
+def dir_size_mb(paths):
+    """Disk used by the files under one or more paths in MB, counting each hard-linked inode once"""
+    total = 0
+    seen = set()
+    for path in [paths] if isinstance(paths, str) else paths:
+        for dirpath, _, filenames in os.walk(path):
+            for name in filenames:
+                try:
+                    stat = os.lstat(os.path.join(dirpath, name))
+                except OSError:
+                    continue
+                if stat.st_nlink > 1:
+                    inode = (stat.st_dev, stat.st_ino)
+                    if inode in seen:
+                        continue
+                    seen.add(inode)
+                total += stat.st_size
+    return total / (1024 * 1024)
+
+
+class BrowserMemoryGovernor:
+    """Tracks per-URL memory high-water marks and decides when to purge caches or recycle Chrome"""
+
+    def __init__(self, rss_limit_mb=None, tmp_limit_mb=None, tmp_dirs=None, max_tracked_urls=500, seeded_mb=None):
+        self.rss_limit_mb = rss_limit_mb or float(os.environ.get('CHROME_RSS_RECYCLE_MB', '1200'))
+        self.tmp_limit_mb = tmp_limit_mb or float(os.environ.get('CHROME_TMP_PURGE_MB', '256'))
+        self.tmp_dirs = tmp_dirs or CHROME_TMP_DIRS
+        # Optional callable (ChromeCacheManager.seeded_mb): profile bytes copied from the shared store,
+        # which a purge or recycle can't reduce below and so don't count against tmp_limit_mb
+        self.seeded_mb = seeded_mb
+        self.max_tracked_urls = max_tracked_urls
+        self.high_water_marks = OrderedDict()
+        self.peak_rss_mb = 0.0
+        # Drivers flagged for recycling; the governor is shared by the warm browser and dedicated drivers
+        self._recycle_due = weakref.WeakSet()
+
+    def sample(self, driver):
+        """Measure chromedriver RSS, Chrome RSS across its processes and Chrome's /tmp usage"""
+        chromedriver_rss = chrome_rss = chrome_hwm = 0.0
+        try:
+            driver_pid = driver.service.process.pid
+            chromedriver_rss = _read_proc_status(driver_pid)['rss_mb']
+            for pid in _descendant_pids(driver_pid):
+                status = _read_proc_status(pid)
+                chrome_rss += status['rss_mb']
+                chrome_hwm = max(chrome_hwm, status['hwm_mb'])
+        except Exception as e:
+            print(f"Error sampling browser memory: {e}")
+
+        return {
+            'chromedriver_rss_mb': round(chromedriver_rss, 1),
+            'chrome_rss_mb': round(chrome_rss, 1),
+            'chrome_hwm_mb': round(chrome_hwm, 1),
+            'total_rss_mb': round(chromedriver_rss + chrome_rss, 1),
+            'tmp_mb': round(self.tmp_usage_mb(), 1)
+        }
+
+    def tmp_usage_mb(self):
+        """Chrome's /tmp usage beyond what its profiles were seeded with"""
+        seeded = self.seeded_mb() if self.seeded_mb else 0.0
+        return max(0.0, dir_size_mb(self.tmp_dirs) - seeded)
+
+    def after_page(self, driver, url):
+        """Sample after a page, record its high-water mark and act on thresholds; returns the action taken"""
+        if not driver:
+            return None
+        sample = self.sample(driver)
+        self._record(url, sample)
+
+        action = None
+        if sample['tmp_mb'] >= self.tmp_limit_mb:
+            action = 'purge'
+            self.purge_caches(driver)
+            if self.tmp_usage_mb() >= self.tmp_limit_mb:
+                action = 'recycle'
+        if sample['total_rss_mb'] >= self.rss_limit_mb:
+            action = 'recycle'
+        if action == 'recycle':
+            self._recycle_due.add(driver)
+
+        print(json.dumps({'metric': 'browser_memory', 'url': url, 'action': action, **sample}))
+        return action
+
+    def _record(self, url, sample):
+        """Keep the highest sample seen for each URL, bounded to the most recent URLs"""
+        previous = self.high_water_marks.pop(url, None)
+        if previous and previous['total_rss_mb'] > sample['total_rss_mb']:
+            sample = previous
+        else:
+            sample = {**sample, 'sampled_at': time.time()}
+        self.high_water_marks[url] = sample
+        while len(self.high_water_marks) > self.max_tracked_urls:
+            self.high_water_marks.popitem(last=False)
+        self.peak_rss_mb = max(self.peak_rss_mb, sample['total_rss_mb'])
+
+    def purge_caches(self, driver):
+        """Drop Chrome's HTTP cache in place without restarting the browser"""
+        try:
+            driver.execute_cdp_cmd('Network.clearBrowserCache', {})
+            print("Cleared Chrome browser cache")
+        except Exception as e:
+            print(f"Error clearing Chrome cache: {e}")
+
+    def needs_recycle(self, driver):
+        """True if driver crossed a threshold and should be quit rather than reused"""
+        return driver is not None and driver in self._recycle_due
+
+    def recycled(self, driver):
+        """Clear driver's recycle flag after it has been quit; its profile is deleted on release"""
+        if driver not in self._recycle_due:
+            return
+        self._recycle_due.discard(driver)
+        print(f"Browser recycled, container peak RSS so far: {self.peak_rss_mb} MB")
+
+    def export_high_water_marks(self):
+        """Return per-URL memory high-water marks, e.g. for sizing Lambda memory"""
+        return {
+            'peak_rss_mb': self.peak_rss_mb,
+            'urls': dict(self.high_water_marks)
+        }
@@ -0,0 +1,194 @@
+"""
+Batched, retrying delivery of scrape results to the n8n webhook
+Results are buffered and posted in batches (when a batch webhook is configured) with exponential
+backoff; anything still undelivered is spilled to a JSONL file under /tmp and retried on the next flush,
+until it has been through max_flushes flushes or is max_age_seconds old
+"""
+
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+
+import requests
+
+from api_response import dumps
+from worker_pool import percentile
+
+# _post_with_retry outcome for a 4xx: the webhook will never accept this payload as sent
+REJECTED = 'rejected'
+
+
+class N8nDeliveryQueue:
+    """Buffers webhook payloads and delivers them in batches with retry, backoff and spill-to-disk"""
+
+    def __init__(self, webhook_url, batch_webhook_url=None, max_batch_size=10, max_attempts=3,
+                 backoff_base=0.5, request_timeout=10, max_flush_seconds=20,
+                 spill_path='/tmp/n8n-undelivered.jsonl', max_flushes=10, max_age_seconds=24 * 3600):
+        self.webhook_url = webhook_url
+        # Optional endpoint that accepts {"results": [...]}; without it each payload is posted on its own
+        self.batch_webhook_url = batch_webhook_url
+        self.max_batch_size = max_batch_size
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.request_timeout = request_timeout
+        self.max_flush_seconds = max_flush_seconds
+        self.spill_path = spill_path
+        # Payloads the webhook keeps refusing are dropped after this rather than re-spilled forever
+        self.max_flushes = max_flushes
+        self.max_age_seconds = max_age_seconds
+        self.session = requests.Session()
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._latencies = deque(maxlen=200)
+        self.delivered = 0
+        self.spilled = 0
+        self.dropped = 0
+
+    def enqueue(self, payload):
+        """Buffer a payload for delivery and return its delivery ID"""
+        entry = {'id': str(uuid.uuid4()), 'payload': payload, 'enqueued_at': time.time()}
+        with self._lock:
+            self._buffer.append(entry)
+        return entry['id']
+
+    def flush(self, max_seconds=None, retry_elsewhere=()):
+        """Deliver buffered and previously spilled payloads; returns the IDs that were not delivered
+
+        max_seconds shortens the flush budget, e.g. to what is left before the Lambda deadline.
+        Undelivered payloads whose IDs are in retry_elsewhere are not spilled: the caller retries
+        them itself, e.g. by reporting their SQS message as a batch item failure.
+        """
+        started = time.time()
+        budget = self.max_flush_seconds if max_seconds is None else min(max_seconds, self.max_flush_seconds)
+        with self._lock:
+            entries, self._buffer = self._buffer, []
+        entries = self._take_spilled() + entries
+
+        undelivered = []
+        rejected = set()
+        step = self.max_batch_size if self.batch_webhook_url else 1
+        for i in range(0, len(entries), step):
+            batch = entries[i:i + step]
+            # Once the flush budget is spent the rest goes straight to disk rather than blocking the worker
+            outcome = time.time() - started <= budget and self._post_with_retry(batch, started, budget)
+            if outcome is not True:
+                undelivered.extend(batch)
+                # A 4xx for a batch can't be pinned on one payload; only a single payload is known to be poison
+                if outcome == REJECTED and len(batch) == 1:
+                    rejected.add(batch[0]['id'])
+                continue
+            now = time.time()
+            self.delivered += len(batch)
+            for entry in batch:
+                self._latencies.append(now - entry['enqueued_at'])
+
+        retry_elsewhere = set(retry_elsewhere)
+        to_spill = []
+        now = time.time()
+        for entry in undelivered:
+            if entry['id'] in retry_elsewhere:
+                continue
+            entry['flushes'] = entry.get('flushes', 0) + 1
+            if entry['id'] in rejected or entry['flushes'] >= self.max_flushes or now - entry['enqueued_at'] > self.max_age_seconds:
+                self.dropped += 1
+                print(f"Dropping n8n result {entry['id']} after {entry['flushes']} flushes: "
+                      f"{'rejected by the webhook' if entry['id'] in rejected else 'retries exhausted'}")
+                continue
+            to_spill.append(entry)
+        if to_spill:
+            self._spill(to_spill)
+        print(json.dumps({'metric': 'n8n_delivery', **self.metrics()}))
+        return [entry['id'] for entry in undelivered]
+
+    def _post_with_retry(self, batch, flush_started, budget):
+        """POST one batch, retrying 5xx/connection errors with exponential backoff and jitter
+
+        Returns True once delivered, REJECTED for a 4xx other than 429, False when retries ran out.
+        """
+        if self.batch_webhook_url:
+            url, body = self.batch_webhook_url, {'results': [entry['payload'] for entry in batch]}
+        else:
+            url, body = self.webhook_url, batch[0]['payload']
+        # Serialized once for every attempt rather than by requests on each retry
+        data = dumps(body)
+
+        for attempt in range(self.max_attempts):
+            try:
+                response = self.session.post(
+                    url,
+                    data=data,
+                    headers={'Content-Type': 'application/json; charset=utf-8'},
+                    timeout=max(1.0, min(self.request_timeout, budget - (time.time() - flush_started)))
+                )
+                if response.status_code == 200:
+                    return True
+                print(f"n8n delivery attempt {attempt + 1} failed. Status: {response.status_code}, Response: {response.text[:200]}")
+                if response.status_code < 500 and response.status_code != 429:
+                    return REJECTED
+            except Exception as e:
+                print(f"n8n delivery attempt {attempt + 1} error: {str(e)}")
+
+            delay = self.backoff_base * (2 ** attempt) * (0.5 + random.random())
+            if attempt + 1 >= self.max_attempts or time.time() - flush_started + delay > budget:
+                break
+            time.sleep(delay)
+        return False
+
+    def _spill(self, entries):
+        """Append undelivered entries to the spill file"""
+        try:
+            with self._spill_lock:
+                with open(self.spill_path, 'a', encoding='utf-8') as f:
+                    for entry in entries:
+                        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self.spilled += len(entries)
+            print(f"Spilled {len(entries)} undelivered n8n results to {self.spill_path}")
+        except Exception as e:
+            print(f"Error spilling n8n results, {len(entries)} results lost: {str(e)}")
+
+    def _take_spilled(self):
+        """Read and remove everything in the spill file so it can be retried"""
+        with self._spill_lock:
+            if not os.path.exists(self.spill_path):
+                return []
+            entries = []
+            try:
+                with open(self.spill_path, encoding='utf-8') as f:
+                    for line in f:
+                        if line.strip():
+                            entries.append(json.loads(line))
+                os.remove(self.spill_path)
+            except Exception as e:
+                print(f"Error reading n8n spill file: {str(e)}")
+                return []
+        if entries:
+            print(f"Retrying {len(entries)} spilled n8n results")
+        return entries
+
+    def backlog(self):
+        """Payloads waiting in memory plus those spilled to disk"""
+        with self._lock:
+            buffered = len(self._buffer)
+        spilled = 0
+        with self._spill_lock:
+            if os.path.exists(self.spill_path):
+                with open(self.spill_path, encoding='utf-8') as f:
+                    spilled = sum(1 for line in f if line.strip())
+        return {'buffered': buffered, 'spilled': spilled}
+
+    def metrics(self):
+        """Delivery counters, backlog and enqueue-to-delivery latency percentiles in seconds"""
+        latencies = list(self._latencies)
+        return {
+            'delivered': self.delivered,
+            'spilled_total': self.spilled,
+            'dropped_total': self.dropped,
+            **{f'backlog_{key}': value for key, value in self.backlog().items()},
+            'latency_p50_s': round(percentile(latencies, 50), 3),
+            'latency_p95_s': round(percentile(latencies, 95), 3)
+        }
@@ -0,0 +1,317 @@
+"""
+Near-duplicate article detection with MinHash and LSH banding
+Wire stories republished with small edits map to the same LSH buckets, so a stored verification from
+the closest earlier copy can be reused instead of running a full verification again
+"""
+
+import gzip
+import json
+import os
+import re
+import time
+import zlib
+
+import numpy as np
+
+# Largest prime below 2**32; with 32-bit shingle hashes and coefficients a*x + b stays inside uint64
+_PRIME = np.uint64(4294967291)
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def shingle_hashes(paragraphs, k=5):
+    """32-bit hashes of the k-word shingles across all paragraphs"""
+    hashes = set()
+    for paragraph in paragraphs:
+        words = _WORD_RE.findall(paragraph.lower())
+        for i in range(max(1, len(words) - k + 1)):
+            hashes.add(zlib.crc32(' '.join(words[i:i + k]).encode('utf-8')))
+    return np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+
+
+class MinHasher:
+    """Computes fixed-length MinHash signatures with one vectorized pass over all permutations"""
+
+    def __init__(self, num_perm=128, seed=1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self._a = rng.randint(1, int(_PRIME), size=(num_perm, 1), dtype=np.uint64)
+        self._b = rng.randint(0, int(_PRIME), size=(num_perm, 1), dtype=np.uint64)
+
+    def signature(self, hashes):
+        """MinHash signature (uint32 array of num_perm) for a set of shingle hashes"""
+        if len(hashes) == 0:
+            return np.full(self.num_perm, np.iinfo(np.uint32).max, dtype=np.uint32)
+        permuted = (self._a * hashes[np.newaxis, :] + self._b) % _PRIME
+        return permuted.min(axis=1).astype(np.uint32)
+
+
+class NearDuplicateIndex:
+    """MinHash LSH index of verified articles, persisted under /tmp (and optionally S3) between invocations
+
+    Each verified article is appended to journal.jsonl, so a save costs one record rather than a rewrite
+    of every payload; the journal is folded into the signatures.npy/documents.json snapshot every
+    compact_every records. The S3 copy is a single merged snapshot: at most every s3_sync_seconds a
+    container downloads it, merges in its own articles and writes it back conditionally on the ETag it
+    read, so concurrent containers add to the shared index instead of overwriting each other's articles.
+    """
+
+    S3_KEY = 'near-dup-index/snapshot.json.gz'
+
+    def __init__(self, path='/tmp/near-dup-index', num_perm=128, bands=32, threshold=0.8,
+                 min_shingles=20, max_docs=50000, s3_bucket=None, compact_every=1000, s3_sync_seconds=300):
+        if num_perm % bands:
+            raise ValueError('num_perm must be divisible by bands')
+        self.path = path
+        self.hasher = MinHasher(num_perm)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.min_shingles = min_shingles
+        self.max_docs = max_docs
+        self.s3_bucket = s3_bucket
+        self.compact_every = compact_every
+        self.s3_sync_seconds = s3_sync_seconds
+        self.doc_ids = []
+        self.payloads = []
+        self.added_at = []
+        self._signatures = np.empty((0, num_perm), dtype=np.uint32)
+        self._pending = []
+        self._buckets = [dict() for _ in range(bands)]
+        self._unsaved = []
+        self._journal_records = 0
+        self._unsynced = 0
+        self._last_sync = time.time()
+        self.load()
+
+    def signature_for(self, scraped_data):
+        """Signature for a scrape result, or None if it has too little text to compare reliably"""
+        paragraphs = scraped_data.get('paragraphs') or [scraped_data.get('main_text', '')]
+        hashes = shingle_hashes([p for p in paragraphs if p])
+        if len(hashes) < self.min_shingles:
+            return None
+        return self.hasher.signature(hashes)
+
+    def _band_keys(self, signature):
+        """One hashable key per LSH band"""
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def _signature_matrix(self):
+        """All stored signatures as one array, folding in any added since the last call"""
+        if self._pending:
+            self._signatures = np.vstack([self._signatures] + self._pending)
+            self._pending = []
+        return self._signatures
+
+    def add(self, doc_id, signature, payload, added_at=None):
+        """Index a verified article's signature together with the verification to reuse"""
+        signature = np.asarray(signature, dtype=np.uint32)
+        position = len(self.doc_ids)
+        self.doc_ids.append(doc_id)
+        self.payloads.append(payload)
+        self.added_at.append(added_at or time.time())
+        self._pending.append(signature[np.newaxis, :])
+        self._unsaved.append(position)
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band].setdefault(key, []).append(position)
+
+    def query(self, signature):
+        """Closest indexed article above the similarity threshold as (doc_id, similarity, payload), or None"""
+        candidates = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            candidates.update(self._buckets[band].get(key, ()))
+        if not candidates:
+            return None
+
+        positions = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        # Fraction of agreeing MinHash slots estimates the Jaccard similarity of the shingle sets
+        similarities = (self._signature_matrix()[positions] == signature).mean(axis=1)
+        best = int(similarities.argmax())
+        if similarities[best] < self.threshold:
+            return None
+        position = int(positions[best])
+        return self.doc_ids[position], float(similarities[best]), self.payloads[position]
+
+    def _rebuild_buckets(self):
+        """Recompute LSH buckets from the stored signatures"""
+        self._buckets = [dict() for _ in range(self.bands)]
+        for position, signature in enumerate(self._signature_matrix()):
+            for band, key in enumerate(self._band_keys(signature)):
+                self._buckets[band].setdefault(key, []).append(position)
+
+    def _records(self, positions=None):
+        """Per-article records (the journal and S3 format) for positions, or for every article"""
+        signatures = self._signature_matrix()
+        positions = range(len(self.doc_ids)) if positions is None else positions
+        return [{'doc_id': self.doc_ids[position], 'added_at': self.added_at[position],
+                 'signature': signatures[position].tolist(), 'payload': self.payloads[position]} for position in positions]
+
+    def _replace(self, records):
+        """Reset the index to records, oldest first, keeping only the newest max_docs articles"""
+        records = sorted(records, key=lambda record: record['added_at'])[-self.max_docs:]
+        self.doc_ids = [record['doc_id'] for record in records]
+        self.payloads = [record['payload'] for record in records]
+        self.added_at = [record['added_at'] for record in records]
+        self._pending = []
+        self._signatures = (np.array([record['signature'] for record in records], dtype=np.uint32) if records
+                            else np.empty((0, self.hasher.num_perm), dtype=np.uint32))
+        self._unsaved = []
+        self._rebuild_buckets()
+
+    def save(self):
+        """Append new articles to the journal, compacting it and syncing with S3 when due"""
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            if self._unsaved:
+                with open(os.path.join(self.path, 'journal.jsonl'), 'a', encoding='utf-8') as f:
+                    for record in self._records(self._unsaved):
+                        f.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+                self._journal_records += len(self._unsaved)
+                self._unsynced += len(self._unsaved)
+                self._unsaved = []
+            if self.s3_bucket and self._unsynced and time.time() - self._last_sync >= self.s3_sync_seconds:
+                self._sync_s3()
+            elif self._journal_records >= self.compact_every or len(self.doc_ids) > self.max_docs:
+                self._compact()
+        except Exception as e:
+            print(f"Error saving near-duplicate index: {str(e)}")
+
+    def _compact(self):
+        """Write the snapshot (newest max_docs articles) and start an empty journal"""
+        if len(self.doc_ids) > self.max_docs:
+            self._replace(self._records())
+        os.makedirs(self.path, exist_ok=True)
+        signatures_path = os.path.join(self.path, 'signatures.npy')
+        documents_path = os.path.join(self.path, 'documents.json')
+        with open(signatures_path + '.tmp', 'wb') as f:
+            np.save(f, self._signature_matrix())
+        with open(documents_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'doc_ids': self.doc_ids, 'payloads': self.payloads, 'added_at': self.added_at},
+                      f, ensure_ascii=False, default=str)
+        os.replace(signatures_path + '.tmp', signatures_path)
+        os.replace(documents_path + '.tmp', documents_path)
+        journal_path = os.path.join(self.path, 'journal.jsonl')
+        if os.path.exists(journal_path):
+            os.remove(journal_path)
+        self._journal_records = 0
+
+    def load(self):
+        """Load the snapshot and replay the journal, pulling the shared index from S3 first when configured"""
+        try:
+            signatures_path = os.path.join(self.path, 'signatures.npy')
+            documents_path = os.path.join(self.path, 'documents.json')
+            journal_path = os.path.join(self.path, 'journal.jsonl')
+            if os.path.exists(signatures_path) and os.path.exists(documents_path):
+                with open(documents_path, encoding='utf-8') as f:
+                    documents = json.load(f)
+                self._signatures = np.load(signatures_path)
+                self.doc_ids = documents['doc_ids']
+                self.payloads = documents['payloads']
+                self.added_at = documents.get('added_at') or [0.0] * len(self.doc_ids)
+            if os.path.exists(journal_path):
+                with open(journal_path, encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            continue  # a write cut short by a frozen or killed container
+                        self.add(record['doc_id'], record['signature'], record['payload'], record['added_at'])
+                        self._journal_records += 1
+                # The journal is emptied by every S3 sync, so whatever is in it hasn't reached S3 yet
+                self._unsaved, self._unsynced = [], self._journal_records
+            self._rebuild_buckets()
+            if self.s3_bucket and not self.doc_ids:
+                self._sync_s3()
+            print(f"Loaded near-duplicate index with {len(self.doc_ids)} articles")
+        except Exception as e:
+            print(f"Error loading near-duplicate index, starting empty: {str(e)}")
+
+    def _sync_s3(self):
+        """Merge the S3 snapshot with this container's articles and write it back if nobody else did meanwhile"""
+        import boto3
+        from botocore.exceptions import ClientError
+
+        s3 = boto3.client('s3')
+        for _ in range(3):
+            try:
+                response = s3.get_object(Bucket=self.s3_bucket, Key=self.S3_KEY)
+                remote = json.loads(gzip.decompress(response['Body'].read()))['records']
+                condition = {'IfMatch': response['ETag']}
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') not in ('NoSuchKey', '404'):
+                    print(f"Error downloading near-duplicate index from S3: {str(e)}")
+                    return
+                remote, condition = [], {'IfNoneMatch': '*'}
+
+            known = {(doc_id, added_at) for doc_id, added_at in zip(self.doc_ids, self.added_at)}
+            self._replace(self._records() + [record for record in remote if (record['doc_id'], record['added_at']) not in known])
+            self._compact()
+            if not self._unsynced:
+                return
+            body = gzip.compress(json.dumps({'records': self._records()}, ensure_ascii=False, default=str).encode('utf-8'))
+            try:
+                s3.put_object(Bucket=self.s3_bucket, Key=self.S3_KEY, Body=body, **condition)
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') in ('PreconditionFailed', 'ConditionalRequestConflict'):
+                    continue  # another container wrote first; merge its articles too and try again
+                print(f"Error uploading near-duplicate index to S3: {str(e)}")
+                return
+            self._unsynced = 0
+            self._last_sync = time.time()
+            return
+        print("Gave up syncing near-duplicate index with S3 after repeated conflicts; will retry on a later save")
+
+
+# Offline benchmark on a synthetic corpus (not used by the Lambda)
+if __name__ == "__main__":
+    def benchmark(num_docs=5000, duplicate_rate=0.3, paragraph_count=8, words_per_paragraph=40):
+        rng = np.random.RandomState(7)
+        vocabulary = [f'w{i}' for i in range(20000)]
+
+        def make_article():
+            return [' '.join(rng.choice(vocabulary, words_per_paragraph)) for _ in range(paragraph_count)]
+
+        def lightly_edit(paragraphs):
+            # Republished wire copy: a few words changed and an outlet credit line appended
+            edited = [paragraph.split() for paragraph in paragraphs]
+            for _ in range(3):
+                words = edited[rng.randint(len(edited))]
+                words[rng.randint(len(words))] = rng.choice(vocabulary)
+            return [' '.join(words) for words in edited] + ['Reported by Bernama with additional input']
+
+        originals = [make_article() for _ in range(num_docs)]
+        index = NearDuplicateIndex(path='/tmp/near-dup-bench')
+
+        started = time.time()
+        signatures = [index.signature_for({'paragraphs': article}) for article in originals]
+        signature_seconds = time.time() - started
+
+        started = time.time()
+        for i, signature in enumerate(signatures):
+            index.add(f'doc-{i}', signature, {'verdict': i})
+        index._signature_matrix()
+        build_seconds = time.time() - started
+
+        duplicates = rng.choice(num_docs, int(num_docs * duplicate_rate), replace=False)
+        queries = [(int(i), lightly_edit(originals[i])) for i in duplicates]
+        queries += [(None, make_article()) for _ in range(len(queries))]
+
+        started = time.time()
+        true_positive = false_positive = 0
+        for expected, article in queries:
+            match = index.query(index.signature_for({'paragraphs': article}))
+            if match and expected is not None and match[0] == f'doc-{expected}':
+                true_positive += 1
+            elif match and expected is None:
+                false_positive += 1
+        query_seconds = time.time() - started
+
+        print(json.dumps({
+            'documents': num_docs,
+            'signatures_per_second': round(num_docs / signature_seconds),
+            'index_build_seconds': round(build_seconds, 3),
+            'query_ms': round(query_seconds / len(queries) * 1000, 3),
+            'duplicate_recall': round(true_positive / len(duplicates), 3),
+            'false_positives': false_positive
+        }, indent=2))
+
+    benchmark()
@@ -0,0 +1,144 @@
+"""
+Per-domain politeness scheduling with token buckets
+Limits how many pages we load from one outlet at a time and how fast, so batches of links to the same
+site don't get throttled or served captcha pages, while other domains keep the browser busy
+"""
+
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from url_canon import canonical_host
+from worker_pool import percentile
+
+# Per-site limits; keys match the canonical registered domain and all of its subdomains
+SITE_POLICIES = {
+    'thestar.com.my': {'max_concurrency': 2, 'requests_per_minute': 20, 'burst': 2},
+    'freemalaysiatoday.com': {'max_concurrency': 2, 'requests_per_minute': 20, 'burst': 2},
+    'malaysiakini.com': {'max_concurrency': 1, 'requests_per_minute': 10, 'burst': 1},
+    'sinchew.com.my': {'max_concurrency': 2, 'requests_per_minute': 20, 'burst': 2},
+    # twitter.com links share this policy: url_domain maps them to x.com
+    'x.com': {'max_concurrency': 2, 'requests_per_minute': 30, 'burst': 3}
+}
+DEFAULT_POLICY = {'max_concurrency': 2, 'requests_per_minute': 30, 'burst': 2}
+
+
+def url_domain(url):
+    """Canonical host, so www/mobile variants and twitter.com/x.com share one domain's limits"""
+    return canonical_host(url)
+
+
+class TokenBucket:
+    """Classic token bucket: refills at rate tokens per second up to capacity"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def try_take(self):
+        """Take one token if available; returns 0 on success or the seconds until one will be"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class PolitenessScheduler:
+    """Admits URLs only when their domain is under its concurrency limit and has a rate token"""
+
+    def __init__(self, policies=None, default_policy=None, concurrency_retry_seconds=0.25):
+        self.policies = {**SITE_POLICIES, **(policies or {})}
+        self.default_policy = default_policy or DEFAULT_POLICY
+        self.concurrency_retry_seconds = concurrency_retry_seconds
+        self._buckets = {}
+        self._active = defaultdict(int)
+        self._waits = defaultdict(lambda: deque(maxlen=200))
+        self._condition = threading.Condition()
+
+    @classmethod
+    def from_env(cls):
+        """Build a scheduler, merging any JSON overrides from POLITENESS_POLICIES over the site defaults"""
+        overrides = {}
+        try:
+            overrides = json.loads(os.environ.get('POLITENESS_POLICIES', '{}'))
+        except ValueError as e:
+            print(f"Ignoring invalid POLITENESS_POLICIES: {e}")
+        return cls(policies=overrides)
+
+    def policy_for(self, domain):
+        """Most specific site policy for a domain, falling back to the default"""
+        parts = domain.split('.')
+        for i in range(len(parts) - 1):
+            policy = self.policies.get('.'.join(parts[i:]))
+            if policy:
+                return {**self.default_policy, **policy}
+        return self.default_policy
+
+    def try_acquire(self, url):
+        """Take a slot for url's domain without blocking; returns 0 on success or seconds to wait before retrying"""
+        domain = url_domain(url)
+        policy = self.policy_for(domain)
+        with self._condition:
+            if self._active[domain] >= policy['max_concurrency']:
+                return self.concurrency_retry_seconds
+            bucket = self._buckets.get(domain)
+            if bucket is None:
+                bucket = self._buckets[domain] = TokenBucket(policy['requests_per_minute'] / 60.0, policy['burst'])
+            wait = bucket.try_take()
+            if wait == 0:
+                self._active[domain] += 1
+            return wait
+
+    def acquire(self, url, timeout=None):
+        """Block until url's domain admits it; returns the seconds spent waiting"""
+        started = time.time()
+        while True:
+            wait = self.try_acquire(url)
+            if wait == 0:
+                waited = time.time() - started
+                self.record_wait(url, waited)
+                return waited
+            if timeout is not None and time.time() - started + wait > timeout:
+                raise TimeoutError(f"Politeness wait for {url_domain(url)} exceeded {timeout}s")
+            with self._condition:
+                self._condition.wait(wait)
+
+    def release(self, url):
+        """Give back the domain's concurrency slot"""
+        domain = url_domain(url)
+        with self._condition:
+            self._active[domain] = max(0, self._active[domain] - 1)
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, url, timeout=None):
+        """Hold a politeness slot for url for the duration of the block"""
+        self.acquire(url, timeout)
+        try:
+            yield
+        finally:
+            self.release(url)
+
+    def record_wait(self, url, seconds):
+        """Record how long a URL queued before its domain admitted it"""
+        with self._condition:
+            self._waits[url_domain(url)].append(seconds)
+
+    def metrics(self):
+        """Per-domain active loads and queue-wait percentiles in seconds"""
+        with self._condition:
+            return {
+                domain: {
+                    'active': self._active[domain],
+                    'queue_wait_p50_s': round(percentile(list(waits), 50), 3),
+                    'queue_wait_p95_s': round(percentile(list(waits), 95), 3)
+                }
+                for domain, waits in self._waits.items()
+            }
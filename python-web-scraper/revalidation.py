@@ -0,0 +1,70 @@
+"""
+Conditional revalidation of expired scrape results
+An expired article is checked with one conditional GET (If-None-Match / If-Modified-Since) instead
+of being re-rendered. A 304, or a 200 whose structured content digest matches the stored one, means
+the cached extraction is still right; only pages that actually changed are scraped and verified again.
+"""
+
+import json
+import time
+
+NOT_MODIFIED = 'not_modified'
+UNCHANGED = 'unchanged'
+CHANGED = 'changed'
+FAILED = 'failed'
+
+
+class Revalidator:
+    """Checks whether a page still matches the validators (ETag, Last-Modified, digest) stored with its result"""
+
+    def __init__(self, extractor, timeout=5):
+        # A StructuredDataExtractor: its session, headers and content_digest keep digests comparable
+        self.extractor = extractor
+        self.timeout = timeout
+        self.outcomes = {NOT_MODIFIED: 0, UNCHANGED: 0, CHANGED: 0, FAILED: 0}
+
+    @staticmethod
+    def usable(validators):
+        """True if there is anything to revalidate against"""
+        return bool(validators) and any(validators.get(key) for key in ('etag', 'last_modified', 'digest'))
+
+    def revalidate(self, url, validators):
+        """(outcome, refreshed validators) for url; the validators are None unless the page is unchanged"""
+        started = time.time()
+        outcome, refreshed = self._check(url, validators)
+        self.outcomes[outcome] += 1
+        print(json.dumps({'metric': 'revalidation', 'url': url, 'outcome': outcome,
+                          'elapsed_ms': int((time.time() - started) * 1000)}))
+        return outcome, refreshed
+
+    def _check(self, url, validators):
+        headers = {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+        try:
+            status, final_url, html, response_headers = self.extractor.request(url, timeout=self.timeout, headers=headers)
+        except Exception as e:
+            print(f"Revalidation request failed for {url}: {str(e)}")
+            return FAILED, None
+        if status == 304:
+            return NOT_MODIFIED, validators
+        if status != 200 or html is None:
+            return FAILED, None
+
+        # Many CMSes send a fresh ETag on every response, so a 200 is only a change if the content differs
+        digest = self.extractor.digest_html(html, final_url or url)
+        if not validators.get('digest') or digest != validators['digest']:
+            return CHANGED, None
+        return UNCHANGED, {
+            'etag': response_headers.get('ETag') or validators.get('etag'),
+            'last_modified': response_headers.get('Last-Modified') or validators.get('last_modified'),
+            'digest': digest
+        }
+
+    def metrics(self):
+        """Revalidations by outcome and the share that avoided a re-scrape"""
+        total = sum(self.outcomes.values())
+        reused = self.outcomes[NOT_MODIFIED] + self.outcomes[UNCHANGED]
+        return {**self.outcomes, 'reuse_ratio': round(reused / total, 3) if total else None}
@@ -0,0 +1,209 @@
+"""
+Recently scraped articles keyed by canonical URL
+The feed crawler pre-scrapes new articles into this cache and scrape_website looks a URL up here
+before fetching it, so a user request for a story the crawler already saw is answered without any
+network work. Entries live in memory for the container and, when a table is configured, as
+compressed records under a 'scrape#' key prefix in the result table so every container shares them.
+
+An entry is fresh for ttl_seconds. After that, if it carries validators (ETag, Last-Modified, content
+digest) and a revalidator is configured, it is kept for stale_seconds more and revalidated with one
+conditional GET on its next lookup instead of being scraped again from scratch.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from access_patterns import url_hash
+from item_layout import compress_body, decompress_body, MAX_BODY_PART_BYTES
+from revalidation import Revalidator, NOT_MODIFIED, UNCHANGED
+from url_canon import canonical_url
+
+
+class ScrapeCache:
+    """Scrape results for canonical URLs with a TTL, in memory and optionally in DynamoDB"""
+
+    def __init__(self, table=None, key_attribute='tweet_id', ttl_seconds=6 * 3600, max_entries=500,
+                 page_types=('news_article',), revalidator=None, stale_seconds=3 * 24 * 3600):
+        self.table = table
+        self.key_attribute = key_attribute
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # Posts' engagement counts change by the minute; articles are stable enough to reuse for hours
+        self.page_types = page_types
+        self.revalidator = revalidator
+        self.stale_seconds = stale_seconds if revalidator else 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def _key(self, url):
+        return {self.key_attribute: f'scrape#{url_hash(url)}'}
+
+    def _remember(self, key, entry):
+        """Keep an entry in the container's LRU"""
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _forget(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def _discard(self, url, entry):
+        """Drop an entry from memory and the table, so other containers don't keep revalidating or serving it"""
+        self._forget(url_hash(url))
+        if self.table is None:
+            return
+        try:
+            # Only the copy we revalidated: another container may already have re-cached a fresh one
+            self.table.delete_item(
+                Key=self._key(url),
+                ConditionExpression='cached_at = :cached_at',
+                ExpressionAttributeValues={':cached_at': entry['cached_at']}
+            )
+        except Exception as e:
+            if getattr(e, 'response', {}).get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                print(f"Error deleting scrape cache entry for {url}: {e}")
+
+    def _lookup(self, url):
+        """Unexpired (possibly stale) entry for url from memory, then the table; None otherwise"""
+        key = url_hash(url)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry['expires_at'] <= now:
+                del self._entries[key]
+                entry = None
+            if entry:
+                self._entries.move_to_end(key)
+        if entry is None and self.table is not None:
+            entry = self._load(url, now)
+            if entry:
+                self._remember(key, entry)
+        return entry
+
+    def _fresh(self, url, entry):
+        """True if entry can be served: still within its TTL, or revalidated just now"""
+        if entry['fresh_until'] > time.time():
+            return True
+        if not self.revalidator or not Revalidator.usable(entry.get('validators')):
+            return False
+        outcome, validators = self.revalidator.revalidate(url, entry['validators'])
+        if outcome not in (NOT_MODIFIED, UNCHANGED):
+            # Changed (or couldn't tell): the caller scrapes and verifies the page again and re-caches it
+            self._discard(url, entry)
+            return False
+        entry['validators'] = validators
+        entry['revalidated'] = outcome
+        self._store(url, entry, time.time())
+        return True
+
+    def get(self, url):
+        """Cached result for url marked cache_hit, or None if it isn't cached, has expired or has changed"""
+        entry = self._lookup(url)
+        if entry is None or not self._fresh(url, entry):
+            self.misses += 1
+            return None
+        self.hits += 1
+        # Keep the requester's URL; the cached copy may have been scraped from a feed's variant of it
+        result = {**entry['result'], 'url': url, 'cache_hit': True, 'cached_at': entry['cached_at'],
+                  'cache_source': entry['source']}
+        if entry.get('revalidated'):
+            result['revalidated'] = entry['revalidated']
+        return result
+
+    def _load(self, url, now):
+        """Entry from the table, or None"""
+        try:
+            record = self.table.get_item(Key=self._key(url)).get('Item')
+        except Exception as e:
+            print(f"Error reading scrape cache for {url}: {e}")
+            return None
+        # DynamoDB's TTL sweep runs late, so expiry is checked here too
+        if not record or int(record.get('expires_at', 0)) <= now:
+            return None
+        body = record['body']
+        try:
+            result = decompress_body(record['body_codec'], bytes(body.value if hasattr(body, 'value') else body))
+        except Exception as e:
+            print(f"Error decoding scrape cache entry for {url}: {e}")
+            return None
+        return {
+            'result': result,
+            'cached_at': record.get('cached_at'),
+            'source': record.get('source'),
+            'validators': record.get('validators'),
+            'fresh_until': int(record.get('fresh_until', record['expires_at'])),
+            'expires_at': int(record['expires_at'])
+        }
+
+    def put(self, url, result, source='scrape'):
+        """Cache a successful result for url; error and partial results are never cached"""
+        if not isinstance(result, dict) or 'error' in result or result.get('partial'):
+            return False
+        if result.get('page_type') not in self.page_types:
+            return False
+        # Per-request annotations don't belong to the cached article
+        result = {k: v for k, v in result.items()
+                  if k not in ('cache_hit', 'cached_at', 'cache_source', 'revalidated', 'deadline')}
+        now = time.time()
+        entry = {
+            'result': result,
+            'cached_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(now)),
+            'source': source,
+            'validators': {k: v for k, v in (result.get('validators') or {}).items() if v}
+        }
+        self._store(url, entry, now)
+        self.stores += 1
+        return True
+
+    def _store(self, url, entry, now):
+        """Start a new freshness period for entry and write it to memory and the table"""
+        entry['fresh_until'] = int(now + self.ttl_seconds)
+        # Entries with validators outlive their TTL so they can be revalidated rather than re-scraped
+        stale = self.stale_seconds if Revalidator.usable(entry.get('validators')) else 0
+        entry['expires_at'] = entry['fresh_until'] + stale
+        self._remember(url_hash(url), entry)
+        if self.table is None:
+            return
+        codec, payload = compress_body(entry['result'])
+        if len(payload) > MAX_BODY_PART_BYTES:
+            print(f"Not sharing {url} through the scrape cache: {len(payload)} compressed bytes")
+            return
+        record = {
+            **self._key(url),
+            'url': canonical_url(url),
+            'body': payload,
+            'body_codec': codec,
+            'cached_at': entry['cached_at'],
+            'source': entry['source'],
+            'fresh_until': entry['fresh_until'],
+            'expires_at': entry['expires_at']
+        }
+        if entry.get('validators'):
+            record['validators'] = entry['validators']
+        try:
+            self.table.put_item(Item=record)
+        except Exception as e:
+            print(f"Error writing scrape cache for {url}: {e}")
+
+    def contains(self, url):
+        """True if url has an entry (fresh or awaiting revalidation), without counting a hit or miss"""
+        return self._lookup(url) is not None
+
+    def metrics(self):
+        """Lookups answered from the cache, entries stored by this container and revalidation outcomes"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 3) if total else None,
+            'stores': self.stores,
+            'local_entries': len(self._entries),
+            'revalidation': self.revalidator.metrics() if self.revalidator else None
+        }
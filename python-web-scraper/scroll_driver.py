@@ -0,0 +1,133 @@
+"""
+Incremental scrolling for lazily loaded page content
+Scrolls one viewport at a time and, after each step, waits only until a MutationObserver has seen no
+new nodes or image sources for a short quiet window. Stops once the bottom of the page stops growing
+or the per-page time budget runs out, so short articles finish in a few hundred milliseconds while
+long ones still get their lazy paragraphs and images loaded.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+from politeness import url_domain
+from worker_pool import percentile
+
+# Runs as an async script: scroll one viewport, then resolve once mutations have been quiet for
+# quietMs (or maxWaitMs has passed). The observer is installed on the first step and kept on window.
+STEP_SCRIPT = """
+    const [quietMs, maxWaitMs, done] = arguments;
+    let state = window.__scrollWatch;
+    if (!state) {
+        state = window.__scrollWatch = {added: 0, last: performance.now()};
+        new MutationObserver(records => {
+            for (const record of records) {
+                if (record.type === 'attributes' || Array.from(record.addedNodes).some(n => n.nodeType === 1)) {
+                    state.added++;
+                    state.last = performance.now();
+                }
+            }
+        }).observe(document.documentElement, {
+            childList: true, subtree: true, attributes: true, attributeFilter: ['src', 'srcset']
+        });
+    }
+    const root = document.scrollingElement || document.documentElement;
+    const addedBefore = state.added;
+    const heightBefore = root.scrollHeight;
+    const started = performance.now();
+    window.scrollBy(0, window.innerHeight);
+    const check = () => {
+        const now = performance.now();
+        const quiet = now - Math.max(state.last, started) >= quietMs;
+        if (quiet || now - started >= maxWaitMs) {
+            done({
+                added: state.added - addedBefore,
+                grew: root.scrollHeight > heightBefore,
+                at_bottom: window.scrollY + window.innerHeight >= root.scrollHeight - 2,
+                height: root.scrollHeight
+            });
+        } else {
+            setTimeout(check, 50);
+        }
+    };
+    setTimeout(check, 50);
+"""
+
+
+class ScrollDriver:
+    """Scrolls a loaded page in viewport steps within a time budget and keeps per-domain step counts"""
+
+    def __init__(self, budget_seconds=None, quiet_ms=None, max_step_wait_ms=1500, settle_steps=2,
+                 max_steps=40, history_per_domain=200):
+        self.budget_seconds = budget_seconds or float(os.environ.get('SCROLL_BUDGET_SECONDS', '6'))
+        self.quiet_ms = quiet_ms or int(os.environ.get('SCROLL_QUIET_MS', '400'))
+        self.max_step_wait_ms = max_step_wait_ms
+        # Consecutive steps at the bottom with nothing new before the page counts as fully loaded
+        self.settle_steps = settle_steps
+        self.max_steps = max_steps
+        self._steps = defaultdict(lambda: deque(maxlen=history_per_domain))
+        self._budget_exhausted = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def scroll(self, driver, url, budget_seconds=None):
+        """Scroll the current page until its content stops growing; returns the per-page stats"""
+        started = time.time()
+        deadline = started + (budget_seconds if budget_seconds is not None else self.budget_seconds)
+        steps = added = idle = 0
+        stopped = 'max_steps'
+        try:
+            while steps < self.max_steps:
+                remaining_ms = (deadline - time.time()) * 1000
+                if remaining_ms <= 0:
+                    stopped = 'budget'
+                    break
+                step = driver.execute_async_script(
+                    STEP_SCRIPT, self.quiet_ms, int(min(self.max_step_wait_ms, remaining_ms))
+                ) or {}
+                steps += 1
+                added += step.get('added', 0)
+                if step.get('at_bottom') and not step.get('added') and not step.get('grew'):
+                    idle += 1
+                    if idle >= self.settle_steps:
+                        stopped = 'settled'
+                        break
+                else:
+                    idle = 0
+            # Extraction scripts and screenshots expect the top of the page
+            driver.execute_script("window.scrollTo(0, 0);")
+        except Exception as e:
+            print(f"Error scrolling {url}: {str(e)}")
+            stopped = 'error'
+
+        stats = {
+            'domain': url_domain(url),
+            'steps': steps,
+            'added_nodes': added,
+            'stopped': stopped,
+            'elapsed_ms': int((time.time() - started) * 1000)
+        }
+        self._record(stats)
+        print(json.dumps({'metric': 'scroll', 'url': url, **stats}))
+        return stats
+
+    def _record(self, stats):
+        """Remember the step count for the domain"""
+        with self._lock:
+            self._steps[stats['domain']].append(stats['steps'])
+            if stats['stopped'] == 'budget':
+                self._budget_exhausted[stats['domain']] += 1
+
+    def metrics(self):
+        """Per-domain pages scrolled, step-count percentiles and how often the budget ran out"""
+        with self._lock:
+            return {
+                domain: {
+                    'pages': len(steps),
+                    'steps_p50': percentile(list(steps), 50),
+                    'steps_p95': percentile(list(steps), 95),
+                    'budget_exhausted': self._budget_exhausted[domain]
+                }
+                for domain, steps in self._steps.items()
+            }
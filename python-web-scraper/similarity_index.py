@@ -0,0 +1,321 @@
+"""
+Hashed TF-IDF similarity index over previously verified articles
+Finds already-verified stories about the same event before a verification call is paid for. Term
+counts are hashed into a fixed feature space and stored as a SciPy CSR matrix whose arrays are plain
+.npy files, so the bulk of the index is memory-mapped rather than loaded
+"""
+
+import json
+import os
+import re
+import time
+import zlib
+from collections import Counter
+
+import numpy as np
+from scipy import sparse
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def article_text(scraped_data):
+    """Title plus body text of a scrape result or stored item"""
+    body = '\n'.join(scraped_data.get('paragraphs') or []) or scraped_data.get('main_text', '')
+    return f"{scraped_data.get('page_title', '')}\n{body}"
+
+
+class SimilarityIndex:
+    """Append-only TF-IDF index answering top-k cosine queries
+
+    Rows live in two segments: a memory-mapped CSC base (one posting list per feature) and a small
+    in-memory CSR tail that new articles are appended to. IDF weights are frozen between compactions,
+    which merge the tail into the base, recompute IDF from the live document frequencies and re-derive
+    every row norm.
+    """
+
+    def __init__(self, path='/tmp/similarity-index', n_features=2 ** 18, compact_ratio=0.1,
+                 min_compact_docs=500, min_token_length=2, max_query_terms=64):
+        self.path = path
+        self.n_features = n_features
+        self.max_query_terms = max_query_terms
+        self.compact_ratio = compact_ratio
+        self.min_compact_docs = min_compact_docs
+        self.min_token_length = min_token_length
+        self._reset()
+        self.load()
+
+    def _reset(self):
+        """Start from an empty index"""
+        self.doc_ids = []
+        self.metadata = []
+        self._doc_positions = {}
+        self._df = np.zeros(self.n_features, dtype=np.int32)
+        self._idf = np.ones(self.n_features, dtype=np.float32)
+        self._base = self._empty_segment()
+        self._tail_rows = []
+        self._tail = None
+        self._base_documents_dirty = False
+
+    def _empty_segment(self):
+        """Zero-row segment"""
+        return {
+            'matrix': sparse.csr_matrix((0, self.n_features), dtype=np.float32),
+            'norms': np.zeros(0, dtype=np.float32)
+        }
+
+    def features(self, text):
+        """Sorted hashed feature indices and sublinear term frequencies for a text"""
+        counts = Counter(
+            zlib.crc32(word.encode('utf-8')) % self.n_features
+            for word in _WORD_RE.findall(text.lower()) if len(word) >= self.min_token_length
+        )
+        if not counts:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        indices = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+        values = 1 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+        order = np.argsort(indices)
+        return indices[order], values[order].astype(np.float32)
+
+    def _norm(self, indices, values):
+        """Length of a row's TF-IDF vector under the current IDF weights"""
+        return float(np.sqrt(np.sum((values * self._idf[indices]) ** 2)))
+
+    def add(self, doc_id, text, metadata=None):
+        """Append an article; re-adding a known doc_id only refreshes its metadata"""
+        if doc_id in self._doc_positions:
+            position = self._doc_positions[doc_id]
+            self.metadata[position] = metadata or {}
+            self._base_documents_dirty |= position < self._base['matrix'].shape[0]
+            return False
+        indices, values = self.features(text)
+        if len(indices) == 0:
+            return False
+        self._doc_positions[doc_id] = len(self.doc_ids)
+        self.doc_ids.append(doc_id)
+        self.metadata.append(metadata or {})
+        self._df[indices] += 1
+        self._tail_rows.append((indices, values, self._norm(indices, values)))
+        self._tail = None
+        return True
+
+    def _tail_segment(self):
+        """Tail rows as one CSR matrix, rebuilt only after appends"""
+        if self._tail is None:
+            if not self._tail_rows:
+                self._tail = self._empty_segment()
+            else:
+                indptr = np.zeros(len(self._tail_rows) + 1, dtype=np.int64)
+                indptr[1:] = np.cumsum([len(indices) for indices, _, _ in self._tail_rows])
+                matrix = sparse.csr_matrix((
+                    np.concatenate([values for _, values, _ in self._tail_rows]),
+                    np.concatenate([indices for indices, _, _ in self._tail_rows]),
+                    indptr
+                ), shape=(len(self._tail_rows), self.n_features))
+                norms = np.array([norm for _, _, norm in self._tail_rows], dtype=np.float32)
+                self._tail = {'matrix': matrix, 'norms': norms}
+        return self._tail
+
+    def query(self, text, k=5, min_score=0.2, exclude=None):
+        """Top-k indexed articles by cosine similarity, as dicts of doc_id, score and stored metadata"""
+        indices, values = self.features(text)
+        if len(indices) == 0 or not self.doc_ids:
+            return []
+        weights = values * self._idf[indices]
+        query_norm = float(np.sqrt(np.sum(weights ** 2)))
+        if query_norm == 0:
+            return []
+        # Score only the highest-weighted (rarest) terms: their posting lists are short and they carry
+        # most of the cosine, so the cost no longer grows with every common word in the article
+        if len(indices) > self.max_query_terms:
+            keep = np.argpartition(-weights, self.max_query_terms)[:self.max_query_terms]
+            indices, weights = indices[keep], weights[keep]
+        # Rows hold raw term frequencies, so IDF is applied twice on the query side
+        term_weights = weights * self._idf[indices]
+
+        scores = []
+        for segment in (self._base, self._tail_segment()):
+            if segment['matrix'].shape[0]:
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    segment_scores = segment['matrix'][:, indices].dot(term_weights) / (segment['norms'] * query_norm)
+                scores.append(np.nan_to_num(segment_scores))
+        scores = np.concatenate(scores)
+
+        top = np.argpartition(-scores, min(k + 1, len(scores) - 1))[:k + 1] if len(scores) > k + 1 else np.arange(len(scores))
+        results = []
+        for position in top[np.argsort(-scores[top])]:
+            score = float(scores[position])
+            doc_id = self.doc_ids[position]
+            if score < min_score or doc_id == exclude:
+                continue
+            results.append({'doc_id': doc_id, 'score': round(score, 4), **self.metadata[position]})
+            if len(results) == k:
+                break
+        return results
+
+    def _needs_compaction(self):
+        """True once the tail is large relative to the base (or there is no base yet)"""
+        tail_docs = len(self._tail_rows)
+        base_docs = self._base['matrix'].shape[0]
+        if base_docs == 0:
+            return tail_docs > 0
+        return tail_docs >= self.min_compact_docs and tail_docs > base_docs * self.compact_ratio
+
+    def compact(self):
+        """Merge the tail into the base, refresh IDF and recompute every row norm"""
+        matrix = sparse.vstack([self._base['matrix'], self._tail_segment()['matrix']], format='csc', dtype=np.float32)
+        # indices and indptr must share a dtype or SciPy copies them instead of using the memory map
+        index_dtype = np.int32 if matrix.nnz < np.iinfo(np.int32).max else np.int64
+        matrix.indices = matrix.indices.astype(index_dtype, copy=False)
+        matrix.indptr = matrix.indptr.astype(index_dtype, copy=False)
+        doc_count = matrix.shape[0]
+        self._idf = (np.log((1 + doc_count) / (1 + self._df)) + 1).astype(np.float32)
+        weighted = matrix.multiply(self._idf[np.newaxis, :]).tocsr()
+        norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel()).astype(np.float32)
+        self._base = {'matrix': matrix, 'norms': norms}
+        self._tail_rows = []
+        self._tail = None
+
+    def save(self):
+        """Persist the index; the base segment is only rewritten when the tail is compacted into it"""
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            if self._needs_compaction():
+                started = time.time()
+                self.compact()
+                matrix = self._base['matrix']
+                for name, array in (('data', matrix.data), ('indices', matrix.indices),
+                                    ('indptr', matrix.indptr), ('norms', self._base['norms']), ('idf', self._idf)):
+                    with open(os.path.join(self.path, f'{name}.npy.tmp'), 'wb') as f:
+                        np.save(f, array)
+                    os.replace(os.path.join(self.path, f'{name}.npy.tmp'), os.path.join(self.path, f'{name}.npy'))
+                self._base_documents_dirty = True
+                print(f"Compacted similarity index to {matrix.shape[0]} articles in {round(time.time() - started, 2)}s")
+
+            tail = self._tail_segment()
+            with open(os.path.join(self.path, 'tail.npz.tmp'), 'wb') as f:
+                np.savez(f, data=tail['matrix'].data, indices=tail['matrix'].indices,
+                         indptr=tail['matrix'].indptr, norms=tail['norms'], df=self._df)
+            os.replace(os.path.join(self.path, 'tail.npz.tmp'), os.path.join(self.path, 'tail.npz'))
+            # Base documents are only rewritten after a compaction, so a routine save stays small
+            base_docs = self._base['matrix'].shape[0]
+            if self._base_documents_dirty:
+                self._write_documents('base_documents.json', 0, base_docs)
+                self._base_documents_dirty = False
+            self._write_documents('tail_documents.json', base_docs, len(self.doc_ids))
+        except Exception as e:
+            print(f"Error saving similarity index: {str(e)}")
+
+    def _write_documents(self, name, start, end):
+        """Atomically write doc IDs and metadata for positions [start, end)"""
+        path = os.path.join(self.path, name)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'doc_ids': self.doc_ids[start:end], 'metadata': self.metadata[start:end]},
+                               ensure_ascii=False, default=str))
+        os.replace(path + '.tmp', path)
+
+    def load(self, mmap=True):
+        """Load a saved index, memory-mapping the base segment"""
+        if not os.path.exists(os.path.join(self.path, 'tail_documents.json')):
+            return
+        try:
+            mmap_mode = 'r' if mmap else None
+            documents = {'doc_ids': [], 'metadata': []}
+            for name in ('base_documents.json', 'tail_documents.json'):
+                if os.path.exists(os.path.join(self.path, name)):
+                    with open(os.path.join(self.path, name), encoding='utf-8') as f:
+                        part = json.load(f)
+                    documents['doc_ids'].extend(part['doc_ids'])
+                    documents['metadata'].extend(part['metadata'])
+            if os.path.exists(os.path.join(self.path, 'indptr.npy')):
+                arrays = {name: np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode=mmap_mode)
+                          for name in ('data', 'indices', 'indptr', 'norms', 'idf')}
+                matrix = sparse.csc_matrix((arrays['data'], arrays['indices'], arrays['indptr']),
+                                           shape=(len(arrays['norms']), self.n_features), copy=False)
+                self._base = {'matrix': matrix, 'norms': arrays['norms']}
+                self._idf = np.asarray(arrays['idf'])
+            with np.load(os.path.join(self.path, 'tail.npz')) as tail:
+                self._df = tail['df']
+                indptr = tail['indptr']
+                self._tail_rows = [
+                    (tail['indices'][start:end], tail['data'][start:end], float(norm))
+                    for start, end, norm in zip(indptr[:-1], indptr[1:], tail['norms'])
+                ]
+            self._tail = None
+            self.doc_ids = documents['doc_ids']
+            self.metadata = documents['metadata']
+            self._doc_positions = {doc_id: position for position, doc_id in enumerate(self.doc_ids)}
+            print(f"Loaded similarity index with {len(self.doc_ids)} articles")
+        except Exception as e:
+            print(f"Error loading similarity index, starting empty: {str(e)}")
+            self._reset()
+
+
+# Offline benchmark on a synthetic corpus (not used by the Lambda)
+if __name__ == "__main__":
+    def benchmark(num_docs=100000, words_per_doc=300, num_queries=200):
+        rng = np.random.RandomState(11)
+        # Zipf-like vocabulary so frequent and rare terms behave like real text
+        vocabulary = np.array([f'w{i}' for i in range(50000)])
+        probabilities = 1.0 / np.arange(1, len(vocabulary) + 1)
+        probabilities /= probabilities.sum()
+
+        def make_texts(count):
+            return [' '.join(words) for words in vocabulary[rng.choice(len(vocabulary), (count, words_per_doc), p=probabilities)]]
+
+        def reword(text):
+            # Same story, reworded: half the words replaced
+            words = text.split()
+            replacements = vocabulary[rng.choice(len(vocabulary), len(words) // 2, p=probabilities)]
+            for position, word in zip(rng.choice(len(words), len(words) // 2, replace=False), replacements):
+                words[position] = word
+            return ' '.join(words)
+
+        texts = make_texts(num_docs)
+        path = '/tmp/similarity-bench'
+        if os.path.exists(path):
+            import shutil
+            shutil.rmtree(path)
+        index = SimilarityIndex(path=path)
+
+        started = time.time()
+        for i, text in enumerate(texts):
+            index.add(f'doc-{i}', text, {'url': f'https://example.com/{i}'})
+        add_seconds = time.time() - started
+
+        started = time.time()
+        index.save()
+        compact_seconds = time.time() - started
+
+        started = time.time()
+        index = SimilarityIndex(path=path)
+        load_seconds = time.time() - started
+
+        # What each Lambda invocation pays: one append followed by a save
+        new_texts = make_texts(20)
+        started = time.time()
+        for i, text in enumerate(new_texts):
+            index.add(f'new-{i}', text)
+            index.save()
+        append_ms = (time.time() - started) / len(new_texts) * 1000
+
+        targets = rng.choice(num_docs, num_queries, replace=False)
+        queries = [reword(texts[target]) for target in targets]
+        hits = 0
+        started = time.time()
+        for target, text in zip(targets, queries):
+            results = index.query(text, k=5)
+            hits += bool(results) and results[0]['doc_id'] == f'doc-{target}'
+        query_ms = (time.time() - started) / num_queries * 1000
+
+        print(json.dumps({
+            'documents': num_docs,
+            'nnz': int(index._base['matrix'].nnz),
+            'add_docs_per_second': round(num_docs / add_seconds),
+            'compact_and_save_seconds': round(compact_seconds, 2),
+            'mmap_load_seconds': round(load_seconds, 3),
+            'append_and_save_ms': round(append_ms, 2),
+            'query_ms': round(query_ms, 2),
+            'top1_recall': round(hits / num_queries, 3)
+        }, indent=2))
+
+    benchmark()
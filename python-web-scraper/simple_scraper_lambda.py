@@ -1,7 +1,6 @@
 import json
 import os
 import boto3
-import requests
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
@@ -15,13 +14,104 @@ import re
 import threading
 import asyncio
 import concurrent.futures
+from browser_warmup import WarmBrowser, TOP_NEWS_DOMAINS
+from tab_scheduler import TabScheduler
+from memory_governor import BrowserMemoryGovernor
+from chrome_cache import ChromeCacheManager
+from scroll_driver import ScrollDriver
+from deadline import Deadline, run_with_deadline
+from worker_pool import BoundedWorkerPool, PoolSaturated
+from single_flight import RequestCoalescer, DynamoLeaseStore
+from url_canon import page_type as classify_url
+from structured_data import StructuredDataExtractor
+from scrape_cache import ScrapeCache
+from revalidation import Revalidator
+from n8n_delivery import N8nDeliveryQueue
+from api_response import json_response
+from politeness import PolitenessScheduler
+from link_expander import LinkExpander
+
+N8N_WEBHOOK_URL = "https://n8n-staging.ai-spacex.co/webhook/d3afd105-4db6-47d3-8aaa-87f9d268c3ea"
+
+# Results are buffered and delivered in batches; undelivered ones spill to /tmp and retry on the next flush
+delivery_queue = N8nDeliveryQueue(
+    N8N_WEBHOOK_URL,
+    batch_webhook_url=os.environ.get('N8N_BATCH_WEBHOOK_URL'),
+    max_attempts=int(os.environ.get('N8N_DELIVERY_MAX_ATTEMPTS', '3')),
+    spill_path=os.environ.get('N8N_DELIVERY_SPILL_PATH', '/tmp/n8n-undelivered.jsonl')
+)
+
+# Launch Chrome during the init phase instead of inside the first request
+WARM_BROWSER_AT_INIT = os.environ.get('WARM_BROWSER_AT_INIT', 'false').lower() == 'true'
+
+# Concurrent tabs per Chrome process when several URLs are scraped together
+MAX_TABS = int(os.environ.get('MAX_TABS', '4'))
+TAB_TIMEOUT_SECONDS = int(os.environ.get('TAB_TIMEOUT_SECONDS', '30'))
+# Tabs share the default context (and so the shared disk cache); cookies are still cleared between leases.
+# TAB_ISOLATED_CONTEXTS=true gives each tab its own off-the-record context instead, with an in-memory cache.
+TAB_ISOLATED_CONTEXTS = os.environ.get('TAB_ISOLATED_CONTEXTS', 'false').lower() == 'true'
+
+# When set, URLs go to the background batch consumer's SQS queue instead of one async invoke each
+SCRAPE_QUEUE_URL = os.environ.get('SCRAPE_QUEUE_URL')
+
+# Fallback scrapes run on a bounded pool so a burst cannot start one Chrome per request
+fallback_pool = BoundedWorkerPool(
+    max_workers=int(os.environ.get('FALLBACK_MAX_WORKERS', '2')),
+    max_queue_depth=int(os.environ.get('FALLBACK_MAX_QUEUE_DEPTH', '8')),
+    name='fallback_scrape'
+)
+FALLBACK_JOB_DEADLINE_SECONDS = int(os.environ.get('FALLBACK_JOB_DEADLINE_SECONDS', '120'))
+
+# Duplicate requests for a URL that is already being scraped attach to that scrape. Leases in
+# LEASE_TABLE_NAME extend this across workers; without it only this container is coalesced.
+LEASE_TABLE_NAME = os.environ.get('LEASE_TABLE_NAME')
+coalescer = RequestCoalescer(
+    lease_store=DynamoLeaseStore(boto3.resource('dynamodb').Table(LEASE_TABLE_NAME)) if LEASE_TABLE_NAME else None,
+    ttl_seconds=int(os.environ.get('LEASE_TTL_SECONDS', '300'))
+)
+
+# Per-driver Chrome profiles seeded from a shared, size-capped static asset cache (CHROME_SHARED_CACHE_MB)
+chrome_cache = ChromeCacheManager()
+
+# Shared by every driver in this container; thresholds come from CHROME_RSS_RECYCLE_MB / CHROME_TMP_PURGE_MB
+memory_governor = BrowserMemoryGovernor(seeded_mb=chrome_cache.seeded_mb)
+
+# Viewport-step scrolling for lazy content, bounded by SCROLL_BUDGET_SECONDS per page
+scroll_driver = ScrollDriver()
+
+# JSON-LD / AMP articles over plain HTTP before rendering; STRUCTURED_DATA_FIRST=false always uses Chrome
+STRUCTURED_DATA_FIRST = os.environ.get('STRUCTURED_DATA_FIRST', 'true').lower() == 'true'
+structured_extractor = StructuredDataExtractor()
+
+# Recently scraped (or feed-crawled) articles; SCRAPE_CACHE_TABLE shares them with the feed crawler and other containers.
+# Expired articles are revalidated with a conditional GET for up to SCRAPE_CACHE_STALE_HOURS before being re-scraped.
+SCRAPE_CACHE_TABLE = os.environ.get('SCRAPE_CACHE_TABLE')
+scrape_cache = ScrapeCache(
+    table=boto3.resource('dynamodb').Table(SCRAPE_CACHE_TABLE) if SCRAPE_CACHE_TABLE else None,
+    ttl_seconds=int(os.environ.get('SCRAPE_CACHE_TTL_HOURS', '6')) * 3600,
+    revalidator=Revalidator(structured_extractor),
+    stale_seconds=int(os.environ.get('SCRAPE_CACHE_STALE_HOURS', '72')) * 3600
+)
+
+# Per-domain concurrency and rate limits (site defaults in politeness.SITE_POLICIES, overrides in POLITENESS_POLICIES)
+politeness = PolitenessScheduler.from_env()
+# Longest a scrape queues for its domain's slot; a deadline shortens it so the page can still load afterwards
+POLITENESS_MAX_WAIT_SECONDS = float(os.environ.get('POLITENESS_MAX_WAIT_SECONDS', '30'))
+
+# Resolves t.co and other short links once at scrape time; the cache lives in /tmp for the container's lifetime
+link_expander = LinkExpander(cache_path=os.environ.get('LINK_CACHE_PATH', '/tmp/link-expansion-cache.json'))
 
 class SimpleWebScraper:
     """Simple web scraper optimized for AWS Lambda using Selenium - no verification API calls"""
     
-    def __init__(self):
-        self.driver = None
-        self.n8n_webhook_url = "https://n8n-staging.ai-spacex.co/webhook/d3afd105-4db6-47d3-8aaa-87f9d268c3ea"
+    def __init__(self, driver=None, deadline=None):
+        self.driver = driver
+        # A driver handed in (e.g. the warm browser) belongs to the caller and is not quit on exit
+        self.owns_driver = driver is None
+        # Stage budgets from the invocation's remaining time; unbounded when none is given
+        self.deadline = deadline or Deadline()
+        self.partial_data = None
+        self.n8n_webhook_url = N8N_WEBHOOK_URL
         
     def __enter__(self):
         """Context manager entry"""
@@ -29,14 +119,14 @@ class SimpleWebScraper:
         
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Context manager exit - cleanup resources"""
-        if self.driver:
-            try:
-                self.driver.quit()
-            except Exception as e:
-                print(f"Error closing driver: {e}")
+        if self.driver and self.owns_driver:
+            chrome_cache.quit(self.driver)
+            # Only this driver's flag; the warm browser's stays set until it is recycled itself
+            memory_governor.recycled(self.driver)
     
     def setup_selenium_driver(self):
         """Setup Selenium WebDriver with Chrome for AWS Lambda"""
+        profile = None
         try:
             # Chrome options for Lambda (same as working main scraper)
             chrome_options = Options()
@@ -54,9 +144,9 @@ class SimpleWebScraper:
             chrome_options.add_argument('--window-size=1920,1080')
             chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
             # Use /tmp for any Chrome state to avoid permission issues on Lambda
-            chrome_options.add_argument('--user-data-dir=/tmp/chrome-user-data')
-            chrome_options.add_argument('--data-path=/tmp/chrome-data')
-            chrome_options.add_argument('--disk-cache-dir=/tmp/chrome-cache')
+            profile = chrome_cache.new_profile()
+            for argument in chrome_cache.chrome_arguments(profile):
+                chrome_options.add_argument(argument)
             # Additional anti-detection measures
             chrome_options.add_argument('--disable-blink-features=AutomationControlled')
             chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
@@ -108,6 +198,7 @@ class SimpleWebScraper:
                 print(f"Failed to create WebDriver with service: {e}")
                 # Try without specifying driver path
                 self.driver = webdriver.Chrome(options=chrome_options)
+            chrome_cache.attach(self.driver, profile)
             
             # Execute script to remove webdriver property
             self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
@@ -120,49 +211,111 @@ class SimpleWebScraper:
             
         except Exception as e:
             print(f"Error setting up Selenium driver: {str(e)}")
+            # A driver that never launched would otherwise leave its profile behind in /tmp
+            chrome_cache.discard_profile(profile)
             return False
     
-    def scrape_website(self, url):
-        """Scrape website content using Selenium"""
+    def scrape_website(self, url, check_cache=True):
+        """Scrape website content, from the scrape cache or structured data over HTTP when possible, otherwise with Selenium"""
         try:
+            cached = scrape_cache.get(url) if check_cache else None
+            if cached:
+                print(f"Serving {url} from the scrape cache ({cached['cache_source']}, {cached['cached_at']})")
+                return self.deadline.annotate(cached)
+            
+            if STRUCTURED_DATA_FIRST and classify_url(url) != "twitter_post":
+                with self.deadline.stage('navigation'):
+                    structured = structured_extractor.extract(url, timeout=self.deadline.budget('navigation', cap=structured_extractor.timeout))
+                if structured:
+                    print(f"Extracted {url} from {structured['structured_source']} structured data without rendering")
+                    structured = link_expander.expand_result(structured)
+                    scrape_cache.put(url, structured)
+                    return self.deadline.annotate(structured)
+            
             if not self.driver:
                 if not self.setup_selenium_driver():
                     return {"error": "Failed to setup Selenium driver"}
             
+            self.partial_data = {"error": "Deadline reached before the page was extracted", "url": url, "scraping_method": "selenium_webdriver"}
             print(f"Loading URL: {url}")
-            self.driver.get(url)
+            timed_out = False
+            with self.deadline.stage('navigation'):
+                self.driver.set_page_load_timeout(max(1, self.deadline.budget('navigation', cap=30)))
+                try:
+                    self.driver.get(url)
+                except TimeoutException:
+                    # Out of navigation budget: stop loading and extract whatever has arrived
+                    print(f"Page load for {url} ran out of budget, extracting what has loaded")
+                    self.driver.execute_script("window.stop();")
+                    self.deadline.cut_short('navigation')
+                    timed_out = True
             
             # Wait for page to load
-            time.sleep(3)
+            if not timed_out and self.deadline.allows('readiness'):
+                time.sleep(self.deadline.budget('readiness', cap=3))
+            
+            return self.deadline.annotate(self.extract_loaded_page(url, partial=timed_out))
+                
+        except Exception as e:
+            print(f"Error scraping website: {str(e)}")
+            return {"error": str(e), "url": url, "scraping_method": "selenium_webdriver"}
+    
+    def extract_loaded_page(self, url, partial=False):
+        """Extract content from the page already loaded in the driver's current tab
+
+        partial marks a page whose load was cut off; it is returned flagged but never cached.
+        """
+        with self.deadline.stage('extraction'):
+            result = link_expander.expand_result(self._extract_page_content(url))
+        if partial:
+            result['partial'] = True
+        scrape_cache.put(url, result)
+        # Sample memory once the page is done so leaks on ad-heavy pages trigger a purge or recycle
+        memory_governor.after_page(self.driver, url)
+        chrome_cache.record_page(self.driver, url)
+        return result
+    
+    def partial_result(self):
+        """Whatever the current scrape has gathered so far, flagged as partial"""
+        return self.deadline.annotate(dict(self.partial_data or {"error": "Deadline reached before scraping started"}))
+    
+    def _extract_page_content(self, url):
+        """Dispatch extraction on page type"""
+        try:
+            html = self.driver.page_source
+            page_type = classify_url(url)
+            
+            # Structured data in the rendered page is more accurate than the CSS selector heuristics below
+            metadata = {}
+            if page_type != "twitter_post":
+                structured, metadata = structured_extractor.analyze(html, url, follow_amp=False)
+                if structured:
+                    return structured
             
             # Check if we're on a login/signup page
-            page_source = self.driver.page_source.lower()
-            if any(keyword in page_source for keyword in ['sign in', 'log in', 'login', 'sign up', 'register']):
+            page_source = html.lower()
+            if any(keyword in page_source for keyword in ['sign in', 'log in', 'login', 'sign up', 'register']) and self.deadline.allows('readiness'):
                 print("Detected login/signup page, waiting longer for dynamic content...")
-                time.sleep(5)
-                self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                time.sleep(2)
+                time.sleep(self.deadline.budget('readiness', cap=5))
+                scroll_driver.scroll(self.driver, url, self.deadline.budget('readiness', cap=scroll_driver.budget_seconds))
             
             # Get page title
             page_title = self.driver.title or "No title"
             
-            # Determine page type
-            page_type = "unknown"
-            if "twitter.com" in url or "x.com" in url:
-                page_type = "twitter_post"
-            elif any(news_site in url for news_site in ["freemalaysiatoday.com", "sinchew.com.my", "malaysiakini.com", "thestar.com.my"]):
-                page_type = "news_article"
-            
             # Extract content based on page type
             if page_type == "twitter_post":
                 return self._scrape_twitter_post(url, page_title)
             elif page_type == "news_article":
-                return self._scrape_news_article(url, page_title)
+                result = self._scrape_news_article(url, page_title)
             else:
-                return self._scrape_generic_page(url, page_title)
+                result = self._scrape_generic_page(url, page_title)
+            # Lets the scrape cache revalidate the page later with a plain GET instead of a re-render
+            if metadata.get('digest') and 'error' not in result:
+                result['validators'] = {'digest': metadata['digest']}
+            return result
                 
         except Exception as e:
-            print(f"Error scraping website: {str(e)}")
+            print(f"Error extracting page: {str(e)}")
             return {"error": str(e), "url": url, "scraping_method": "selenium_webdriver"}
     
     def _scrape_twitter_post(self, url, page_title):
@@ -251,12 +404,9 @@ class SimpleWebScraper:
     def _scrape_news_article(self, url, page_title):
         """Scrape news article content"""
         try:
-            # Wait for content to load
-            time.sleep(3)
-            
-            # Scroll to load dynamic content
-            self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(2)
+            # Scroll in viewport steps until lazily loaded content stops arriving
+            if self.deadline.allows('readiness'):
+                scroll_driver.scroll(self.driver, url, self.deadline.budget('readiness', cap=scroll_driver.budget_seconds))
             
             # Extract main content
             main_text = ""
@@ -417,10 +567,10 @@ class SimpleWebScraper:
             return {"error": str(e), "url": url, "scraping_method": "selenium_webdriver"}
     
     def send_result_to_n8n(self, result, original_url, chat_id=None):
-        """Send scraping result back to n8n webhook"""
+        """Queue a scraping result for delivery to the n8n webhook"""
         try:
             payload = {
-                "status": "completed",
+                "status": "partial" if result.get('partial') else "completed",
                 "url": original_url,
                 "result": result,
                 "timestamp": datetime.utcnow().isoformat() + "Z"
@@ -430,21 +580,90 @@ class SimpleWebScraper:
             if chat_id:
                 payload["chatId"] = chat_id
             
-            response = requests.post(
-                self.n8n_webhook_url,
-                json=payload,
-                headers={'Content-Type': 'application/json'},
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                print(f"Successfully sent result to n8n webhook for URL: {original_url}")
-            else:
-                print(f"Failed to send result to n8n webhook. Status: {response.status_code}, Response: {response.text}")
+            # Delivered (with batching, retries and spill-to-disk) on the next delivery_queue.flush()
+            delivery_queue.enqueue(payload)
+            print(f"Queued result for n8n webhook for URL: {original_url}")
                 
         except Exception as e:
-            print(f"Error sending result to n8n webhook: {str(e)}")
-    
+            print(f"Error queueing result for n8n webhook: {str(e)}")
+
+
+def _launch_driver():
+    """Create a Chrome driver for the warm browser"""
+    scraper = SimpleWebScraper()
+    return scraper.driver if scraper.setup_selenium_driver() else None
+
+
+warm_browser = WarmBrowser(
+    _launch_driver,
+    preconnect_hosts=TOP_NEWS_DOMAINS,
+    governor=memory_governor,
+    chrome_cache=chrome_cache
+)
+
+if WARM_BROWSER_AT_INIT:
+    # Runs once per container at import time; Lambda bills init CPU separately and the
+    # user-facing request no longer pays for Chrome startup
+    warm_browser.warm()
+
+
+def scrape_with_warm_browser(url, deadline=None):
+    """Scrape using the warm browser when it is free, otherwise with a dedicated driver"""
+    # Articles the feed crawler already pre-scraped need neither a politeness slot nor a browser
+    cached = scrape_cache.get(url)
+    if cached:
+        print(f"Serving {url} from the scrape cache ({cached['cache_source']}, {cached['cached_at']})")
+        return deadline.annotate(cached) if deadline else cached
+    timeout = POLITENESS_MAX_WAIT_SECONDS
+    if deadline is not None and deadline.bounded:
+        timeout = min(timeout, max(0.0, deadline.remaining() - deadline.budget('navigation')))
+    try:
+        politeness.acquire(url, timeout)
+    except TimeoutError as e:
+        print(f"Throttled {url}: {str(e)}")
+        result = {"error": "The site is rate limited, please retry later", "url": url, "throttled": True,
+                  "scraping_method": "selenium_webdriver"}
+        return deadline.annotate(result) if deadline else result
+    try:
+        with warm_browser.lease() as driver:
+            with SimpleWebScraper(driver=driver, deadline=deadline) as scraper:
+                return scraper.scrape_website(url, check_cache=False)
+    finally:
+        politeness.release(url)
+
+
+def send_result_to_waiters(result, url, chat_id):
+    """Send a result to the requester and to every chatId that coalesced onto the same URL"""
+    scraper = SimpleWebScraper()
+    for waiting_chat_id in coalescer.complete(url, chat_id) or [None]:
+        scraper.send_result_to_n8n(result, url, waiting_chat_id)
+
+
+def scrape_many_with_warm_browser(urls, deadline=None):
+    """Scrape several URLs concurrently as isolated tabs of a single Chrome, skipping ones already in the scrape cache"""
+    cached = {index: result for index, result in enumerate(scrape_cache.get(url) for url in urls) if result}
+    render_urls = [url for index, url in enumerate(urls) if index not in cached]
+    rendered = iter(_render_tabs(render_urls, deadline) if render_urls else [])
+    return [cached[index] if index in cached else next(rendered) for index in range(len(urls))]
+
+
+def _render_tabs(urls, deadline=None):
+    """Load URLs as isolated tabs of the warm browser"""
+    with warm_browser.lease() as driver:
+        with SimpleWebScraper(driver=driver, deadline=deadline) as scraper:
+            if not scraper.driver and not scraper.setup_selenium_driver():
+                return [{"error": "Failed to setup Selenium driver", "url": url} for url in urls]
+            scheduler = TabScheduler(
+                scraper.driver,
+                scraper.extract_loaded_page,
+                max_tabs=MAX_TABS,
+                tab_timeout=TAB_TIMEOUT_SECONDS,
+                politeness=politeness,
+                deadline=deadline,
+                isolated=TAB_ISOLATED_CONTEXTS
+            )
+            return scheduler.run(urls)
+
 
 def lambda_handler(event, context):
     """AWS Lambda handler function - returns 200 immediately, then scrapes in background"""
@@ -460,13 +679,20 @@ def lambda_handler(event, context):
             if isinstance(body, str):
                 body = json.loads(body)
             url = body.get('url')
+            urls = body.get('urls')
             chat_id = body.get('chatId')
             is_background = body.get('background', False)
+            is_sync = body.get('sync', False)
         else:
             # Direct Lambda invocation
             url = event.get('url')
+            urls = event.get('urls')
             chat_id = event.get('chatId')
             is_background = event.get('background', False)
+            is_sync = event.get('sync', False)
+        
+        if urls and not url:
+            url = urls[0]
         
         if not url:
             return {
@@ -474,6 +700,21 @@ def lambda_handler(event, context):
                 'body': json.dumps({'error': 'URL is required'})
             }
         
+        # Synchronous mode: scrape inline on the warm browser and return the result directly
+        if is_sync:
+            # Stage budgets come from the invocation's remaining time; a slow page returns a partial result
+            deadline = Deadline.from_context(context)
+            if urls:
+                scraped_data = {'results': scrape_many_with_warm_browser(urls, deadline)}
+            else:
+                scraped_data = run_with_deadline(
+                    deadline,
+                    lambda: scrape_with_warm_browser(url, deadline),
+                    lambda: deadline.annotate({"error": "Deadline reached before the page was scraped", "url": url,
+                                               "scraping_method": "selenium_webdriver"})
+                )
+            # Serialized once, projected to fields= and compressed per Accept-Encoding
+            return json_response(scraped_data, event)
         
         # Immediately return 200 status to n8n
         immediate_response_body = {
@@ -496,52 +737,141 @@ def lambda_handler(event, context):
             }
         }
         
-        # Invoke background scraper Lambda function
+        # Only URLs nobody else is already scraping go any further
+        pending_urls = [target_url for target_url in (urls or [url]) if coalescer.join(target_url, chat_id)]
+        if not pending_urls:
+            immediate_response_body['coalesced'] = True
+            immediate_response['body'] = json.dumps(immediate_response_body)
+            return immediate_response
+        
+        # Invoke background scraper Lambda function, once per URL
         try:
-            lambda_client = boto3.client('lambda', region_name='ap-southeast-5')
-            payload = {
-                'url': url,
-                'chatId': chat_id
-            }
+            # chatIds that attached here but could not follow their URL's scrape are dispatched on their own
+            orphans = []
+            if SCRAPE_QUEUE_URL:
+                # Queue mode: the batch consumer amortizes one warm Chrome across many URLs
+                sqs_client = boto3.client('sqs', region_name='ap-southeast-5')
+                # (url, chatId, whether this request's flight is handed off once the message is queued)
+                outstanding = [(target_url, chat_id, True) for target_url in pending_urls]
+                for attempt in range(2):
+                    rejected = []
+                    while outstanding:
+                        batch, outstanding = outstanding[:10], outstanding[10:]  # SQS batch limit
+                        response = sqs_client.send_message_batch(
+                            QueueUrl=SCRAPE_QUEUE_URL,
+                            Entries=[
+                                {'Id': str(i), 'MessageBody': json.dumps({'url': batch_url, 'chatId': batch_chat_id})}
+                                for i, (batch_url, batch_chat_id, _) in enumerate(batch)
+                            ]
+                        )
+                        failed = {int(entry['Id']) for entry in response.get('Failed', [])}
+                        for i, (batch_url, batch_chat_id, owns_flight) in enumerate(batch):
+                            if i in failed:
+                                rejected.append((batch_url, batch_chat_id, owns_flight))
+                            elif owns_flight:
+                                pending_urls.remove(batch_url)
+                                outstanding.extend((batch_url, waiting_chat_id, False)
+                                                   for waiting_chat_id in coalescer.handoff(batch_url))
+                        print(f"Queued {len(batch) - len(failed)} URLs for the background batch consumer")
+                        if failed:
+                            print(f"SQS rejected {len(failed)} messages: {response['Failed']}")
+                    outstanding = rejected
+                # Messages SQS keeps rejecting are invoked directly instead: their URLs are still in pending_urls
+                orphans.extend((batch_url, batch_chat_id) for batch_url, batch_chat_id, owns_flight in outstanding if not owns_flight)
             
-            # Invoke the background scraper function asynchronously
-            response = lambda_client.invoke(
-                FunctionName='background-web-scraper',
-                InvocationType='Event',  # Async invocation
-                Payload=json.dumps(payload)
-            )
-            print(f"Background scraper Lambda invoked successfully: {response['StatusCode']}")
+            lambda_client = boto3.client('lambda', region_name='ap-southeast-5')
+            while pending_urls:
+                payload = {
+                    'url': pending_urls[0],
+                    'chatId': chat_id
+                }
+                
+                # Invoke the background scraper function asynchronously
+                response = lambda_client.invoke(
+                    FunctionName='background-web-scraper',
+                    InvocationType='Event',  # Async invocation
+                    Payload=json.dumps(payload)
+                )
+                target_url = pending_urls.pop(0)
+                print(f"Background scraper Lambda invoked successfully: {response['StatusCode']}")
+                orphans.extend((target_url, waiting_chat_id) for waiting_chat_id in coalescer.handoff(target_url))
+            while orphans:
+                target_url, waiting_chat_id = orphans[0]
+                lambda_client.invoke(
+                    FunctionName='background-web-scraper',
+                    InvocationType='Event',
+                    Payload=json.dumps({'url': target_url, 'chatId': waiting_chat_id})
+                )
+                orphans.pop(0)
         except Exception as e:
             print(f"Failed to invoke background scraper Lambda: {str(e)}")
-            # Fallback: try to do it in a thread anyway
+            # Fallback: scrape on the bounded worker pool instead
             def background_scraping():
                 try:
-                    print(f"Fallback background thread started for URL: {url}, chatId: {chat_id}")
-                    with SimpleWebScraper() as scraper:
-                        print(f"Scraper initialized, starting scraping...")
-                        scraped_data = scraper.scrape_website(url)
-                        print(f"Scraping completed, sending to n8n...")
-                        scraper.send_result_to_n8n(scraped_data, url, chat_id)
-                        print(f"Result sent to n8n successfully")
+                    print(f"Fallback worker started for URLs: {pending_urls}, chatId: {chat_id}")
+                    if len(pending_urls) > 1:
+                        # Several URLs share one Chrome as isolated tabs instead of one browser each
+                        scraped_results = scrape_many_with_warm_browser(pending_urls)
+                    else:
+                        scraped_results = [scrape_with_warm_browser(pending_urls[0])]
+                    print(f"Scraping completed, sending to n8n...")
+                    for target_url, scraped_data in zip(pending_urls, scraped_results):
+                        send_result_to_waiters(scraped_data, target_url, chat_id)
+                    print(f"Result sent to n8n successfully")
                 except Exception as e:
                     print(f"Background scraping error: {str(e)}")
                     # Send error result to n8n
                     try:
-                        with SimpleWebScraper() as scraper:
-                            error_result = {"error": str(e), "url": url, "scraping_method": "selenium_webdriver"}
-                            scraper.send_result_to_n8n(error_result, url, chat_id)
-                            print(f"Error result sent to n8n")
+                        for target_url in pending_urls:
+                            error_result = {"error": str(e), "url": target_url, "scraping_method": "selenium_webdriver"}
+                            send_result_to_waiters(error_result, target_url, chat_id)
+                        print(f"Error result sent to n8n")
                     except Exception as e2:
                         print(f"Failed to send error result to n8n: {str(e2)}")
+                finally:
+                    delivery_queue.flush()
             
-            # Start background thread (non-daemon to keep Lambda alive)
-            thread = threading.Thread(target=background_scraping)
-            thread.daemon = False
-            thread.start()
-            print(f"Fallback background thread started for URL: {url}")
+            def deadline_expired():
+                # The job waited in the queue past its deadline; tell the user instead of scraping late
+                for target_url in pending_urls:
+                    error_result = {"error": "Scrape deadline exceeded while queued", "url": target_url, "scraping_method": "selenium_webdriver"}
+                    send_result_to_waiters(error_result, target_url, chat_id)
+                delivery_queue.flush()
             
-            # Give the thread a moment to start
-            time.sleep(0.1)
+            try:
+                fallback_pool.submit(
+                    background_scraping,
+                    deadline_seconds=FALLBACK_JOB_DEADLINE_SECONDS,
+                    on_expired=deadline_expired
+                )
+                print(f"Fallback scrape queued for URL: {url}, pool: {fallback_pool.metrics()}")
+            except PoolSaturated as saturated:
+                print(f"Shedding load for URL: {url}, {str(saturated)}")
+                # Release the flights; anyone who attached meanwhile is told to retry as well
+                for target_url in pending_urls:
+                    for waiting_chat_id in coalescer.complete(target_url):
+                        if waiting_chat_id != chat_id:
+                            error_result = {"error": "Scraper is at capacity, please retry later", "url": target_url, "scraping_method": "selenium_webdriver"}
+                            SimpleWebScraper().send_result_to_n8n(error_result, target_url, waiting_chat_id)
+                delivery_queue.flush()
+                rejected_body = {
+                    'status': 'rejected',
+                    'message': 'Scraper is at capacity, please retry later',
+                    'url': url,
+                    'retry_after': saturated.retry_after,
+                    'timestamp': datetime.utcnow().isoformat() + "Z"
+                }
+                if chat_id:
+                    rejected_body['chatId'] = chat_id
+                return {
+                    'statusCode': 503,
+                    'body': json.dumps(rejected_body),
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*',
+                        'Retry-After': str(saturated.retry_after)
+                    }
+                }
         
         return immediate_response
             
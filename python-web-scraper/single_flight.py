@@ -0,0 +1,286 @@
+"""
+In-flight request coalescing keyed by canonical URL
+The first request for a URL scrapes it; duplicates arriving while that scrape is running attach their
+chatId and receive the same result. Works in-process and across workers through a lease record.
+Without a lease store, only scrapes that finish in this process can carry attached chatIds; a flight
+handed to another worker returns its in-process waiters so the caller can dispatch them itself.
+Synchronous callers (the verifying handler) instead share the leader's result, which followers wait for.
+"""
+
+import hashlib
+import threading
+import time
+
+from item_layout import MAX_BODY_PART_BYTES, compress_body, decompress_body
+from url_canon import canonical_url
+
+
+def coalesce_key(url):
+    """Short stable key for a URL's in-flight record"""
+    return hashlib.sha1(canonical_url(url).encode('utf-8')).hexdigest()
+
+
+class InMemoryLeaseStore:
+    """Lease store for local runs and tests, with the same semantics as DynamoLeaseStore"""
+
+    def __init__(self):
+        self._leases = {}
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key, url, chat_id, ttl_seconds):
+        """Take the lease if nobody holds it; otherwise attach chat_id to the holder. Returns True if acquired"""
+        now = time.time()
+        with self._lock:
+            lease = self._leases.get(key)
+            if lease and lease['expires_at'] >= now:
+                if chat_id and chat_id not in lease['chat_ids']:
+                    lease['chat_ids'].append(chat_id)
+                return False
+            self._leases[key] = {'url': url, 'chat_ids': [chat_id] if chat_id else [], 'expires_at': now + ttl_seconds}
+            return True
+
+    def attach(self, key, chat_ids):
+        """Add chatIds to a held lease"""
+        with self._lock:
+            lease = self._leases.get(key)
+            if lease:
+                lease['chat_ids'].extend(chat_id for chat_id in chat_ids if chat_id not in lease['chat_ids'])
+
+    def release(self, key):
+        """Drop the lease and return every chatId that attached to it"""
+        with self._lock:
+            lease = self._leases.pop(key, None)
+        return lease['chat_ids'] if lease else []
+
+    def held(self, key):
+        """True while an unexpired lease exists for key"""
+        with self._lock:
+            lease = self._leases.get(key)
+            return bool(lease) and lease['expires_at'] >= time.time()
+
+    def put_result(self, key, result, ttl_seconds):
+        """Keep a finished flight's result for followers for ttl_seconds"""
+        with self._lock:
+            self._results[key] = (time.time() + ttl_seconds, result)
+
+    def get_result(self, key):
+        """A finished flight's result, or None"""
+        with self._lock:
+            stored = self._results.get(key)
+        return stored[1] if stored and stored[0] >= time.time() else None
+
+
+class DynamoLeaseStore:
+    """Lease records kept in the DynamoDB result store under a 'lease#' key prefix"""
+
+    def __init__(self, table, key_attribute='tweet_id'):
+        self.table = table
+        self.key_attribute = key_attribute
+
+    def acquire(self, key, url, chat_id, ttl_seconds):
+        """Conditionally create the lease; if it is already held, append chat_id to it. Returns True if acquired"""
+        from botocore.exceptions import ClientError
+
+        lease_key = {self.key_attribute: f'lease#{key}'}
+        now = int(time.time())
+        for _ in range(2):
+            try:
+                self.table.put_item(
+                    Item={**lease_key, 'url': url, 'chat_ids': [chat_id] if chat_id else [], 'expires_at': now + ttl_seconds},
+                    ConditionExpression='attribute_not_exists(#k) OR expires_at < :now',
+                    ExpressionAttributeNames={'#k': self.key_attribute},
+                    ExpressionAttributeValues={':now': now}
+                )
+                return True
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+            try:
+                self.table.update_item(
+                    Key=lease_key,
+                    UpdateExpression='SET chat_ids = list_append(chat_ids, :chat)',
+                    ConditionExpression='attribute_exists(#k) AND expires_at >= :now',
+                    ExpressionAttributeNames={'#k': self.key_attribute},
+                    ExpressionAttributeValues={':chat': [chat_id] if chat_id else [], ':now': now}
+                )
+                return False
+            except ClientError as e:
+                # The holder released between our two calls; loop round and try to take it
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+        return True
+
+    def attach(self, key, chat_ids):
+        """Append chatIds to an existing lease"""
+        self.table.update_item(
+            Key={self.key_attribute: f'lease#{key}'},
+            UpdateExpression='SET chat_ids = list_append(chat_ids, :chats)',
+            ConditionExpression='attribute_exists(#k)',
+            ExpressionAttributeNames={'#k': self.key_attribute},
+            ExpressionAttributeValues={':chats': list(chat_ids)}
+        )
+
+    def release(self, key):
+        """Delete the lease and return every chatId that attached to it"""
+        response = self.table.delete_item(
+            Key={self.key_attribute: f'lease#{key}'},
+            ReturnValues='ALL_OLD'
+        )
+        return response.get('Attributes', {}).get('chat_ids', [])
+
+    def held(self, key):
+        """True while an unexpired lease exists for key"""
+        lease = self.table.get_item(Key={self.key_attribute: f'lease#{key}'}, ConsistentRead=True).get('Item')
+        return bool(lease) and int(lease.get('expires_at', 0)) >= time.time()
+
+    def put_result(self, key, result, ttl_seconds):
+        """Store a finished flight's result under 'flight#' for followers; skipped if it won't fit in an item"""
+        codec, payload = compress_body(result)
+        if len(payload) > MAX_BODY_PART_BYTES:
+            print(f"Not sharing flight result for {key}: {len(payload)} compressed bytes")
+            return
+        self.table.put_item(Item={
+            self.key_attribute: f'flight#{key}',
+            'body': payload,
+            'body_codec': codec,
+            'expires_at': int(time.time() + ttl_seconds)
+        })
+
+    def get_result(self, key):
+        """A finished flight's result, or None"""
+        record = self.table.get_item(Key={self.key_attribute: f'flight#{key}'}, ConsistentRead=True).get('Item')
+        # DynamoDB's TTL sweep runs late, so expiry is checked here too
+        if not record or int(record.get('expires_at', 0)) < time.time():
+            return None
+        body = record['body']
+        return decompress_body(record['body_codec'], bytes(body.value if hasattr(body, 'value') else body))
+
+
+class RequestCoalescer:
+    """Single-flight coordinator: one scrape per canonical URL, results fanned out to every waiting chatId
+
+    key_prefix separates flights whose results differ (a verified scrape is not a plain scrape), so
+    their leases never coalesce onto each other.
+    """
+
+    def __init__(self, lease_store=None, ttl_seconds=300, key_prefix='', result_ttl_seconds=120):
+        self.lease_store = lease_store
+        self.ttl_seconds = ttl_seconds
+        self.key_prefix = key_prefix
+        self.result_ttl_seconds = result_ttl_seconds
+        # key -> chatIds that attached in this process while the flight runs
+        self._flights = {}
+        # key -> (expires_at, result) shared by finished flights with followers in this process
+        self._results = {}
+        self._lock = threading.Lock()
+        self._finished = threading.Condition(self._lock)
+
+    def _key(self, url):
+        return self.key_prefix + coalesce_key(url)
+
+    def join(self, url, chat_id):
+        """Register interest in url; returns True if the caller should run the scrape, False if it attached"""
+        key = self._key(url)
+        with self._lock:
+            waiters = self._flights.get(key)
+            if waiters is not None:
+                if chat_id:
+                    waiters.append(chat_id)
+                print(f"Coalesced request for {url} onto in-process flight")
+                return False
+            self._flights[key] = []
+
+        if not self.lease_store:
+            return True
+        try:
+            if self.lease_store.acquire(key, canonical_url(url), chat_id, self.ttl_seconds):
+                return True
+        except Exception as e:
+            # Coalescing is an optimization; if the lease store is unavailable just scrape
+            print(f"Error acquiring scrape lease, scraping without coalescing: {str(e)}")
+            return True
+
+        # Another worker holds the lease and now knows about our chatId
+        self.handoff(url)
+        print(f"Coalesced request for {url} onto another worker's in-flight scrape")
+        return False
+
+    def handoff(self, url):
+        """The scrape for url now runs in another worker; move chatIds that attached here onto its lease
+
+        Returns the chatIds that could not follow the scrape (no lease store, or attaching failed);
+        the caller must dispatch those itself or they never receive a result.
+        """
+        key = self._key(url)
+        with self._lock:
+            waiters = self._flights.pop(key, [])
+        if not waiters or not self.lease_store:
+            return waiters
+        try:
+            self.lease_store.attach(key, waiters)
+        except Exception as e:
+            print(f"Error attaching waiters to scrape lease: {str(e)}")
+            return waiters
+        return []
+
+    def complete(self, url, chat_id=None):
+        """Finish the flight for url and return the chatIds its result should be sent to"""
+        key = self._key(url)
+        with self._lock:
+            chat_ids = self._flights.pop(key, [])
+            self._finished.notify_all()
+        if self.lease_store:
+            try:
+                chat_ids = chat_ids + self.lease_store.release(key)
+            except Exception as e:
+                print(f"Error releasing scrape lease: {str(e)}")
+        if chat_id:
+            chat_ids = [chat_id] + chat_ids
+        # Preserve arrival order while dropping duplicates
+        return list(dict.fromkeys(chat_ids))
+
+    def share(self, url, result):
+        """Publish the leader's result to followers (call before complete, which releases the lease)"""
+        key = self._key(url)
+        now = time.time()
+        with self._lock:
+            self._results = {k: v for k, v in self._results.items() if v[0] > now}
+            self._results[key] = (now + self.result_ttl_seconds, result)
+            self._finished.notify_all()
+        if self.lease_store:
+            try:
+                self.lease_store.put_result(key, result, self.result_ttl_seconds)
+            except Exception as e:
+                print(f"Error sharing flight result: {str(e)}")
+
+    def wait_for_result(self, url, timeout, poll_seconds=1.0):
+        """Result the leader of url's flight shared, or None once the flight ended without one or timeout passed"""
+        key = self._key(url)
+        give_up = time.time() + timeout
+        while True:
+            with self._lock:
+                shared = self._results.get(key)
+                if shared and shared[0] > time.time():
+                    return shared[1]
+                in_process = key in self._flights
+            if self.lease_store and not in_process:
+                try:
+                    result = self.lease_store.get_result(key)
+                    if result is None and not self.lease_store.held(key):
+                        # Re-read: the leader may have shared and released between the two calls
+                        result = self.lease_store.get_result(key)
+                        if result is None:
+                            return None
+                except Exception as e:
+                    print(f"Error reading flight result: {str(e)}")
+                    return None
+                if result is not None:
+                    return result
+            elif not in_process:
+                return None
+            remaining = give_up - time.time()
+            if remaining <= 0:
+                return None
+            with self._finished:
+                self._finished.wait(min(poll_seconds, remaining))
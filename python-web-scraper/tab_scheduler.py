@@ -0,0 +1,153 @@
+"""
+Tab scheduler for running several URLs through one Chrome process
+With isolated=True each URL gets its own CDP browser context so cookies and storage never leak
+between tabs; those contexts are off-the-record, so their HTTP cache lives in memory and never
+reaches the shared disk cache. Tabs in the default context share cookies but reuse the disk cache.
+"""
+
+import time
+from collections import deque
+
+
+class TabScheduler:
+    """Loads up to max_tabs URLs concurrently as isolated tabs and extracts each one when ready"""
+
+    def __init__(self, driver, extract, max_tabs=4, tab_timeout=30, poll_interval=0.25, politeness=None, deadline=None,
+                 isolated=True):
+        # extract(url) is called with the driver switched to that URL's tab and returns the result dict
+        self.driver = driver
+        self.extract = extract
+        self.max_tabs = max(1, max_tabs)
+        self.tab_timeout = tab_timeout
+        self.poll_interval = poll_interval
+        # Optional PolitenessScheduler; URLs are only opened when their domain admits them
+        self.politeness = politeness
+        # Optional Deadline; near it no new tabs are opened and loading tabs are extracted as they are
+        self.deadline = deadline
+        self.isolated = isolated
+        self._home_handle = None
+
+    def run(self, urls):
+        """Scrape every URL, returning results in the same order as the input"""
+        results = [None] * len(urls)
+        pending = deque(enumerate(urls))
+        active = {}
+        queued_at = time.time()
+        self._home_handle = self.driver.current_window_handle
+
+        try:
+            while pending or active:
+                if pending and self._out_of_time():
+                    self.deadline.skip('navigation')
+                    for index, url in pending:
+                        results[index] = {"error": "Deadline reached before this URL was scraped", "url": url,
+                                          "scraping_method": "selenium_webdriver", "partial": True}
+                    pending.clear()
+
+                # Fill free tab slots; Chrome starts loading each page as soon as its target exists
+                while pending and len(active) < self.max_tabs:
+                    index, url = self._next_admissible(pending, queued_at)
+                    if index is None:
+                        break
+                    try:
+                        tab = self._open_tab(url)
+                        tab['index'] = index
+                        active[tab['target_id']] = tab
+                    except Exception as e:
+                        print(f"Error opening tab for {url}: {str(e)}")
+                        results[index] = {"error": str(e), "url": url, "scraping_method": "selenium_webdriver"}
+                        if self.politeness:
+                            self.politeness.release(url)
+
+                # Extraction shares one WebDriver session, so finished tabs are drained one at a time
+                for target_id, tab in list(active.items()):
+                    result = self._poll_tab(tab)
+                    if result is not None:
+                        results[tab['index']] = result
+                        self._close_tab(tab)
+                        del active[target_id]
+
+                if active or pending:
+                    time.sleep(self.poll_interval)
+        finally:
+            for tab in active.values():
+                self._close_tab(tab)
+            self._return_home()
+
+        return results
+
+    def _next_admissible(self, pending, queued_at):
+        """Pop the first pending URL whose domain has capacity, interleaving domains; (None, None) if none do"""
+        if not self.politeness:
+            return pending.popleft()
+        for position, (index, url) in enumerate(pending):
+            if self.politeness.try_acquire(url) == 0:
+                del pending[position]
+                self.politeness.record_wait(url, time.time() - queued_at)
+                return index, url
+        return None, None
+
+    def _open_tab(self, url):
+        """Create a tab that starts loading url, inside a fresh browser context when isolated"""
+        if not self.isolated:
+            target_id = self.driver.execute_cdp_cmd('Target.createTarget', {'url': url})['targetId']
+            print(f"Opened tab {target_id} for URL: {url}")
+            return {'target_id': target_id, 'context_id': None, 'url': url, 'started': time.time()}
+        context_id = self.driver.execute_cdp_cmd('Target.createBrowserContext', {})['browserContextId']
+        try:
+            target_id = self.driver.execute_cdp_cmd('Target.createTarget', {
+                'url': url,
+                'browserContextId': context_id
+            })['targetId']
+        except Exception:
+            self.driver.execute_cdp_cmd('Target.disposeBrowserContext', {'browserContextId': context_id})
+            raise
+        print(f"Opened tab {target_id} for URL: {url}")
+        return {'target_id': target_id, 'context_id': context_id, 'url': url, 'started': time.time()}
+
+    def _poll_tab(self, tab):
+        """Return the tab's result once it has loaded or timed out, otherwise None"""
+        url = tab['url']
+        elapsed = time.time() - tab['started']
+        try:
+            self.driver.switch_to.window(tab['target_id'])
+            ready = self.driver.execute_script("return document.readyState") == 'complete'
+            if not ready and elapsed < self.tab_timeout and not self._out_of_time():
+                return None
+
+            timed_out = not ready
+            if timed_out:
+                print(f"Tab for {url} not loaded after {elapsed:.0f}s, extracting what has loaded")
+                self.driver.execute_script("window.stop();")
+
+            result = self.extract(url)
+            if timed_out and isinstance(result, dict):
+                result['tab_timed_out'] = True
+            return result
+        except Exception as e:
+            print(f"Error scraping tab for {url}: {str(e)}")
+            return {"error": str(e), "url": url, "scraping_method": "selenium_webdriver"}
+
+    def _out_of_time(self):
+        """True once too little time is left to load another page"""
+        return bool(self.deadline) and self.deadline.remaining() < self.deadline.stages['navigation'][1]
+
+    def _close_tab(self, tab):
+        """Close the tab and dispose its browser context (if it has one), dropping its cookies and storage"""
+        # CDP commands run against the current window, so step off the tab before closing it
+        self._return_home()
+        try:
+            self.driver.execute_cdp_cmd('Target.closeTarget', {'targetId': tab['target_id']})
+            if tab['context_id']:
+                self.driver.execute_cdp_cmd('Target.disposeBrowserContext', {'browserContextId': tab['context_id']})
+        except Exception as e:
+            print(f"Error closing tab for {tab['url']}: {e}")
+        if self.politeness:
+            self.politeness.release(tab['url'])
+
+    def _return_home(self):
+        """Switch back to the tab that was current before the run started"""
+        try:
+            self.driver.switch_to.window(self._home_handle)
+        except Exception as e:
+            print(f"Error returning to original tab: {e}")
@@ -0,0 +1,184 @@
+"""
+URL canonicalization and site classification
+One identity for every cache and dedup layer: host aliases (twitter.com -> x.com), www/mobile/AMP
+variants, tracking parameters, default ports, fragments and trailing slashes are normalized away, and
+X status links collapse to their tweet ID. Hosts are classified by walking their label suffixes
+against precompiled dicts instead of substring checks, so 'box.com' is never mistaken for 'x.com'.
+"""
+
+import re
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+HOST_ALIASES = {'twitter.com': 'x.com', 'fxtwitter.com': 'x.com', 'vxtwitter.com': 'x.com'}
+# Subdomains that serve the same article as the bare site; only stripped above a registrable domain
+VARIANT_SUBDOMAINS = ('www', 'm', 'mobile', 'amp')
+# Second-level public suffixes of the sites we scrape, so 'm.thestar.com.my' keeps 'thestar.com.my'
+PUBLIC_SUFFIXES = frozenset({
+    'com.my', 'net.my', 'org.my', 'gov.my', 'edu.my', 'my', 'com', 'net', 'org', 'co.uk', 'org.uk',
+    'com.sg', 'sg', 'com.au', 'co', 'io', 'news', 'info', 'tv', 'asia'
+})
+
+TRACKING_PARAMS = frozenset({
+    'fbclid', 'gclid', 'dclid', 'gbraid', 'wbraid', 'msclkid', 'yclid', 'twclid', 'igshid', 'mc_cid', 'mc_eid',
+    'ref_src', 'ref_url', '_ga', '_gl', 'cmpid', 'ncid', 'amp', 'outputtype', 'amp_js_v', 'usqp'
+})
+TRACKING_PREFIXES = ('utm_', 'at_', 'pk_')
+# Share-sheet parameters X appends to status links (?s=20&t=...)
+X_SHARE_PARAMS = frozenset({'s', 't', 'ref_src', 'ref_url'})
+
+# Registered domain -> page type; subdomains inherit their site's type
+SITE_PAGE_TYPES = {
+    'x.com': 'twitter_post',
+    'freemalaysiatoday.com': 'news_article',
+    'sinchew.com.my': 'news_article',
+    'malaysiakini.com': 'news_article',
+    'thestar.com.my': 'news_article'
+}
+
+_STATUS_RE = re.compile(r'^/(?:[A-Za-z0-9_]{1,15}|i(?:/web)?)/status(?:es)?/(\d{1,20})(?:/|$)')
+_AMP_CACHE_RE = re.compile(r'^/[cv]/(?:s/)?([^/]+)(/.*)?$')
+
+
+def _strip_variants(host):
+    """Drop www/m/mobile/amp prefixes while something more than a public suffix remains"""
+    while True:
+        label, dot, rest = host.partition('.')
+        if not dot or label not in VARIANT_SUBDOMAINS or rest in PUBLIC_SUFFIXES or '.' not in rest:
+            return host
+        host = rest
+
+
+def _port(parts):
+    """Explicit non-default port of a split URL, or None; 80 and 443 both go since the scheme is normalized too"""
+    try:
+        port = parts.port
+    except ValueError:
+        return None
+    return port if port not in (None, 80, 443) else None
+
+
+def _host_and_path(parts, keep_port=False):
+    """Normalized host and path of a split URL, unwrapping AMP cache links
+
+    With keep_port a non-default port stays on the host ('example.com:8443'): it is a different server
+    """
+    host = (parts.hostname or '').rstrip('.')
+    path = parts.path
+    port = _port(parts) if keep_port else None
+    # AMP cache links (<host-with-dashes>.cdn.ampproject.org/c/s/<host>/<path>) point at the publisher's page
+    if host.endswith('.cdn.ampproject.org'):
+        match = _AMP_CACHE_RE.match(path)
+        if match:
+            host, path, port = match.group(1).lower(), match.group(2) or '/', None
+    host = _strip_variants(host)
+    host = HOST_ALIASES.get(host, host)
+    return (f'{host}:{port}' if port else host), path
+
+
+def canonical_host(url):
+    """Lower-cased host with aliases and www/mobile/AMP variants normalized"""
+    return _host_and_path(urlsplit(url.strip()))[0]
+
+
+def site_for_host(host):
+    """Most specific registered site in SITE_PAGE_TYPES covering host, or None"""
+    # Suffix walk: 'edition.thestar.com.my' tries itself, 'thestar.com.my', 'com.my', 'my'
+    while host:
+        if host in SITE_PAGE_TYPES:
+            return host
+        dot = host.find('.')
+        if dot < 0:
+            return None
+        host = host[dot + 1:]
+    return None
+
+
+def page_type(url):
+    """'twitter_post', 'news_article' or 'unknown' from the URL's host"""
+    return SITE_PAGE_TYPES.get(site_for_host(canonical_host(url)), 'unknown')
+
+
+def tweet_status_id(url):
+    """Status ID of an X/Twitter post URL, or None"""
+    host, path = _host_and_path(urlsplit(url.strip()))
+    if host != 'x.com':
+        return None
+    match = _STATUS_RE.match(path)
+    return match.group(1) if match else None
+
+
+def canonical_url(url):
+    """Normalize a URL so trivially different copies of the same page share one key"""
+    parts = urlsplit(url.strip())
+    host, path = _host_and_path(parts, keep_port=True)
+    if host == 'x.com':
+        match = _STATUS_RE.match(path)
+        if match:
+            # Handles change and /photo/1, /analytics etc. are views of the same post: the ID is the identity
+            return f'https://x.com/i/status/{match.group(1)}'
+        dropped = X_SHARE_PARAMS
+    else:
+        dropped = ()
+
+    # AMP variants of an article: /amp/<path>, <path>/amp and <path>.amp(.html)
+    if path.startswith('/amp/'):
+        path = path[4:]
+    if path.endswith('/amp') or path.endswith('/amp/'):
+        path = path[:path.rindex('/amp')]
+    if '.amp' in path:
+        path = path.replace('.amp.html', '.html').replace('.amp/', '/')
+        if path.endswith('.amp'):
+            path = path[:-4]
+    path = path.rstrip('/') or '/'
+
+    query = ''
+    if parts.query:
+        kept = []
+        for key, value in parse_qsl(parts.query, keep_blank_values=True):
+            lowered = key.lower()
+            if lowered in TRACKING_PARAMS or lowered in dropped or lowered.startswith(TRACKING_PREFIXES):
+                continue
+            kept.append((key, value))
+        if kept:
+            kept.sort()
+            query = urlencode(kept)
+    return urlunsplit(('https', host, path, query, ''))
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    def benchmark(count=500000):
+        """Canonicalize and classify unique URLs; prints throughput in URLs per minute"""
+        rng = random.Random(7)
+        hosts = ['www.thestar.com.my', 'm.malaysiakini.com', 'www.freemalaysiatoday.com', 'sinchew.com.my',
+                 'twitter.com', 'mobile.twitter.com', 'x.com', 'box.com', 'www-thestar-com-my.cdn.ampproject.org']
+        urls = []
+        for i in range(count):
+            host = rng.choice(hosts)
+            if 'twitter' in host or host == 'x.com':
+                url = f'https://{host}/user{i % 997}/status/{10 ** 18 + i}?s=20&t=abc{i}'
+            elif 'ampproject' in host:
+                url = f'https://{host}/c/s/www.thestar.com.my/news/nation/2026/10/{i}/story-{i}/amp'
+            else:
+                url = f'http://{host}/category/nation/2026/10/19/story-{i}/?utm_source=tw&utm_medium=social&id={i}#top'
+            urls.append(url)
+
+        started = time.perf_counter()
+        canonical = [canonical_url(url) for url in urls]
+        canonical_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        types = [page_type(url) for url in urls]
+        classify_seconds = time.perf_counter() - started
+
+        assert canonical_url('https://mobile.twitter.com/a/status/123/photo/1?s=20') == 'https://x.com/i/status/123'
+        assert page_type('https://box.com/x.com') == 'unknown'
+        assert canonical_url('http://www.thestar.com.my/news/a/?utm_source=x#c') == 'https://thestar.com.my/news/a'
+        print(f"canonical_url: {count / canonical_seconds * 60 / 1e6:.2f}M URLs/min "
+              f"({canonical_seconds / count * 1e6:.1f} us/URL, {len(set(canonical))} distinct)")
+        print(f"page_type: {count / classify_seconds * 60 / 1e6:.2f}M URLs/min "
+              f"({types.count('news_article')} news, {types.count('twitter_post')} posts, {types.count('unknown')} other)")
+
+    benchmark()
@@ -0,0 +1,121 @@
+"""
+Bounded worker pool with admission control
+Caps how many scrapes (and therefore Chrome instances) run at once in a container and sheds load
+with a retry-after hint once the queue is full
+"""
+
+import json
+import math
+import threading
+import time
+import concurrent.futures
+from collections import deque
+
+
+class PoolSaturated(Exception):
+    """Raised by BoundedWorkerPool.submit when the queue is full"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Worker pool saturated, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list, or 0 when empty"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(math.ceil(pct / 100 * len(ordered))) - 1)]
+
+
+class BoundedWorkerPool:
+    """Process-wide executor with a fixed worker count, a queue-depth limit and per-job deadlines"""
+
+    def __init__(self, max_workers=2, max_queue_depth=8, name='worker', default_retry_after=5):
+        self.max_workers = max_workers
+        self.max_queue_depth = max_queue_depth
+        self.name = name
+        self.default_retry_after = default_retry_after
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        # One slot per running or queued job; admission fails fast when none are left
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue_depth)
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._running = 0
+        self._queue_waits = deque(maxlen=200)
+        self._service_times = deque(maxlen=200)
+        self.completed = 0
+        self.rejected = 0
+        self.expired = 0
+
+    def submit(self, fn, *args, deadline_seconds=None, on_expired=None, **kwargs):
+        """Queue fn for a worker, raising PoolSaturated if the queue is full
+
+        Jobs that are still waiting when their deadline passes are dropped and on_expired is called instead.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PoolSaturated(self.retry_after())
+
+        enqueued_at = time.time()
+        deadline = enqueued_at + deadline_seconds if deadline_seconds else None
+        with self._lock:
+            self._admitted += 1
+
+        def run():
+            started_at = time.time()
+            expired = False
+            with self._lock:
+                self._running += 1
+            try:
+                if deadline and started_at > deadline:
+                    expired = True
+                    print(f"{self.name} job expired after waiting {round(started_at - enqueued_at, 2)}s in queue")
+                    if on_expired:
+                        on_expired()
+                    return None
+                return fn(*args, **kwargs)
+            finally:
+                finished_at = time.time()
+                with self._lock:
+                    self._running -= 1
+                    self._admitted -= 1
+                    self._queue_waits.append(started_at - enqueued_at)
+                    # Expired jobs never ran, so they'd only drag the service-time estimate behind retry_after down
+                    if expired:
+                        self.expired += 1
+                    else:
+                        self.completed += 1
+                        self._service_times.append(finished_at - started_at)
+                self._slots.release()
+                print(json.dumps({'metric': f'{self.name}_pool', **self.metrics()}))
+
+        return self._executor.submit(run)
+
+    def retry_after(self):
+        """Seconds a rejected caller should wait, estimated from recent service times"""
+        with self._lock:
+            service_times = list(self._service_times)
+            backlog = self._admitted
+        if not service_times:
+            return self.default_retry_after
+        average = sum(service_times) / len(service_times)
+        return max(1, int(math.ceil(average * backlog / self.max_workers)))
+
+    def metrics(self):
+        """Queue depth, counters and recent queue-wait / service-time percentiles in seconds"""
+        with self._lock:
+            queue_waits = list(self._queue_waits)
+            service_times = list(self._service_times)
+            return {
+                'running': self._running,
+                'queued': self._admitted - self._running,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'expired': self.expired,
+                'queue_wait_p50_s': round(percentile(queue_waits, 50), 3),
+                'queue_wait_p95_s': round(percentile(queue_waits, 95), 3),
+                'service_time_p50_s': round(percentile(service_times, 50), 3),
+                'service_time_p95_s': round(percentile(service_times, 95), 3)
+            }